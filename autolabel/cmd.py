@@ -17,16 +17,16 @@
 
 import argparse
 from enum import Enum
+import logging
 import sys
+from pathlib import Path
 import yaml
-import numpy as np
 
-from autolabel.source.source_factory import SourceFactory
-from autolabel.model.model_factory import ModelFactory
-from autolabel.prompt.prompt import Prompt
-from autolabel.task.image_segment_task import ImageSegmentTask
-from autolabel.task.image_detection_task import ImageDetectionTask
-from autolabel.task.video_segment_tracking_task import VideoSegmentTrackingTask
+# Modules that import torch, sam2 or cv2 are imported where a task needs
+# them, so `autolabel --help` or a server client starts in milliseconds
+from autolabel.pipeline.manifest import RunChangedError, RunManifest, read_fingerprint, \
+    run_fingerprint
+from autolabel.server.address import DEFAULT_PORT, parse_address
 
 
 class TaskType(Enum):
@@ -35,61 +35,188 @@ class TaskType(Enum):
     VIDEO_SEGMENT = "video_segment"
 
 
-def dispatch_task(task_type, model, source, prompt):
+def dispatch_task(task_type, model, source, prompts, config=None,
+                  multi_object=False, resume=False, incremental=False):
+    from autolabel.label.writer import WriterFactory
+    from autolabel.source.source_factory import IterSource
+    from autolabel.vis.visualizer import VisualizerFactory
+
+    config = config or {}
+    # An incremental run continues the outputs like a resumed one
+    resume = resume or incremental
+    # Batch runs and long videos tracked in chunks are unattended, don't
+    # block them on windows by default
+    chunked = bool(config.get('video', {}).get('chunk_size'))
+    default_vis = 'none' if isinstance(source, IterSource) or chunked else 'window'
+    # Labels are written when `output.dir` is set
+    writer = WriterFactory.create(config.get('output'), append=resume)
+    with VisualizerFactory.create(config.get('vis'), default_vis) as visualizer:
+        try:
+            _dispatch_task(task_type, model, source, prompts, config,
+                           multi_object, visualizer, writer, resume,
+                           incremental)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def _dispatch_task(task_type, model, source, prompts, config, multi_object,
+                   visualizer, writer, resume, incremental):
     if TaskType(task_type) == TaskType.IMAGE_SEGMENT:
-        task = ImageSegmentTask(model)
-        # Todo(zero): Determine whether the source can be iterated.
-        # If it is an iterable type, traverse it. If not, get the data directly.
-        task.set_data(source.data)
-        task.add_prompt(prompt)
-        masks = task.process()
+        from autolabel.label.writer import LabelRecord
+        from autolabel.model.embedding_cache import EmbeddingCache
+        from autolabel.pipeline.batch_runner import BatchRunner
+        from autolabel.source.source_factory import IterSource
+        from autolabel.task.image_segment_task import ImageSegmentTask
+
+        model_cfg = config.get('model', {})
+        runner_cfg = config.get('runner', {})
+        decode_size = runner_cfg.get('decode_size')
+        embedding_cache = EmbeddingCache.from_config(
+            config.get('embedding_cache'), model_cfg, decode_size)
+        task = ImageSegmentTask(model, embedding_cache, multi_object,
+                                visualizer)
+        for prompt in prompts:
+            task.add_prompt(prompt)
+        if isinstance(source, IterSource):
+            # Reuse the task and model for every item of the source
+            # Completed inputs are recorded next to the labels
+            manifest = None
+            if writer is not None:
+                manifest = RunManifest(
+                    writer.output_dir / RunManifest.FILE_NAME, resume,
+                    run_fingerprint(config))
+            runner = BatchRunner(
+                task, writer,
+                prefetch=runner_cfg.get('prefetch', 4),
+                decode_workers=runner_cfg.get('decode_workers', 2),
+                manifest=manifest, incremental=incremental,
+                decode_size=decode_size)
+            try:
+                runner.run(source)
+            finally:
+                if manifest is not None:
+                    manifest.close()
+        else:
+            cache_key = None
+            if embedding_cache is not None:
+                cache_key = embedding_cache.key(source.source_input.input)
+            if decode_size:
+                image, orig_hw = source.decode_reduced(decode_size)
+            else:
+                image = source.decode()
+                orig_hw = image.shape[:2]
+            task.set_data(image, cache_key=cache_key, orig_hw=orig_hw)
+            masks = task.process()
+            if writer is not None:
+                height, width = orig_hw
+                writer.write(LabelRecord(
+                    source.source_input.input, height, width, masks))
     elif TaskType(task_type) == TaskType.IMAGE_DETECTION:
+        from autolabel.task.image_detection_task import ImageDetectionTask
+
         task = ImageDetectionTask(model)
         task.set_data(source.data)
         results = task.process()
     elif TaskType(task_type) == TaskType.VIDEO_SEGMENT:
-        task = VideoSegmentTrackingTask(model)
-
-        # todo(zero): The design of the slice interface and the data type of the feedback,
-        # can the data in the memory be directly passed to the model to avoid loading twice?
-        # However, it is necessary to save the intercepted pictures.
-        # The video source adds the property of whether to save the captured image.
-        # Where is the path of the pictures? Where to set
-        source.slice(2, True)
-        task.set_data('/tmp/autolabel/')
-        task.add_prompt(prompt)
+        from autolabel.pipeline.video_sink import FrameLabelSink
+        from autolabel.task.video_segment_tracking_task import VideoSegmentTrackingTask
+
+        video_cfg = config.get('video', {})
+        chunk_size = video_cfg.get('chunk_size')
+        sink = FrameLabelSink(writer) if writer is not None else None
+        task = VideoSegmentTrackingTask(model, visualizer, chunk_size,
+                                        video_cfg.get('overlap', 1), sink)
+
+        if chunk_size:
+            # Track the whole video, reading frames as the chunks need them
+            task.set_data(source.frames())
+        else:
+            # Frames are passed to the model in memory, saving them is optional
+            frames = source.slice(video_cfg.get('duration', 2),
+                                  save_dir=video_cfg.get('save_dir'))
+            task.set_data(frames)
+        for prompt in prompts:
+            task.add_prompt(prompt)
         results = task.process()
     else:
         raise NotImplementedError(f'{task_type}')
 
 
-def autolabel(config_file):
+def autolabel(config_file, workers=1, resume=False, incremental=False):
     with open(config_file, 'r') as f:
         data = yaml.safe_load(f)
+    run_config(data, workers, resume, incremental)
+
+
+def run_config(data, workers=1, resume=False, incremental=False,
+               model_loader=None):
+    """Label with a loaded config
+
+    Args:
+        model_loader (callable): builds the model as `model_loader(checkpoint,
+            model_cfg, task_type, backend, options)`, e.g. `ModelCache.get` of a server,
+            `ModelFactory.create` by default
+    """
+    from autolabel.model.registry import backend_options, resolve_execution
+    from autolabel.pipeline.sharding import ShardedRunner
+    from autolabel.prompt.prompt import prompts_from_config
+    from autolabel.source.source_factory import IterSource, SourceFactory
 
     # task_type
     task_type = data['task_type']
+    data = resolve_execution(data)
+
+    # source
+    source = SourceFactory.create(data.get('source'))
+
+    output_dir = data.get('output', {}).get('dir')
+    if (resume or incremental) and not output_dir:
+        logging.warning("Resume needs `output.dir`, label all inputs")
+    elif resume or incremental:
+        # Unknown for a first run or a manifest older than fingerprints
+        fingerprint = read_fingerprint(Path(output_dir) / RunManifest.FILE_NAME)
+        if fingerprint is not None and fingerprint != run_fingerprint(data):
+            if resume:
+                # The outputs would mix the labels of two configs
+                raise RunChangedError(
+                    "Model, prompts or output format changed since the run in {}, "
+                    "resume it with its config or use --incremental".format(output_dir))
+            print("Model, prompts or output format changed since the last run, "
+                  "label all inputs")
+            incremental = False
+
+    if workers > 1:
+        if TaskType(task_type) == TaskType.IMAGE_SEGMENT \
+                and isinstance(source, IterSource):
+            # Each worker process builds its own model
+            runner_cfg = data.get('runner', {})
+            runner = ShardedRunner(data, workers,
+                                   retries=runner_cfg.get('retries', 1),
+                                   resume=resume, incremental=incremental)
+            runner.run(source)
+            return
+        logging.warning(
+            "Workers are only supported by image_segment over a directory, "
+            "glob or csv source, fall back to one process")
 
     # model
     model = data['model']['checkpoint']
     model_cfg = data['model'].get('model_cfg', None)
+    backend = data['model'].get('backend', None)
+    options = backend_options(data['model'])
     # todo(zero): According to the different tasks of the model,
     # a new parameter task_type is added, but the interface can be optimized
-    model = ModelFactory.create(model, model_cfg, task_type)
-
-    # source
-    source = SourceFactory.create(data.get('source'))
+    if model_loader is None:
+        from autolabel.model.model_factory import ModelFactory
+        model_loader = ModelFactory.create
+    model = model_loader(model, model_cfg, task_type, backend, options)
 
     # prompt
-    prompt_data = data.get('prompt', {})
-    prompt = Prompt(
-        prompt_data.get('point_coords', None),
-        prompt_data.get('point_labels', None),
-        prompt_data.get('box', None),
-        prompt_data.get('mask_input', None)
-    )
+    prompts, multi_object = prompts_from_config(data)
 
-    dispatch_task(task_type, model, source, prompt)
+    dispatch_task(task_type, model, source, prompts, data, multi_object,
+                  resume, incremental)
 
 
 def main(args=sys.argv):
@@ -114,9 +241,64 @@ def main(args=sys.argv):
     parser.add_argument(
         "-c", "--config", action="store", type=str, required=False,
         nargs='?', const="", help="config")
+    parser.add_argument(
+        "-w", "--workers", action="store", type=int, required=False,
+        default=1, help="number of worker processes, each with its own model")
+    parser.add_argument(
+        "-r", "--resume", action="store_true", required=False,
+        help="skip the inputs labeled by the previous run into output.dir")
+    parser.add_argument(
+        "-i", "--incremental", action="store_true", required=False,
+        help="only label the inputs new or changed since the previous run, "
+             "all of them if the model or config changed")
+
+    parser.add_argument(
+        "--serve", action="store", type=str, required=False, nargs='?',
+        const="", default=None, metavar="ADDRESS",
+        help="run a model server on [host:]port that keeps the models loaded "
+             "between jobs, localhost:{} by default".format(DEFAULT_PORT))
+    parser.add_argument(
+        "--server", action="store", type=str, required=False, nargs='?',
+        const="", default=None, metavar="ADDRESS",
+        help="run the config on the model server at [host:]port")
 
     args = parser.parse_args(args[1:])
 
+    if args.serve is not None:
+        from autolabel.server.model_server import ModelServer
+
+        host, port = parse_address(args.serve)
+        try:
+            server = ModelServer(host, port)
+        except ValueError as e:
+            logging.error(e)
+            sys.exit(1)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+        return
+
     # auto label
-    if args.config:
-        autolabel(args.config)
+    if args.config and args.server is not None:
+        from autolabel.server.client import ModelClient, ServerError
+
+        with open(args.config, 'r') as f:
+            data = yaml.safe_load(f)
+        if args.workers > 1:
+            logging.warning("Workers are not supported by the model server")
+        with ModelClient(args.server) as client:
+            try:
+                reply = client.submit(data, args.resume, args.incremental)
+            except ServerError as e:
+                logging.error("Job failed on the server! {}".format(e))
+                sys.exit(1)
+        print(reply['output'], end='')
+    elif args.config:
+        try:
+            autolabel(args.config, args.workers, args.resume, args.incremental)
+        except RunChangedError as e:
+            logging.error(e)
+            sys.exit(1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import http.server
+import threading
+
+import pytest
+
+from autolabel.source import downloader
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_root(tmp_path):
+    """Directory served by a local http server, as (directory, base url)
+    """
+    root = tmp_path / 'www'
+    root.mkdir()
+    handler = functools.partial(_QuietHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,),
+                              daemon=True)
+    thread.start()
+    yield root, "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def download_manager(tmp_path, monkeypatch):
+    """A download manager with its own cache, used by the url sources
+    """
+    manager = downloader.DownloadManager(
+        downloader.DownloadCache(tmp_path / 'downloads'), workers=4)
+    monkeypatch.setattr(downloader, '_default_manager', manager)
+    yield manager
+    manager.close()
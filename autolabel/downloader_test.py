@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+from autolabel.source import downloader
+from autolabel.source.downloader import DownloadCache, DownloadManager
+from autolabel.source.process import download_from_url
+
+
+def test_download_cache_key(http_root, tmp_path):
+    root, base_url = http_root
+    for name in ['a', 'b']:
+        (root / name).mkdir()
+        (root / name / 'image.jpg').write_bytes(name.encode() * 100)
+    with DownloadManager(DownloadCache(tmp_path / 'cache'), workers=2) as manager:
+        a = manager.download(base_url + '/a/image.jpg')
+        b = manager.download(base_url + '/b/image.jpg')
+        assert a != b and a.suffix == '.jpg'
+        assert a.read_bytes() == b'a' * 100 and b.read_bytes() == b'b' * 100
+
+        # A cached url is not downloaded again
+        (root / 'a' / 'image.jpg').unlink()
+        assert manager.download(base_url + '/a/image.jpg') == a
+
+
+def test_download_all(http_root, tmp_path):
+    root, base_url = http_root
+    urls = []
+    for i in range(20):
+        (root / '{}.jpg'.format(i)).write_bytes(bytes([i]) * 1000)
+        urls.append('{}/{}.jpg'.format(base_url, i))
+    urls.append(base_url + '/missing.jpg')
+    with DownloadManager(DownloadCache(tmp_path / 'cache'), workers=4) as manager:
+        results = list(manager.download_all(urls))
+    assert [url for url, _ in results] == urls
+    assert results[-1][1] is None
+    assert all(path.read_bytes() == bytes([i]) * 1000
+               for i, (_, path) in enumerate(results[:-1]))
+
+
+def test_download_cache_eviction(http_root, tmp_path):
+    root, base_url = http_root
+    for i in range(5):
+        (root / '{}.jpg'.format(i)).write_bytes(b'x' * 1000)
+    cache = DownloadCache(tmp_path / 'cache', max_bytes=3000, grace_seconds=60)
+    with DownloadManager(cache, workers=1) as manager:
+        paths = []
+        for i in range(5):
+            paths.append(manager.download('{}/{}.jpg'.format(base_url, i)))
+            os.utime(paths[-1], ns=(i * 10**9, i * 10**9))
+    assert [p.exists() for p in paths] == [False, False, True, True, True]
+    assert len(os.listdir(tmp_path / 'cache')) == 3
+
+
+def test_download_cache_keeps_recent_files(http_root, tmp_path):
+    root, base_url = http_root
+    for i in range(3):
+        (root / '{}.jpg'.format(i)).write_bytes(b'x' * 1000)
+    cache = DownloadCache(tmp_path / 'cache', max_bytes=1500, grace_seconds=60)
+    with DownloadManager(cache, workers=1) as manager:
+        a = manager.fetch(base_url + '/0.jpg')
+        # a may not be decoded yet, the cache stays over its limit
+        b = manager.fetch(base_url + '/1.jpg')
+        assert a.exists() and b.exists()
+        os.utime(a, ns=(0, 0))
+        manager.fetch(base_url + '/2.jpg')
+        assert not a.exists() and b.exists()
+
+
+def test_concurrent_fetches_download_once(http_root, download_manager, monkeypatch):
+    root, base_url = http_root
+    (root / 'a.jpg').write_bytes(b'a' * 100000)
+    url = base_url + '/a.jpg'
+    gets = []
+    session_get = download_manager._session.get
+
+    def counting_get(*args, **kwargs):
+        gets.append(args[0])
+        return session_get(*args, **kwargs)
+
+    monkeypatch.setattr(download_manager._session, 'get', counting_get)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        barrier.wait()
+        results.append(download_from_url(url))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert gets == [url]
+    assert results == [str(download_manager.cache.path(url))] * 8
+    assert downloader.default_manager() is download_manager
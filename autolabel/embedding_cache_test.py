@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from autolabel.model.embedding_cache import EmbeddingCache  # noqa: E402
+
+FEAT_SIZES = [(4, 4), (2, 2), (1, 1)]
+
+
+class StubModel:
+    image_size = 16
+    directly_add_no_mem_embed = False
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def forward_image(self, input_image):
+        self.calls += 1
+        return input_image
+
+    def _prepare_backbone_features(self, backbone_out):
+        # The features of the n-th call are filled with n
+        vision_feats = [torch.full((h * w, 1, 2), float(self.calls))
+                        for h, w in FEAT_SIZES]
+        return None, vision_feats, None, None
+
+
+class StubPredictor:
+    """The parts of `SAM2ImagePredictor` the cache and `set_image` use
+    """
+    _bb_feat_sizes = FEAT_SIZES
+    _transforms = None
+
+    def __init__(self) -> None:
+        self.model = StubModel()
+        self.device = torch.device("cpu")
+        self.reset_predictor()
+
+    def reset_predictor(self):
+        self._features = None
+        self._orig_hw = None
+        self._is_image_set = False
+        self._is_batch = False
+
+
+def _embed(predictor):
+    return predictor._features["image_embed"].flatten()[0].item()
+
+
+def test_embedding_cache_hits(tmp_path):
+    predictor = StubPredictor()
+    image = np.zeros((8, 12, 3), dtype=np.uint8)
+    cache = EmbeddingCache("model", tmp_path, capacity=2)
+    a, b, c = (cache.key_from_digest(digest) for digest in "abc")
+
+    cache.set_image(predictor, image, a)
+    cache.set_image(predictor, image, a, orig_hw=(80, 120))
+    assert predictor.model.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    # The size of the first image is cached with its embedding
+    assert predictor._orig_hw == [(8, 12)] and predictor._is_image_set
+    assert _embed(predictor) == 1
+
+    # Written with an atomic rename, no temporary file is left
+    assert [p.name for p in tmp_path.rglob("*")
+            if p.is_file()] == ["{}.pt".format(a)]
+
+    # b and c evict a from memory, it is loaded back from disk
+    cache.set_image(predictor, image, b)
+    cache.set_image(predictor, image, c)
+    cache.set_image(predictor, image, a)
+    assert predictor.model.calls == 3
+    assert (cache.hits, cache.disk_hits, cache.misses) == (2, 1, 3)
+    assert _embed(predictor) == 1
+    assert cache.summary() == "embedding cache hits: 2 (disk: 1), misses: 3"
+
+    # Another cache on the same directory starts from the disk
+    other = EmbeddingCache("model", tmp_path)
+    other.set_image(predictor, image, c)
+    assert predictor.model.calls == 3 and other.disk_hits == 1
+    assert _embed(predictor) == 3
+
+
+def test_embedding_cache_in_memory():
+    predictor = StubPredictor()
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    cache = EmbeddingCache("model", capacity=1)
+    a, b = cache.key_from_digest("a"), cache.key_from_digest("b")
+    for key in (a, b, a):
+        cache.set_image(predictor, image, key)
+    # Without a directory the evicted embedding is computed again
+    assert predictor.model.calls == 3 and cache.misses == 3
+
+    # Images without a key are always encoded
+    cache.set_image(predictor, image)
+    cache.set_image(predictor, image)
+    assert predictor.model.calls == 5 and cache.hits == 0
+
+
+def test_embedding_cache_key():
+    assert EmbeddingCache("a").key_from_digest("x") != \
+        EmbeddingCache("b").key_from_digest("x")
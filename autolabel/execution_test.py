@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from autolabel.model.execution import ExecutionConfig  # noqa: E402
+from autolabel.model.registry import REGISTRY  # noqa: E402
+
+
+def test_resolve_within_capabilities():
+    capabilities = REGISTRY.get('onnx').capabilities
+    config = ExecutionConfig.resolve({'dtype': 'bfloat16'}, capabilities)
+    assert config.device.type == 'cpu' and config.dtype == 'float32'
+    assert not config.tf32
+    with pytest.raises(ValueError, match='not supported'):
+        ExecutionConfig.resolve({'device': 'cuda'}, capabilities)
+
+
+def test_inference_is_local():
+    threads = torch.get_num_threads()
+    config = ExecutionConfig('cpu', 'bfloat16', threads=1)
+    with config.inference():
+        assert torch.get_num_threads() == 1
+        assert torch.is_inference_mode_enabled()
+        assert torch.is_autocast_cpu_enabled()
+    assert torch.get_num_threads() == threads
+    assert not torch.is_autocast_cpu_enabled()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from PIL import Image
+
+from autolabel.source.image_decoder import decode_image, decode_image_reduced, pil_to_rgb
+
+
+def test_decode_image_matches_pil(tmp_path):
+    file_path = 'autolabel/images/truck.jpg'
+    timings = {}
+    image = decode_image(file_path, timings)
+    with Image.open(file_path) as img:
+        expected = np.array(img.convert("RGB"))
+    assert image.flags['C_CONTIGUOUS'] and image.dtype == np.uint8
+    assert np.array_equal(image, expected)
+    assert set(timings) == {"read", "decode", "convert"}
+
+    # Gray and alpha images are decoded to RGB too
+    Image.fromarray(expected).convert("LA").save(tmp_path / 'gray.png')
+    with Image.open(tmp_path / 'gray.png') as img:
+        expected = pil_to_rgb(img)
+    assert np.array_equal(decode_image(str(tmp_path / 'gray.png')), expected)
+
+
+def test_decode_image_reduced(tmp_path):
+    image = np.zeros((2400, 2200, 3), dtype=np.uint8)
+    image[:1200] = 255
+    Image.fromarray(image).save(tmp_path / 'image.jpg')
+    Image.fromarray(image).save(tmp_path / 'image.png')
+
+    reduced, orig_hw = decode_image_reduced(str(tmp_path / 'image.jpg'), 1024)
+    assert reduced.shape == (1200, 1100, 3) and orig_hw == (2400, 2200)
+    assert reduced[:590].min() > 250 and reduced[610:].max() < 5
+    reduced, orig_hw = decode_image_reduced(str(tmp_path / 'image.jpg'), 2000)
+    assert reduced.shape == (2400, 2200, 3)
+    # Only jpegs are scaled while they are decoded
+    reduced, orig_hw = decode_image_reduced(str(tmp_path / 'image.png'), 256)
+    assert reduced.shape == (2400, 2200, 3) and orig_hw == (2400, 2200)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sam2")
+
+from autolabel.prompt.prompt import Prompt  # noqa: E402
+from autolabel.task.image_segment_task import ImageSegmentTask  # noqa: E402
+
+
+def _task(prompts):
+    # The prompts are checked before the predictor is used
+    task = ImageSegmentTask.__new__(ImageSegmentTask)
+    task._prompts = prompts
+    return task
+
+
+@pytest.mark.parametrize("point_labels, message", [
+    (None, "Prompt 1 has 2 point coords but 0 point labels"),
+    ([1], "Prompt 1 has 2 point coords but 1 point labels"),
+])
+def test_point_labels_checked(point_labels, message):
+    task = _task([Prompt([[1, 2]], [1], None, None),
+                  Prompt([[3, 4], [5, 6]], point_labels, None, None)])
+    with pytest.raises(ValueError, match=message):
+        task._predict_objects()
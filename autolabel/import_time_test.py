@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+# Imported by the tasks and sources that need them, never by the cli itself
+HEAVY_MODULES = ('torch', 'sam2', 'cv2', 'numpy', 'PIL', 'requests')
+
+
+def _imported_heavy_modules(code):
+    result = subprocess.run(
+        [sys.executable, '-c', code + '\nimport sys\nprint("heavy:" + ",".join('
+         'm for m in {} if m in sys.modules))'.format(HEAVY_MODULES)],
+        capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[-1][len("heavy:"):]
+
+
+def test_cli_imports_no_heavy_modules():
+    assert _imported_heavy_modules('import autolabel.cmd') == ''
+    assert _imported_heavy_modules(
+        'import autolabel.cmd\n'
+        'try:\n'
+        '    autolabel.cmd.main(["autolabel", "--help"])\n'
+        'except SystemExit:\n'
+        '    pass') == ''
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+def _counts_to_string(counts) -> str:
+    # The compressed counts of the COCO api, each count is the difference to
+    # the count two runs before, written 5 bits per char
+    chars = []
+    for i, x in enumerate(int(c) for c in counts):
+        if i > 2:
+            x -= int(counts[i - 2])
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return ''.join(chars)
+
+
+def _counts_from_string(s: str) -> np.ndarray:
+    counts = []
+    p = 0
+    while p < len(s):
+        x, k, more = 0, 0, True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1f) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return np.array(counts, dtype=np.uint32)
+
+
+class RLEMask:
+    """Binary mask stored as COCO run-length encoding
+
+    Pixels are read in column major order, `counts` alternates the lengths
+    of background and foreground runs starting with background. Area, bbox
+    and the set operations work on the runs without decoding the mask.
+    """
+
+    def __init__(self, counts, size) -> None:
+        self.counts = np.asarray(counts, dtype=np.uint32)
+        # (height, width) like the COCO api
+        self.size = (int(size[0]), int(size[1]))
+
+    @staticmethod
+    def encode(mask: np.ndarray) -> 'RLEMask':
+        """Encode a (H, W) mask, non-zero pixels are foreground
+        """
+        mask = np.asarray(mask)
+        if mask.ndim != 2:
+            raise ValueError(
+                "Mask must be 2 dimensional, got shape {}".format(mask.shape))
+        flat = mask.ravel(order='F') != 0
+        if flat.size == 0:
+            return RLEMask([0], mask.shape)
+        changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+        if flat[0]:
+            counts = np.concatenate(([0], counts))
+        return RLEMask(counts, mask.shape)
+
+    def decode(self) -> np.ndarray:
+        """The (H, W) bool mask
+        """
+        values = (np.arange(len(self.counts)) & 1).astype(bool)
+        flat = np.repeat(values, self.counts)
+        return np.ascontiguousarray(flat.reshape(self.size, order='F'))
+
+    @property
+    def shape(self):
+        return self.size
+
+    def area(self) -> int:
+        return int(self.counts[1::2].sum(dtype=np.int64))
+
+    def bbox(self):
+        """Bounding box [x, y, width, height] of the foreground
+        """
+        h = self.size[0]
+        starts, ends = self._runs()
+        if len(starts) == 0:
+            return [0, 0, 0, 0]
+        last = ends - 1
+        x_min, x_max = starts.min() // h, last.max() // h
+        # A run over several columns covers the first and the last row
+        multi_column = starts // h != last // h
+        y_min = 0 if multi_column.any() else (starts % h).min()
+        y_max = h - 1 if multi_column.any() else (last % h).max()
+        return [int(x_min), int(y_min),
+                int(x_max - x_min + 1), int(y_max - y_min + 1)]
+
+    def contains(self, x: int, y: int) -> bool:
+        """Whether pixel (x, y) is foreground
+        """
+        h, w = self.size
+        if not (0 <= x < w and 0 <= y < h):
+            return False
+        ends = np.cumsum(self.counts, dtype=np.int64)
+        return bool(np.searchsorted(ends, x * h + y, side='right') & 1)
+
+    def union(self, other: 'RLEMask') -> 'RLEMask':
+        return self._merge(other, np.logical_or)
+
+    def intersect(self, other: 'RLEMask') -> 'RLEMask':
+        return self._merge(other, np.logical_and)
+
+    def subtract(self, other: 'RLEMask') -> 'RLEMask':
+        return self._merge(other, lambda a, b: a & ~b)
+
+    __or__ = union
+    __and__ = intersect
+    __sub__ = subtract
+
+    def to_coco(self) -> dict:
+        """Compressed RLE as written in COCO annotations
+        """
+        return {'size': list(self.size), 'counts': _counts_to_string(self.counts)}
+
+    @staticmethod
+    def from_coco(rle: dict) -> 'RLEMask':
+        counts = rle['counts']
+        if isinstance(counts, bytes):
+            counts = counts.decode('ascii')
+        if isinstance(counts, str):
+            counts = _counts_from_string(counts)
+        return RLEMask(counts, rle['size'])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RLEMask):
+            return NotImplemented
+        return self.size == other.size and \
+            np.array_equal(self._canonical(), other._canonical())
+
+    def __repr__(self) -> str:
+        return "RLEMask(size={}, area={})".format(self.size, self.area())
+
+    def _runs(self):
+        # Start and end (exclusive) of the foreground runs
+        ends = np.cumsum(self.counts, dtype=np.int64)
+        starts = ends - self.counts
+        return starts[1::2], ends[1::2]
+
+    def _canonical(self):
+        # Runs with empty runs dropped and neighbouring runs joined
+        return self._merge(self, np.logical_or).counts
+
+    def _merge(self, other, op):
+        if self.size != other.size:
+            raise ValueError("Mask size {} and {} mismatch".format(
+                self.size, other.size))
+        self_ends = np.cumsum(self.counts, dtype=np.int64)
+        other_ends = np.cumsum(other.counts, dtype=np.int64)
+        # Intervals on which both masks are constant
+        ends = np.union1d(self_ends, other_ends)
+        ends = ends[ends > 0]
+        if len(ends) == 0:
+            return RLEMask([0], self.size)
+        values = op(np.searchsorted(self_ends, ends, side='left') & 1 == 1,
+                    np.searchsorted(other_ends, ends, side='left') & 1 == 1)
+        # Join neighbouring intervals of the same value into runs
+        run_ends = np.append(ends[:-1][values[1:] != values[:-1]], ends[-1])
+        counts = np.diff(run_ends, prepend=0)
+        if values[0]:
+            counts = np.concatenate(([0], counts))
+        return RLEMask(counts, self.size)
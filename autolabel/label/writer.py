@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import json
+import logging
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from autolabel.label.rle import RLEMask
+from autolabel.pipeline.manifest import open_append
+
+
+class LabelRecord:
+    """Labels of one image or video frame
+
+    Args:
+        file_name (str): the labeled file
+        height (int): image height
+        width (int): image width
+        masks (List[RLEMask]): one mask per object
+        scores (List[float], optional): score of each mask
+        category_ids (List[int], optional): category of each mask, 0 based,
+            all 0 by default
+        track_ids (List[int], optional): object id of each mask in a video
+        name (str, optional): output name of writers writing a file per
+            record, e.g. the path relative to the source root without suffix
+    """
+
+    def __init__(self, file_name, height, width, masks, scores=None,
+                 category_ids=None, track_ids=None, name=None) -> None:
+        self.file_name = str(file_name)
+        self.height = int(height)
+        self.width = int(width)
+        self.masks = masks
+        self.scores = scores
+        self.category_ids = category_ids or [0] * len(masks)
+        self.track_ids = track_ids
+        self.name = name or Path(self.file_name).stem
+
+    def to_dict(self) -> dict:
+        annotations = []
+        for i, (mask, category_id) in enumerate(zip(self.masks, self.category_ids)):
+            annotation = {
+                'category_id': int(category_id),
+                'segmentation': mask.to_coco(),
+                'area': mask.area(),
+                'bbox': mask.bbox(),
+            }
+            if self.scores is not None:
+                annotation['score'] = float(self.scores[i])
+            if self.track_ids is not None:
+                annotation['track_id'] = int(self.track_ids[i])
+            annotations.append(annotation)
+        return {
+            'file_name': self.file_name,
+            'name': self.name,
+            'height': self.height,
+            'width': self.width,
+            'annotations': annotations,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'LabelRecord':
+        annotations = data['annotations']
+        scores = [a['score'] for a in annotations] \
+            if annotations and 'score' in annotations[0] else None
+        track_ids = [a['track_id'] for a in annotations] \
+            if annotations and 'track_id' in annotations[0] else None
+        return LabelRecord(
+            data['file_name'], data['height'], data['width'],
+            [RLEMask.from_coco(a['segmentation']) for a in annotations],
+            scores, [a['category_id'] for a in annotations], track_ids,
+            data.get('name'))
+
+
+def mask_to_polygon(mask: RLEMask):
+    """Outer contour of the largest region of a mask
+
+    Returns:
+        np.ndarray: (N, 2) points x, y, empty if the mask is empty
+    """
+    contours, _ = cv2.findContours(mask.decode().astype(np.uint8),
+                                   cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.zeros((0, 2), dtype=np.int32)
+    return max(contours, key=cv2.contourArea).reshape(-1, 2)
+
+
+class LabelWriter(metaclass=abc.ABCMeta):
+    """Write label records as they are produced
+
+    Records are buffered and written every `buffer_size` records, only
+    appending to the outputs, so a crashed run loses at most the records in
+    the buffer.
+    """
+
+    def __init__(self, output_dir, buffer_size: int = 64) -> None:
+        if buffer_size <= 0:
+            raise ValueError("Buffer size must be positive")
+        self._output_dir = Path(output_dir)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._flush_callbacks = []
+        self.count = 0
+
+    @property
+    def output_dir(self) -> Path:
+        return self._output_dir
+
+    def on_flush(self, callback):
+        """Call `callback()` each time the buffered records are written
+        """
+        self._flush_callbacks.append(callback)
+
+    @abc.abstractmethod
+    def output_of(self, record: LabelRecord) -> str:
+        """File the labels of a record are written to
+        """
+
+    def write(self, record: LabelRecord):
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            records, self._buffer = self._buffer, []
+            self._write_records(records)
+        for callback in self._flush_callbacks:
+            callback()
+
+    def merge(self, jsonl_path):
+        """Write the records of a JSONL file, e.g. written by a worker
+        """
+        self.flush()
+        with open(jsonl_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    self.write(LabelRecord.from_dict(json.loads(line)))
+
+    @abc.abstractmethod
+    def _write_records(self, records):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlWriter(LabelWriter):
+    """One json line per record in `file_name`, masks as COCO RLE
+
+    Appending runs may label a file again, its latest record is the valid
+    one.
+    """
+
+    def __init__(self, output_dir, buffer_size: int = 64,
+                 file_name: str = 'labels.jsonl', append: bool = False) -> None:
+        super().__init__(output_dir, buffer_size)
+        self.path = self._output_dir / file_name
+        self._file = open_append(self.path) if append else open(self.path, 'w')
+
+    def output_of(self, record):
+        return str(self.path)
+
+    def _write_records(self, records):
+        self._file.write(''.join(
+            json.dumps(record.to_dict()) + '\n' for record in records))
+        # Hand the buffer to the OS, a crash of the process loses nothing
+        self._file.flush()
+
+    def merge(self, jsonl_path):
+        # Same format, copy the lines without decoding the masks
+        self.flush()
+        with open(jsonl_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    self._file.write(line if line.endswith('\n') else line + '\n')
+                    self.count += 1
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class YoloSegWriter(LabelWriter):
+    """YOLO segmentation labels, "<name>.txt" per record in `labels`
+
+    Each line is the category followed by the normalized polygon of the
+    largest region of a mask.
+    """
+
+    def output_of(self, record):
+        return str(self._output_dir / 'labels' / '{}.txt'.format(record.name))
+
+    def _write_records(self, records):
+        for record in records:
+            file_path = Path(self.output_of(record))
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            lines = []
+            for mask, category_id in zip(record.masks, record.category_ids):
+                polygon = mask_to_polygon(mask)
+                if len(polygon) < 3:
+                    continue
+                coords = polygon / np.array([record.width, record.height])
+                lines.append(' '.join(
+                    [str(category_id)] + ['{:.6f}'.format(v) for v in coords.ravel()]))
+            with open(file_path, 'w') as f:
+                f.write(''.join(line + '\n' for line in lines))
+
+
+class CocoWriter(LabelWriter):
+    """COCO instance segmentation json `file_name`
+
+    A COCO file is one json document, so records are appended to a JSONL
+    spool while labeling and the document is assembled from it on close,
+    reading the spool twice instead of holding the annotations in memory.
+    The spool is kept, so an appending writer continues a finished or
+    crashed run and `assemble` can rebuild the document at any time.
+    Category ids are the record categories plus 1.
+    """
+
+    def __init__(self, output_dir, buffer_size: int = 64,
+                 file_name: str = 'annotations.json', append: bool = False) -> None:
+        super().__init__(output_dir, buffer_size)
+        self.path = self._output_dir / file_name
+        self._spool = JsonlWriter(output_dir, buffer_size,
+                                  '.{}.jsonl'.format(file_name), append)
+
+    def output_of(self, record):
+        return str(self.path)
+
+    def _write_records(self, records):
+        for record in records:
+            self._spool.write(record)
+        self._spool.flush()
+
+    def merge(self, jsonl_path):
+        self.flush()
+        self._spool.merge(jsonl_path)
+
+    def close(self):
+        super().close()
+        self._spool.close()
+        CocoWriter.assemble(self._spool.path, self.path)
+
+    @staticmethod
+    def assemble(spool_path, output_path):
+        """Write the COCO document of the records in a JSONL spool
+
+        A file labeled again, e.g. by an incremental run, keeps only its
+        latest record.
+        """
+        latest = {}
+        with open(spool_path, 'r') as f:
+            for i, record in enumerate(_read_jsonl(f)):
+                latest[record['file_name']] = i
+
+        def latest_records():
+            with open(spool_path, 'r') as f:
+                for i, record in enumerate(_read_jsonl(f)):
+                    if latest[record['file_name']] == i:
+                        yield record
+
+        tmp_path = Path('{}.tmp'.format(output_path))
+        category_ids = set()
+        with open(tmp_path, 'w') as out:
+            out.write('{"images": [')
+            for image_id, record in enumerate(latest_records(), start=1):
+                out.write('' if image_id == 1 else ', ')
+                json.dump({
+                    'id': image_id,
+                    'file_name': record['file_name'],
+                    'height': record['height'],
+                    'width': record['width'],
+                }, out)
+            out.write('], "annotations": [')
+            annotation_id = 0
+            for image_id, record in enumerate(latest_records(), start=1):
+                for annotation in record['annotations']:
+                    annotation_id += 1
+                    category_ids.add(annotation['category_id'])
+                    out.write('' if annotation_id == 1 else ', ')
+                    json.dump(dict(annotation, id=annotation_id,
+                                   image_id=image_id, iscrowd=0,
+                                   category_id=annotation['category_id'] + 1), out)
+            out.write('], "categories": ')
+            json.dump([{'id': i + 1, 'name': str(i)} for i in sorted(category_ids)], out)
+            out.write('}')
+        os.replace(tmp_path, output_path)
+
+
+def _read_jsonl(f):
+    for line in f:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # The last line of a crashed run may be cut
+                logging.warning("Skip broken label record in {}".format(f.name))
+
+
+class WriterFactory:
+    @staticmethod
+    def create(cfg, output_dir=None, append: bool = False) -> LabelWriter:
+        """Create a writer from the `output` config section
+
+        Args:
+            cfg (dict): `format` is one of "jsonl", "coco" or "yolo",
+                `buffer_size` records are written at a time
+            output_dir (str, optional): overrides `dir` of the section
+            append (bool): continue the outputs of a previous run
+
+        Returns:
+            LabelWriter: the writer, None if there is no output directory
+        """
+        cfg = cfg or {}
+        output_dir = output_dir or cfg.get('dir')
+        if not output_dir:
+            return None
+        fmt = cfg.get('format', 'jsonl')
+        buffer_size = cfg.get('buffer_size', 64)
+        if fmt == 'jsonl':
+            return JsonlWriter(output_dir, buffer_size, append=append)
+        elif fmt == 'coco':
+            return CocoWriter(output_dir, buffer_size, append=append)
+        elif fmt == 'yolo':
+            return YoloSegWriter(output_dir, buffer_size)
+        else:
+            raise ValueError(f"Output format '{fmt}' is not supported.")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import numpy as np
+import pytest
+
+from autolabel.label.rle import RLEMask
+from autolabel.label.writer import (CocoWriter, JsonlWriter, LabelRecord,
+                                    WriterFactory, YoloSegWriter)
+
+
+def _record(name, num_masks=2):
+    masks = []
+    for i in range(num_masks):
+        mask = np.zeros((10, 20), dtype=bool)
+        mask[2:6, 4 * i:4 * i + 3] = True
+        masks.append(RLEMask.encode(mask))
+    return LabelRecord('/data/{}.jpg'.format(name), 10, 20, masks, name=name)
+
+
+def _read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_record_round_trip():
+    record = _record('a')
+    record.scores = [0.5, 0.25]
+    loaded = LabelRecord.from_dict(json.loads(json.dumps(record.to_dict())))
+    assert loaded.file_name == record.file_name
+    assert loaded.masks == record.masks
+    assert loaded.scores == [0.5, 0.25]
+    assert record.to_dict()['annotations'][0]['bbox'] == [0, 2, 3, 4]
+
+
+def test_jsonl_buffered(tmp_path):
+    writer = JsonlWriter(tmp_path, buffer_size=2)
+    writer.write(_record('a'))
+    # Buffered until it is full
+    assert _read_jsonl(writer.path) == []
+    writer.write(_record('b'))
+    assert [r['name'] for r in _read_jsonl(writer.path)] == ['a', 'b']
+    writer.write(_record('c'))
+    writer.close()
+    assert [r['name'] for r in _read_jsonl(writer.path)] == ['a', 'b', 'c']
+
+
+def test_jsonl_merge(tmp_path):
+    with JsonlWriter(tmp_path / 'shard', file_name='labels-0.jsonl') as shard:
+        shard.write(_record('a'))
+    with JsonlWriter(tmp_path) as writer:
+        writer.merge(shard.path)
+        writer.write(_record('b'))
+    assert [r['name'] for r in _read_jsonl(writer.path)] == ['a', 'b']
+
+
+def test_coco(tmp_path):
+    with CocoWriter(tmp_path, buffer_size=1) as writer:
+        writer.write(_record('a'))
+        writer.write(_record('b', num_masks=1))
+    with open(tmp_path / 'annotations.json') as f:
+        coco = json.load(f)
+    assert [image['id'] for image in coco['images']] == [1, 2]
+    assert [a['id'] for a in coco['annotations']] == [1, 2, 3]
+    assert [a['image_id'] for a in coco['annotations']] == [1, 1, 2]
+    assert coco['categories'] == [{'id': 1, 'name': '0'}]
+    mask = RLEMask.from_coco(coco['annotations'][0]['segmentation'])
+    assert mask == _record('a').masks[0]
+
+    # Appending continues the finished run
+    with CocoWriter(tmp_path, append=True) as writer:
+        writer.write(_record('c'))
+    with open(tmp_path / 'annotations.json') as f:
+        coco = json.load(f)
+    assert [image['id'] for image in coco['images']] == [1, 2, 3]
+
+
+def test_coco_latest_record(tmp_path):
+    with CocoWriter(tmp_path) as writer:
+        writer.write(_record('a'))
+        writer.write(_record('b'))
+        # Labeled again, e.g. by an incremental run
+        writer.write(_record('a', num_masks=1))
+    with open(tmp_path / 'annotations.json') as f:
+        coco = json.load(f)
+    assert [image['file_name'] for image in coco['images']] == \
+        ['/data/b.jpg', '/data/a.jpg']
+    assert [a['image_id'] for a in coco['annotations']] == [1, 1, 2]
+
+
+def test_yolo(tmp_path):
+    with YoloSegWriter(tmp_path) as writer:
+        writer.write(_record('sub/a'))
+    with open(tmp_path / 'labels' / 'sub' / 'a.txt') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    values = [float(v) for v in lines[0].split()]
+    assert values[0] == 0
+    assert all(0 <= v <= 1 for v in values[1:])
+
+
+def test_factory(tmp_path):
+    assert WriterFactory.create({}) is None
+    writer = WriterFactory.create({'dir': str(tmp_path), 'format': 'yolo'})
+    assert isinstance(writer, YoloSegWriter)
+    with pytest.raises(ValueError):
+        WriterFactory.create({'dir': str(tmp_path), 'format': 'voc'})
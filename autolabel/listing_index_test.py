@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+
+from autolabel.source import listing_index
+from autolabel.source.listing_index import ListingIndex
+from autolabel.source.walker import DirWalker
+
+
+def _make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+
+
+def _old_mtimes(root):
+    # Directories changed just now are always listed again
+    for dir_path, _, _ in os.walk(root):
+        os.utime(dir_path, ns=(10**18, 10**18))
+
+
+def test_index_matches_walk(tmp_path):
+    root = tmp_path / 'data'
+    _make_tree(root, ['b.jpg', 'a.jpg', 'a/2.png', 'a/x/1.jpg', 'a-b/c.jpg',
+                      'cache/d.jpg', 'notes.txt'])
+    with ListingIndex(tmp_path / 'index.db', root) as index:
+        index.refresh()
+        for options in [{}, {'include': '*.jpg'}, {'exclude': ['cache', 'x']},
+                        {'max_depth': 0}]:
+            walked = [e.path for e in DirWalker(root, **options)
+                      if not e.name.endswith('.txt')]
+            assert [p for p, _ in index.files(**options)] == walked
+
+
+def test_index_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(listing_index, 'RECENT_NS', 0)
+    root = tmp_path / 'data'
+    _make_tree(root, ['a/1.jpg', 'b/2.jpg', 'b/c/3.jpg'])
+    _old_mtimes(root)
+    db_path = tmp_path / 'index.db'
+    with ListingIndex(db_path, root) as index:
+        assert index.refresh() == (4, 0)
+    with ListingIndex(db_path, root) as index:
+        assert index.refresh() == (0, 4)
+
+        (root / 'a' / '0.jpg').write_text('')
+        shutil.rmtree(root / 'b' / 'c')
+        assert index.refresh() == (2, 1)
+        assert [os.path.relpath(p, root) for p, _ in index.files()] == [
+            os.path.join('a', '0.jpg'), os.path.join('a', '1.jpg'),
+            os.path.join('b', '2.jpg')]
+
+
+def test_index_symlinks(tmp_path):
+    root = tmp_path / 'data'
+    _make_tree(tmp_path, ['data/a.jpg', 'other/b.jpg'])
+    os.symlink(tmp_path / 'other', root / 'linked')
+    os.symlink(root, root / 'loop')
+    with ListingIndex(tmp_path / 'index.db', root) as index:
+        index.refresh()
+        assert [p for p, _ in index.files()] == [e.path for e in DirWalker(root)]
+        assert [os.path.relpath(p, root) for p, _ in index.files()] == [
+            'a.jpg', os.path.join('linked', 'b.jpg')]
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from autolabel.cmd import run_config
+from autolabel.label.rle import RLEMask
+from autolabel.label.writer import JsonlWriter
+from autolabel.pipeline.batch_runner import BatchRunner
+from autolabel.pipeline.manifest import (ManifestEntry, RunChangedError, RunManifest,
+                                         open_append, read_fingerprint,
+                                         run_fingerprint)
+from autolabel.source.source_factory import SourceFactory
+
+
+class FakeTask:
+    def __init__(self) -> None:
+        self.names = []
+
+    def set_data(self, data, cache_key=None, name=None, orig_hw=None):
+        self._data = data
+        self.names.append(name)
+
+    def process(self):
+        return [RLEMask.encode(np.ones(self._data.shape[:2]))]
+
+
+def _image_dir(tmp_path, count=3):
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    for i in range(count):
+        shutil.copy('autolabel/images/truck.jpg', image_dir / '{}.jpg'.format(i))
+    return image_dir
+
+
+def _run(image_dir, output_dir, resume, incremental=False):
+    task = FakeTask()
+    writer = JsonlWriter(output_dir, buffer_size=2, append=resume)
+    with RunManifest(output_dir / RunManifest.FILE_NAME, resume, 'abc') as manifest:
+        runner = BatchRunner(task, writer, prefetch=0, manifest=manifest,
+                             incremental=incremental)
+        stats = runner.run_items(
+            SourceFactory.create(str(image_dir)), root=image_dir)
+        writer.close()
+    return task, stats
+
+
+def test_manifest_resume(tmp_path):
+    path = tmp_path / RunManifest.FILE_NAME
+    with RunManifest(path) as manifest:
+        manifest.add(ManifestEntry('a.jpg', 1, 2, 'abc', 'labels.jsonl'))
+        assert 'a.jpg' in manifest
+    # A run killed while writing leaves a cut line
+    with open(path, 'a') as f:
+        f.write('{"path": "b.j')
+
+    manifest = RunManifest(path, resume=True)
+    assert 'a.jpg' in manifest
+    assert 'b.jpg' not in manifest
+    assert manifest.get('a.jpg').digest == 'abc'
+    manifest.close()
+
+    # Without resume the previous entries are dropped
+    with RunManifest(path) as manifest:
+        assert len(manifest) == 0
+
+
+def test_batch_runner_resume(tmp_path):
+    image_dir = _image_dir(tmp_path)
+    output_dir = tmp_path / 'output'
+    task, stats = _run(image_dir, output_dir, resume=False)
+    assert sorted(task.names) == ['0', '1', '2']
+    assert stats.processed == 3
+
+    manifest = RunManifest(output_dir / RunManifest.FILE_NAME, resume=True)
+    entry = manifest.get(str(image_dir / '0.jpg'))
+    assert entry.output == str(output_dir / 'labels.jsonl')
+    assert entry.size == (image_dir / '0.jpg').stat().st_size
+    manifest.close()
+
+    shutil.copy(image_dir / '0.jpg', image_dir / '3.jpg')
+    task, stats = _run(image_dir, output_dir, resume=True)
+    assert task.names == ['3']
+    assert stats.skipped == 3
+    with open(output_dir / 'labels.jsonl') as f:
+        assert len(f.readlines()) == 4
+
+
+def test_resume_after_cut_line(tmp_path):
+    image_dir = _image_dir(tmp_path)
+    output_dir = tmp_path / 'output'
+    _run(image_dir, output_dir, resume=False)
+    # A run killed while writing leaves cut last lines
+    with open(output_dir / 'labels.jsonl', 'a') as f:
+        f.write('{"file_name": "' + str(image_dir / '9.jpg'))
+    with open(output_dir / RunManifest.FILE_NAME, 'a') as f:
+        f.write('{"path": "' + str(image_dir / '9.jpg'))
+
+    shutil.copy(image_dir / '0.jpg', image_dir / '3.jpg')
+    task, stats = _run(image_dir, output_dir, resume=True)
+    assert task.names == ['3']
+    with open(output_dir / 'labels.jsonl') as f:
+        assert [json.loads(line)['file_name'] for line in f] == [
+            str(image_dir / '{}.jpg'.format(i)) for i in range(4)]
+    with RunManifest(output_dir / RunManifest.FILE_NAME, resume=True) as manifest:
+        assert str(image_dir / '3.jpg') in manifest
+        assert str(image_dir / '9.jpg') not in manifest
+
+
+def test_open_append(tmp_path):
+    path = tmp_path / 'lines.jsonl'
+    for content, kept in [(b'', b''), (b'a\n', b'a\n'), (b'a\nb', b'a\n'),
+                          (b'cut', b'')]:
+        path.write_bytes(content)
+        with open_append(path) as f:
+            f.write('c\n')
+        assert path.read_bytes() == kept + b'c\n'
+
+
+def test_incremental(tmp_path):
+    image_dir = _image_dir(tmp_path)
+    output_dir = tmp_path / 'output'
+    _run(image_dir, output_dir, resume=False)
+    assert read_fingerprint(output_dir / RunManifest.FILE_NAME) == 'abc'
+
+    # Touched but the same content, hashed once and skipped
+    os.utime(image_dir / '0.jpg', ns=(1, 1))
+    # Modified
+    shutil.copy('autolabel/images/cars.jpg', image_dir / '1.jpg')
+    task, stats = _run(image_dir, output_dir, resume=True, incremental=True)
+    assert task.names == ['1']
+    assert stats.skipped == 2
+    assert stats.full_run_estimate() is not None
+
+    manifest = RunManifest(output_dir / RunManifest.FILE_NAME, resume=True)
+    assert manifest.get(str(image_dir / '0.jpg')).mtime_ns == 1
+    assert manifest.unchanged(image_dir / '1.jpg')
+    manifest.close()
+
+
+def test_run_fingerprint():
+    config = {'task_type': 'image_segment', 'model': {'checkpoint': 'x.pt'},
+              'prompt': {'point_coords': [[1, 2]]}}
+    fingerprint = run_fingerprint(config)
+    assert fingerprint == run_fingerprint(dict(config, vis={'mode': 'none'}))
+    assert fingerprint != run_fingerprint(
+        dict(config, prompt={'point_coords': [[1, 3]]}))
+    assert fingerprint != run_fingerprint(
+        dict(config, output={'format': 'coco'}))
+
+
+def test_run_fingerprint_execution(tmp_path):
+    checkpoint = tmp_path / 'sam2.pt'
+    checkpoint.write_bytes(b'weights')
+    config = {'task_type': 'image_segment', 'model': {'checkpoint': str(checkpoint)}}
+    fingerprint = run_fingerprint(config)
+
+    def with_execution(execution):
+        return dict(config, model=dict(config['model'], execution=execution))
+
+    # Runs before the option were float32, threads don't change the labels
+    assert fingerprint == run_fingerprint(with_execution({'dtype': 'float32'}))
+    assert fingerprint == run_fingerprint(with_execution({'threads': 4}))
+    assert fingerprint != run_fingerprint(with_execution({'dtype': 'bfloat16'}))
+    assert fingerprint != run_fingerprint(with_execution({'channels_last': True}))
+
+
+class ModelLoaded(Exception):
+    pass
+
+
+def _load_model(*args):
+    raise ModelLoaded()
+
+
+def test_run_config_checks_fingerprint(tmp_path, capsys):
+    image_dir = _image_dir(tmp_path)
+    output_dir = tmp_path / 'output'
+    config = {'task_type': 'image_segment', 'source': str(image_dir),
+              'model': {'checkpoint': 'stub'}, 'output': {'dir': str(output_dir)}}
+
+    # A first incremental run has no fingerprint to compare with
+    with pytest.raises(ModelLoaded):
+        run_config(config, incremental=True, model_loader=_load_model)
+    assert 'changed' not in capsys.readouterr().out
+
+    _run(image_dir, output_dir, resume=False)
+    with pytest.raises(ModelLoaded):
+        run_config(config, incremental=True, model_loader=_load_model)
+    assert 'label all inputs' in capsys.readouterr().out
+    # Resuming would mix the labels of two configs
+    with pytest.raises(RunChangedError):
+        run_config(config, resume=True, model_loader=_load_model)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+
+try:
+    from autolabel.model.onnx_model import export_key, export_sam2, \
+        quantize_int8, session_options, use_onnx
+except ImportError as e:
+    raise ImportError("The onnx backend needs onnxruntime and onnx, "
+                      "pip3 install onnxruntime onnx") from e
+from sam2.build_sam import build_sam2
+
+from autolabel.model.execution import ExecutionConfig
+from autolabel.model.registry import REGISTRY
+
+
+ONNX_DIR = "/tmp/autolabel/onnx"
+QUANTIZE_MODES = (None, 'int8')
+
+
+def build(checkpoint, model_cfg, task_type, execution=None, onnx_dir=ONNX_DIR,
+          intra_op_threads=None, inter_op_threads=1, quantize=None):
+    """SAM2 with its encoder and mask decoder run by ONNX Runtime on CPU
+
+    The graphs are exported once per checkpoint, opset and torch version to
+    `onnx_dir`, later runs load them from there.
+
+    Args:
+        execution (dict): the prompt encoder runs on CPU in float32, its
+            `threads` are the default `intra_op_threads`
+        intra_op_threads (int): threads of an operator, all cores by default
+        inter_op_threads (int): threads running independent operators
+        quantize (str): "int8" quantizes the weights dynamically
+    """
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError("Quantize '{}' is not supported, one of {}".format(
+            quantize, QUANTIZE_MODES))
+    config = ExecutionConfig.resolve(execution, REGISTRY.get('onnx').capabilities)
+    intra_op_threads = intra_op_threads or config.threads
+    model = config.prepare(build_sam2(model_cfg, checkpoint, device=config.device))
+
+    export_dir = Path(onnx_dir) / export_key(checkpoint, model_cfg)
+    encoder_path = export_dir / "encoder.onnx"
+    decoder_path = export_dir / "decoder.onnx"
+    if not (encoder_path.is_file() and decoder_path.is_file()):
+        encoder_path, decoder_path = export_sam2(model, export_dir)
+    if quantize == 'int8':
+        encoder_path = quantize_int8(encoder_path)
+        decoder_path = quantize_int8(decoder_path)
+    print("Execution {}, onnxruntime: {}, threads intra {} inter {}, quantize {}".format(
+        config.summary(), encoder_path, intra_op_threads or 'auto',
+        inter_op_threads, quantize))
+    return use_onnx(model, encoder_path, decoder_path,
+                    session_options(intra_op_threads, inter_op_threads))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# sam2 loads hydra and its configs, only imported for its models
+from sam2.build_sam import build_sam2, build_sam2_video_predictor
+
+from autolabel.model.execution import ExecutionConfig
+from autolabel.model.registry import REGISTRY
+
+
+def _execution_config(backend, execution):
+    config = ExecutionConfig.resolve(execution, REGISTRY.get(backend).capabilities)
+    if config.device.type == "mps":
+        print("\nSupport for MPS devices is preliminary. SAM 2 is trained with CUDA and might "
+              "give numerically different outputs and sometimes degraded performance on MPS. "
+              "See e.g. https://github.com/pytorch/pytorch/issues/84936 for a discussion.")
+    print("Execution {}".format(config.summary()))
+    return config
+
+
+def build_image(checkpoint, model_cfg, task_type, execution=None):
+    config = _execution_config('sam2_image', execution)
+    return config.prepare(build_sam2(model_cfg, checkpoint, device=config.device))
+
+
+def build_video(checkpoint, model_cfg, task_type, execution=None):
+    config = _execution_config('sam2_video', execution)
+    return config.prepare(
+        build_sam2_video_predictor(model_cfg, checkpoint, device=config.device))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+class StubModel:
+    """Model without weights for tests and scheduling experiments on CPU
+
+    `predict` returns no detections, it only records what it was given.
+    """
+
+    def __init__(self, checkpoint, model_cfg, task_type) -> None:
+        self.checkpoint = checkpoint
+        self.model_cfg = model_cfg
+        self.task_type = task_type
+        self.calls = 0
+
+    def predict(self, data):
+        self.calls += 1
+        return []
+
+
+def build(checkpoint, model_cfg, task_type, execution=None):
+    return StubModel(checkpoint, model_cfg, task_type)
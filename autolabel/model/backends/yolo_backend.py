@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from ultralytics import YOLO
+except ImportError as e:
+    raise ImportError("The yolo backend needs ultralytics, "
+                      "pip3 install ultralytics") from e
+
+from autolabel.model.execution import ExecutionConfig
+from autolabel.model.registry import REGISTRY
+
+
+def build(checkpoint, model_cfg, task_type, execution=None):
+    config = ExecutionConfig.resolve(execution, REGISTRY.get('yolo').capabilities)
+    print("Execution {}".format(config.summary()))
+    model = YOLO(checkpoint).to(config.device)
+    model.execution = config
+    return model
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import torch
+
+from autolabel.model.image_input import set_image
+from autolabel.pipeline.manifest import execution_key, file_digest, model_digest
+
+
+def _to_device(features, device):
+    return {
+        "image_embed": features["image_embed"].to(device),
+        "high_res_feats": [f.to(device) for f in features["high_res_feats"]],
+    }
+
+
+class EmbeddingCache:
+    """In memory LRU plus on disk cache of SAM2 image embeddings
+
+    Entries are keyed by the content hash of the image file together with
+    the model, so a changed file or model never hits a stale embedding.
+    """
+
+    def __init__(self, model_key: str, cache_dir=None, capacity: int = 16) -> None:
+        if capacity < 0:
+            raise ValueError("Capacity must not be negative")
+        self._model_key = model_key
+        self._cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self._capacity = capacity
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self._cache_dir:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def from_config(cfg, model, decode_size=None):
+        """Create the cache from the `embedding_cache` config section
+
+        Images decoded at a reduced resolution and models of another backend,
+        e.g. quantized, or of another dtype have their own embeddings,
+        `decode_size` and the backend and execution of the `model` section
+        are part of the key.
+
+        Returns:
+            EmbeddingCache: None if the section is missing
+        """
+        if not cfg:
+            return None
+        model_key = model_digest(model['checkpoint'], model.get('model_cfg'))
+        if decode_size:
+            model_key = "{}@{}".format(model_key, decode_size)
+        if model.get('backend'):
+            model_key = "{}@{}{}".format(model_key, model['backend'], json.dumps(
+                model.get('options'), sort_keys=True))
+        execution = execution_key(model)
+        if execution:
+            model_key = "{}@{}".format(model_key, json.dumps(execution, sort_keys=True))
+        return EmbeddingCache(model_key, cfg.get('dir', None),
+                              cfg.get('capacity', 16))
+
+    def key(self, file_path) -> str:
+        """Cache key of an image file, safe to call from decode threads
+        """
+        return self.key_from_digest(file_digest(file_path))
+
+    def key_from_digest(self, digest: str) -> str:
+        """Cache key of an image whose content hash is already known
+        """
+        sha = hashlib.sha256(self._model_key.encode())
+        sha.update(digest.encode())
+        return sha.hexdigest()
+
+    def set_image(self, predictor, image, key=None, orig_hw=None):
+        """Like `predictor.set_image`, but skip the encoder on a cache hit
+        """
+        if key is None:
+            set_image(predictor, image, orig_hw)
+            return
+
+        entry = self._get(key, predictor.device)
+        if entry is None:
+            self.misses += 1
+            set_image(predictor, image, orig_hw)
+            entry = {
+                "features": predictor._features,
+                "orig_hw": list(predictor._orig_hw),
+            }
+            self._put(key, entry)
+            return
+
+        predictor.reset_predictor()
+        predictor._features = entry["features"]
+        predictor._orig_hw = list(entry["orig_hw"])
+        predictor._is_image_set = True
+        predictor._is_batch = False
+
+    def summary(self) -> str:
+        return "embedding cache hits: {} (disk: {}), misses: {}".format(
+            self.hits, self.disk_hits, self.misses)
+
+    def _path(self, key):
+        return self._cache_dir / key[:2] / "{}.pt".format(key)
+
+    def _get(self, key, device):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        if self._cache_dir is None or not self._path(key).is_file():
+            return None
+        try:
+            entry = torch.load(self._path(key), map_location="cpu")
+        except Exception as e:
+            logging.warning("Load embedding {} failed! {}".format(key, e))
+            return None
+        entry["features"] = _to_device(entry["features"], device)
+        self._remember(key, entry)
+        self.hits += 1
+        self.disk_hits += 1
+        return entry
+
+    def _put(self, key, entry):
+        self._remember(key, entry)
+        if self._cache_dir is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.{}".format(os.getpid()))
+        torch.save({
+            "features": _to_device(entry["features"], "cpu"),
+            "orig_hw": entry["orig_hw"],
+        }, tmp_path)
+        # Readers never see a partially written file
+        os.replace(tmp_path, path)
+
+    def _remember(self, key, entry):
+        if self._capacity == 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
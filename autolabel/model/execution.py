@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import logging
+
+import torch
+
+
+DTYPES = {
+    'float32': torch.float32,
+    'bfloat16': torch.bfloat16,
+    'float16': torch.float16,
+}
+
+
+def _cuda_supports_tf32(device) -> bool:
+    # Ampere or newer
+    return torch.cuda.get_device_properties(device).major >= 8
+
+
+def _cpu_supports_bf16() -> bool:
+    # Without native bfloat16 (avx512_bf16 or amx) autocast is slower than float32
+    try:
+        return torch.backends.mkldnn.is_available() \
+            and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def available_devices():
+    """Device types of this machine, the fastest first
+    """
+    devices = []
+    if torch.cuda.is_available():
+        devices.append('cuda')
+    if torch.backends.mps.is_available():
+        devices.append('mps')
+    devices.append('cpu')
+    return devices
+
+
+class ExecutionConfig:
+    """How a model runs, its device, compute dtype, threads and math modes
+
+    The config is resolved once when the model is built and kept on the
+    model. Tasks run the model within `inference()`, which applies the
+    dtype, threads and TF32 mode and restores them afterwards, so models of
+    different configs can share a process.
+    """
+
+    def __init__(self, device='cpu', dtype: str = 'float32', threads: int = None,
+                 tf32: bool = False, channels_last: bool = False) -> None:
+        if dtype not in DTYPES:
+            raise ValueError("Dtype '{}' is not supported, one of {}".format(
+                dtype, list(DTYPES)))
+        self.device = torch.device(device)
+        self.dtype = dtype
+        self.threads = threads
+        self.tf32 = tf32
+        self.channels_last = channels_last
+
+    @staticmethod
+    def resolve(cfg=None, capabilities=None):
+        """Resolve the `model.execution` config section on this machine
+
+        Unset fields get the fastest setting the hardware and the backend
+        support: the first available device of the backend, bfloat16 on CUDA
+        and on CPUs with native bfloat16, TF32 on Ampere or newer GPUs.
+
+        Args:
+            cfg (dict): `device`, `dtype`, `threads`, `tf32`, `channels_last`
+            capabilities (Capabilities): devices and dtypes of the backend
+
+        Returns:
+            ExecutionConfig: the effective config
+        """
+        cfg = cfg or {}
+        devices = capabilities.devices if capabilities else ('cuda', 'mps', 'cpu')
+        dtypes = capabilities.dtypes if capabilities else tuple(DTYPES)
+
+        device = cfg.get('device')
+        if device is None:
+            device = next((d for d in available_devices() if d in devices), devices[0])
+        device = torch.device(device)
+        if device.type not in devices:
+            raise ValueError("Device '{}' is not supported by the backend, one of {}".format(
+                device, devices))
+
+        dtype = cfg.get('dtype')
+        if dtype is None:
+            bf16 = device.type == 'cuda' or (device.type == 'cpu' and _cpu_supports_bf16())
+            dtype = 'bfloat16' if bf16 and 'bfloat16' in dtypes else 'float32'
+        elif dtype not in dtypes:
+            logging.warning("Dtype '{}' is not supported by the backend, use float32".format(
+                dtype))
+            dtype = 'float32'
+
+        tf32 = cfg.get('tf32')
+        if tf32 is None:
+            tf32 = device.type == 'cuda' and _cuda_supports_tf32(device)
+        return ExecutionConfig(device, dtype, cfg.get('threads'), tf32,
+                               cfg.get('channels_last', False))
+
+    @staticmethod
+    def of(model):
+        """The config of a model, the default of its device if it has none
+        """
+        config = getattr(model, 'execution', None)
+        if config is None:
+            config = ExecutionConfig.resolve({'device': getattr(model, 'device', 'cpu')})
+            model.execution = config
+        return config
+
+    def prepare(self, model):
+        """Move the model to its device and memory format, and keep the config
+        """
+        model = model.to(self.device)
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        model.execution = self
+        return model
+
+    @contextlib.contextmanager
+    def inference(self):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(torch.inference_mode())
+            if self.dtype != 'float32':
+                stack.enter_context(torch.autocast(
+                    self.device.type, dtype=DTYPES[self.dtype]))
+            if self.threads:
+                stack.callback(torch.set_num_threads, torch.get_num_threads())
+                torch.set_num_threads(self.threads)
+            if self.device.type == 'cuda':
+                matmul, cudnn = torch.backends.cuda.matmul, torch.backends.cudnn
+                stack.callback(setattr, matmul, 'allow_tf32', matmul.allow_tf32)
+                stack.callback(setattr, cudnn, 'allow_tf32', cudnn.allow_tf32)
+                matmul.allow_tf32 = cudnn.allow_tf32 = self.tf32
+            yield self
+
+    def summary(self) -> str:
+        return "device: {}, dtype: {}, threads: {}, tf32: {}, channels_last: {}".format(
+            self.device, self.dtype, self.threads or torch.get_num_threads(),
+            self.tf32, self.channels_last)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+# SAM2Transforms defaults
+IMG_MEAN = (0.485, 0.456, 0.406)
+IMG_STD = (0.229, 0.224, 0.225)
+
+
+def image_to_input(image: np.ndarray, resolution: int, device,
+                   img_mean=IMG_MEAN, img_std=IMG_STD) -> torch.Tensor:
+    """Normalized (1, 3, resolution, resolution) input of an RGB image
+
+    The uint8 pixels are shared with the array and uploaded as they are,
+    a quarter of the bytes of a float tensor, then converted, resized and
+    normalized on `device` like `SAM2Transforms` does.
+    """
+    pixels = torch.from_numpy(image).to(device, non_blocking=True)
+    pixels = pixels.permute(2, 0, 1)[None].float().div_(255.0)
+    pixels = F.interpolate(pixels, size=(resolution, resolution),
+                           mode="bilinear", align_corners=False, antialias=True)
+    mean = torch.tensor(img_mean, device=pixels.device)[:, None, None]
+    std = torch.tensor(img_std, device=pixels.device)[:, None, None]
+    return pixels.sub_(mean).div_(std)
+
+
+def _is_rgb_array(image) -> bool:
+    return isinstance(image, np.ndarray) and image.dtype == np.uint8 \
+        and image.ndim == 3 and image.shape[2] == 3
+
+
+@torch.no_grad()
+def set_image(predictor, image, orig_hw=None):
+    """`SAM2ImagePredictor.set_image` without its host side copies
+
+    The predictor converts an array to a float tensor on the host before
+    uploading it. Here the pixels go to the model input in one upload,
+    other images take the predictor's own path.
+
+    `orig_hw` is the size of the original of a reduced image. Prompts are
+    given and masks returned at that size, the model input is resized to a
+    fixed resolution anyway.
+    """
+    if not _is_rgb_array(image):
+        predictor.set_image(image)
+        return
+
+    predictor.reset_predictor()
+    predictor._orig_hw = [tuple(orig_hw or image.shape[:2])]
+    transforms = predictor._transforms
+    input_image = image_to_input(
+        np.ascontiguousarray(image), predictor.model.image_size,
+        predictor.device, getattr(transforms, 'mean', IMG_MEAN),
+        getattr(transforms, 'std', IMG_STD))
+
+    model = predictor.model
+    backbone_out = model.forward_image(input_image)
+    _, vision_feats, _, _ = model._prepare_backbone_features(backbone_out)
+    # Add no_mem_embed, which is added to the lowest res feature map during
+    # training on videos
+    if model.directly_add_no_mem_embed:
+        vision_feats[-1] = vision_feats[-1] + model.no_mem_embed
+
+    feats = [
+        feat.permute(1, 2, 0).view(1, -1, *feat_size)
+        for feat, feat_size in zip(vision_feats[::-1], predictor._bb_feat_sizes[::-1])
+    ][::-1]
+    predictor._features = {"image_embed": feats[-1], "high_res_feats": feats[:-1]}
+    predictor._is_image_set = True
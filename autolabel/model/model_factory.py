@@ -14,47 +14,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import torch
-#from ultralytics import YOLO
-from sam2.build_sam import build_sam2, build_sam2_video_predictor
-
-
-def _get_device():
-    device = None
-    # select the device for computation
-    if torch.cuda.is_available():
-        device = torch.device("cuda")
-    elif torch.backends.mps.is_available():
-        device = torch.device("mps")
-    else:
-        device = torch.device("cpu")
-
-    # configure the device settings based on type
-    if device.type == "cuda":
-        # use bfloat16 for the entire session
-        torch.autocast("cuda", dtype=torch.bfloat16).__enter__()
-        # enable tfloat32 for Ampere GPUs
-        if torch.cuda.get_device_properties(0).major >= 8:
-            torch.backends.cuda.matmul.allow_tf32 = True
-            torch.backends.cudnn.allow_tf32 = True
-    elif device.type == "mps":
-        print("\nSupport for MPS devices is preliminary. SAM 2 is trained with CUDA and might "
-              "give numerically different outputs and sometimes degraded performance on MPS. "
-              "See e.g. https://github.com/pytorch/pytorch/issues/84936 for a discussion.")
-    print(f"Using device: {device}")
-    return device
+from autolabel.model.registry import REGISTRY
 
 
 class ModelFactory:
     @staticmethod
-    def create(model: str, model_cfg: str, task_type: str):
-        device = _get_device()
-        if 'sam2' in model.lower():
-            if task_type == "image_segment":
-                return build_sam2(model_cfg, model, device=device)
-            elif task_type == "video_segment":
-                return build_sam2_video_predictor(model_cfg, model, device=device)
-        elif 'yolo' in model.lower():
-            return YOLO(model)
-        else:
-            raise ValueError(f"Model '{model}' is not supported.")
+    def create(model: str, model_cfg: str, task_type: str, backend: str = None,
+               options=None):
+        """Build a model with the backend of the registry
+
+        Args:
+            model (str): checkpoint of the model
+            model_cfg (str): model config, if the backend needs one
+            task_type (str): task the model is used for
+            backend (str): registered backend, by default the one matching
+                the checkpoint
+            options (dict): keyword arguments of the backend
+
+        Returns:
+            the model
+        """
+        return REGISTRY.create(model, model_cfg, task_type, backend, options)
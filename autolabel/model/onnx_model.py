@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+import torch
+
+from autolabel.pipeline.manifest import model_digest
+
+
+ONNX_OPSET = 17
+
+
+def export_key(checkpoint, model_cfg) -> str:
+    """Directory name of the exported graphs of a model
+
+    Graphs exported with another opset or torch version are not reused.
+    """
+    return "{}-opset{}-torch{}".format(
+        model_digest(checkpoint, model_cfg), ONNX_OPSET, torch.__version__)
+
+
+def session_options(intra_op_threads=None, inter_op_threads=1):
+    """ONNX Runtime options, `None` threads leave the choice to the runtime
+
+    A single labeling job runs one graph at a time, so the operators get
+    the cores and the graphs run sequentially.
+    """
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        options.inter_op_num_threads = inter_op_threads
+    return options
+
+
+def _to_numpy(tensor):
+    return np.ascontiguousarray(tensor.detach().to("cpu", torch.float32).numpy())
+
+
+class _EncoderExport(torch.nn.Module):
+    def __init__(self, model) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        backbone_out = self.model.forward_image(image)
+        return tuple(backbone_out["backbone_fpn"]) + tuple(backbone_out["vision_pos_enc"])
+
+
+class _DecoderExport(torch.nn.Module):
+    def __init__(self, decoder) -> None:
+        super().__init__()
+        self.decoder = decoder
+
+    def forward(self, image_embeddings, image_pe, sparse_prompt_embeddings,
+                dense_prompt_embeddings, *high_res_features):
+        return self.decoder.predict_masks(
+            image_embeddings=image_embeddings,
+            image_pe=image_pe,
+            sparse_prompt_embeddings=sparse_prompt_embeddings,
+            dense_prompt_embeddings=dense_prompt_embeddings,
+            repeat_image=False,
+            high_res_features=list(high_res_features) or None)
+
+
+DECODER_INPUTS = ["image_embeddings", "image_pe", "sparse_prompt_embeddings",
+                  "dense_prompt_embeddings"]
+DECODER_OUTPUTS = ["masks", "iou_pred", "mask_tokens_out", "object_score_logits"]
+
+
+def _export(module, args, path, input_names, output_names, dynamic_axes):
+    # Written under a temporary name, a crashed export leaves no model behind
+    tmp_path = path.with_suffix(".tmp.{}".format(os.getpid()))
+    torch.onnx.export(module, args, str(tmp_path), opset_version=ONNX_OPSET,
+                      input_names=input_names, output_names=output_names,
+                      dynamic_axes=dynamic_axes, do_constant_folding=True)
+    os.replace(tmp_path, path)
+
+
+@torch.no_grad()
+def export_sam2(model, onnx_dir):
+    """Export the image encoder and the mask decoder of a SAM2 model
+
+    The encoder covers `forward_image`, the decoder `predict_masks` of the
+    mask decoder, both with a dynamic batch. Prompts are still encoded by
+    the eager prompt encoder.
+
+    Returns:
+        tuple: paths of the encoder and the decoder
+    """
+    # Imported here, only an export needs the predictor
+    from sam2.sam2_image_predictor import SAM2ImagePredictor
+
+    onnx_dir = Path(onnx_dir)
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+    encoder_path = onnx_dir / "encoder.onnx"
+    decoder_path = onnx_dir / "decoder.onnx"
+    model = model.eval()
+
+    image = torch.zeros(1, 3, model.image_size, model.image_size)
+    num_levels = len(model.forward_image(image)["backbone_fpn"])
+    names = ["fpn_{}".format(i) for i in range(num_levels)] + \
+        ["pos_{}".format(i) for i in range(num_levels)]
+    logging.info("Export {}".format(encoder_path))
+    _export(_EncoderExport(model), (image,), encoder_path, ["image"], names,
+            {name: {0: "batch"} for name in ["image"] + names})
+
+    # Realistic decoder inputs of an empty image and a two point prompt
+    predictor = SAM2ImagePredictor(model)
+    predictor.set_image(np.zeros((model.image_size, model.image_size, 3), np.uint8))
+    sparse, dense = model.sam_prompt_encoder(
+        points=(torch.tensor([[[100.0, 100.0], [200.0, 200.0]]]),
+                torch.tensor([[1, 0]], dtype=torch.int32)),
+        boxes=None, masks=None)
+    decoder = model.sam_mask_decoder
+    high_res_features = predictor._features["high_res_feats"] \
+        if decoder.use_high_res_features else []
+    export_mask_decoder(decoder, (
+        predictor._features["image_embed"], model.sam_prompt_encoder.get_dense_pe(),
+        sparse, dense, *high_res_features), decoder_path)
+    return encoder_path, decoder_path
+
+
+@torch.no_grad()
+def export_mask_decoder(decoder, args, path):
+    """Export `predict_masks` of a mask decoder with a dynamic batch
+
+    Args:
+        args (tuple): example image embeddings, image pe, sparse and dense
+            prompt embeddings and the high resolution features, if used
+    """
+    path = Path(path)
+    input_names = DECODER_INPUTS + \
+        ["high_res_feat_{}".format(i) for i in range(len(args) - len(DECODER_INPUTS))]
+    dynamic_axes = {name: {0: "batch"} for name in input_names + DECODER_OUTPUTS}
+    dynamic_axes["sparse_prompt_embeddings"] = {0: "batch", 1: "tokens"}
+    del dynamic_axes["image_pe"]
+    logging.info("Export {}".format(path))
+    _export(_DecoderExport(decoder.eval()), args, path, input_names,
+            DECODER_OUTPUTS, dynamic_axes)
+    return path
+
+
+def quantize_int8(path):
+    """Dynamically quantize the weights of a model to int8
+
+    Returns:
+        Path: the quantized model next to the original
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = Path(path)
+    int8_path = path.with_suffix(".int8.onnx")
+    if not int8_path.is_file():
+        tmp_path = path.with_suffix(".int8.tmp.{}".format(os.getpid()))
+        logging.info("Quantize {}".format(path))
+        quantize_dynamic(str(path), str(tmp_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+class OrtImageEncoder:
+    """`SAM2Base.forward_image` run by an ONNX Runtime session
+    """
+
+    def __init__(self, session) -> None:
+        self._session = session
+        self._names = [output.name for output in session.get_outputs()]
+
+    def __call__(self, img_batch):
+        outputs = self._session.run(None, {"image": _to_numpy(img_batch)})
+        fpn, pos = [], []
+        for name, output in zip(self._names, outputs):
+            (fpn if name.startswith("fpn_") else pos).append(torch.from_numpy(output))
+        return {"vision_features": fpn[-1], "vision_pos_enc": pos, "backbone_fpn": fpn}
+
+
+class OrtMaskDecoder:
+    """`MaskDecoder.predict_masks` run by an ONNX Runtime session
+
+    The mask selection of `MaskDecoder.forward` stays in torch, so the
+    exported graph serves single and multi mask outputs.
+    """
+
+    def __init__(self, session) -> None:
+        self._session = session
+        self._inputs = [i.name for i in session.get_inputs()]
+
+    def __call__(self, image_embeddings, image_pe, sparse_prompt_embeddings,
+                 dense_prompt_embeddings, repeat_image, high_res_features=None):
+        if repeat_image:
+            image_embeddings = torch.repeat_interleave(
+                image_embeddings, sparse_prompt_embeddings.shape[0], dim=0)
+        args = [image_embeddings, image_pe, sparse_prompt_embeddings,
+                dense_prompt_embeddings] + list(high_res_features or [])
+        outputs = self._session.run(None, {
+            name: _to_numpy(arg) for name, arg in zip(self._inputs, args)})
+        return tuple(torch.from_numpy(output) for output in outputs)
+
+
+def use_onnx(model, encoder_path, decoder_path, options=None):
+    """Run the encoder and the mask decoder of `model` in ONNX Runtime
+
+    The model keeps its interface, the predictors of sam2 use it as is.
+    """
+    providers = ["CPUExecutionProvider"]
+    encoder = ort.InferenceSession(str(encoder_path), sess_options=options,
+                                   providers=providers)
+    decoder = ort.InferenceSession(str(decoder_path), sess_options=options,
+                                   providers=providers)
+    model.forward_image = OrtImageEncoder(encoder)
+    model.sam_mask_decoder.predict_masks = OrtMaskDecoder(decoder)
+    return model
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+import logging
+
+
+class Capabilities:
+    """What a backend can run, for the scheduler of the labeling jobs
+
+    Args:
+        task_types (tuple): task types the models of the backend serve
+        batchable (bool): whether the model takes a batch of images at once
+        max_batch_size (int): largest useful batch of a batchable backend
+        dtypes (tuple): compute dtypes the backend supports
+        devices (tuple): device types the backend runs on
+        light (bool): cheap enough to share a device with other models
+    """
+
+    def __init__(self, task_types, batchable=False, max_batch_size=1,
+                 dtypes=('float32',), devices=('cpu',), light=False) -> None:
+        self.task_types = tuple(task_types)
+        self.batchable = batchable
+        self.max_batch_size = max_batch_size if batchable else 1
+        self.dtypes = tuple(dtypes)
+        self.devices = tuple(devices)
+        self.light = light
+
+    def __repr__(self):
+        return ("Capabilities(task_types={}, batchable={}, max_batch_size={}, "
+                "dtypes={}, devices={}, light={})").format(
+                    self.task_types, self.batchable, self.max_batch_size,
+                    self.dtypes, self.devices, self.light)
+
+
+class Backend:
+    """A registered backend, its module is only imported to build a model
+
+    `target` is "module:function", the function builds a model as
+    `function(checkpoint, model_cfg, task_type, execution=None, **options)`,
+    `execution` is the `model.execution` config section. `matches` tells from the
+    checkpoint whether a model is of this backend when none is configured.
+    """
+
+    def __init__(self, name: str, target: str, capabilities: Capabilities,
+                 matches=None) -> None:
+        self.name = name
+        self.target = target
+        self.capabilities = capabilities
+        self._matches = matches
+
+    def matches(self, checkpoint: str, task_type: str) -> bool:
+        if task_type not in self.capabilities.task_types:
+            return False
+        return self._matches is not None and self._matches(checkpoint or '')
+
+    def builder(self):
+        module_name, _, attr = self.target.partition(':')
+        return getattr(importlib.import_module(module_name), attr)
+
+    def create(self, checkpoint, model_cfg, task_type, options=None):
+        if task_type not in self.capabilities.task_types:
+            raise ValueError("Backend '{}' doesn't support task '{}', only {}".format(
+                self.name, task_type, self.capabilities.task_types))
+        return self.builder()(checkpoint, model_cfg, task_type, **(options or {}))
+
+
+class ModelRegistry:
+    """The model backends by name
+    """
+
+    def __init__(self) -> None:
+        self._backends = {}
+
+    def register(self, name: str, target: str, capabilities: Capabilities,
+                 matches=None) -> Backend:
+        if name in self._backends:
+            logging.warning("Backend '{}' is registered again".format(name))
+        backend = Backend(name, target, capabilities, matches)
+        self._backends[name] = backend
+        return backend
+
+    def names(self):
+        return list(self._backends)
+
+    def get(self, name: str) -> Backend:
+        try:
+            return self._backends[name]
+        except KeyError:
+            raise ValueError("Backend '{}' is not registered, one of {}".format(
+                name, self.names())) from None
+
+    def resolve(self, checkpoint: str, task_type: str, backend: str = None) -> Backend:
+        """The configured backend, or the first that matches the checkpoint
+        """
+        if backend:
+            return self.get(backend)
+        for candidate in self._backends.values():
+            if candidate.matches(checkpoint, task_type):
+                return candidate
+        raise ValueError("Model '{}' is not supported for task '{}'.".format(
+            checkpoint, task_type))
+
+    def create(self, checkpoint: str, model_cfg: str, task_type: str,
+               backend: str = None, options=None):
+        return self.resolve(checkpoint, task_type, backend).create(
+            checkpoint, model_cfg, task_type, options)
+
+
+def backend_options(model):
+    """Keyword arguments of the backend from the `model` config section
+
+    These are `options` together with the `execution` section, both of
+    them are optional.
+    """
+    options = dict(model.get('options') or {})
+    if model.get('execution'):
+        options['execution'] = model['execution']
+    return options or None
+
+
+def resolve_execution(config):
+    """The config with the dtype of `model.execution` resolved on this machine
+
+    The dtype the backend picks by default depends on the hardware, it is
+    resolved up front so the run fingerprint, the embedding cache and the
+    workers all see the one the model runs with.
+    """
+    model = config['model']
+    backend = REGISTRY.resolve(model['checkpoint'], config['task_type'],
+                               model.get('backend'))
+    execution = dict(model.get('execution') or {})
+    dtypes = backend.capabilities.dtypes
+    if execution.get('dtype') not in dtypes:
+        if dtypes == ('float32',):
+            # Nothing to resolve, backends without torch don't import it
+            execution['dtype'] = 'float32'
+        else:
+            from autolabel.model.execution import ExecutionConfig
+            execution['dtype'] = ExecutionConfig.resolve(
+                execution, backend.capabilities).dtype
+    return dict(config, model=dict(model, execution=execution))
+
+
+def _path_contains(word):
+    # The whole path, like before the registry, e.g. "checkpoints/sam2/large.pt"
+    return lambda checkpoint: word in checkpoint.lower()
+
+
+REGISTRY = ModelRegistry()
+
+REGISTRY.register(
+    'sam2_image', 'autolabel.model.backends.sam2_backend:build_image',
+    Capabilities(('image_segment',), batchable=True, max_batch_size=8,
+                 dtypes=('float32', 'bfloat16'), devices=('cuda', 'mps', 'cpu')),
+    _path_contains('sam2'))
+REGISTRY.register(
+    'sam2_video', 'autolabel.model.backends.sam2_backend:build_video',
+    Capabilities(('video_segment',), dtypes=('float32', 'bfloat16'),
+                 devices=('cuda', 'mps', 'cpu')),
+    _path_contains('sam2'))
+REGISTRY.register(
+    'yolo', 'autolabel.model.backends.yolo_backend:build',
+    Capabilities(('image_detection',), batchable=True, max_batch_size=32,
+                 dtypes=('float32', 'float16'), devices=('cuda', 'mps', 'cpu'),
+                 light=True),
+    _path_contains('yolo'))
+# Only used when configured, it shares the checkpoints of sam2_image
+REGISTRY.register(
+    'onnx', 'autolabel.model.backends.onnx_backend:build',
+    Capabilities(('image_segment',), batchable=True, max_batch_size=8,
+                 devices=('cpu',)))
+REGISTRY.register(
+    'stub', 'autolabel.model.backends.stub_backend:build',
+    Capabilities(('image_segment', 'image_detection', 'video_segment'),
+                 batchable=True, max_batch_size=64, light=True),
+    lambda checkpoint: checkpoint == 'stub')
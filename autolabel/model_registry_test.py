@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+from autolabel.model.registry import REGISTRY, Capabilities, ModelRegistry, \
+    resolve_execution
+
+
+def test_resolve_by_checkpoint():
+    assert REGISTRY.resolve('checkpoints/sam2_hiera_large.pt',
+                            'image_segment').name == 'sam2_image'
+    assert REGISTRY.resolve('checkpoints/sam2_hiera_large.pt',
+                            'video_segment').name == 'sam2_video'
+    assert REGISTRY.resolve('yolov8n.pt', 'image_detection').name == 'yolo'
+    # The name may be in a directory of the path
+    assert REGISTRY.resolve('checkpoints/sam2/hiera_large.pt',
+                            'image_segment').name == 'sam2_image'
+    with pytest.raises(ValueError, match='not supported'):
+        REGISTRY.resolve('yolov8n.pt', 'image_segment')
+    # Resolving a backend doesn't import it
+    assert 'autolabel.model.backends.sam2_backend' not in sys.modules
+
+
+def test_create_with_backend():
+    model = REGISTRY.create('any.pt', None, 'image_detection', backend='stub')
+    assert model.task_type == 'image_detection'
+    assert model.predict(None) == [] and model.calls == 1
+    with pytest.raises(ValueError, match='not registered'):
+        REGISTRY.create('any.pt', None, 'image_detection', backend='missing')
+
+    registry = ModelRegistry()
+    registry.register('light', 'autolabel.model.backends.stub_backend:build',
+                      Capabilities(('image_detection',)))
+    with pytest.raises(ValueError, match="doesn't support"):
+        registry.create('any.pt', None, 'image_segment', backend='light')
+
+
+def test_onnx_backend_only_when_configured():
+    # It shares the checkpoints of sam2_image, which stays the default
+    assert REGISTRY.resolve('sam2_hiera_large.pt', 'image_segment').name == 'sam2_image'
+    onnx = REGISTRY.resolve('sam2_hiera_large.pt', 'image_segment', 'onnx')
+    assert onnx.capabilities.devices == ('cpu',)
+
+
+def test_resolve_execution_without_torch():
+    config = {'task_type': 'image_detection',
+              'model': {'checkpoint': 'stub', 'execution': {'threads': 2}}}
+    resolved = resolve_execution(config)
+    assert resolved['model']['execution'] == {'threads': 2, 'dtype': 'float32'}
+    assert 'execution' in config['model'] and 'dtype' not in config['model']['execution']
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+import requests
+
+from autolabel.server.address import TOKEN_HEADER
+from autolabel.server.client import ModelClient, ServerError
+from autolabel.server.model_cache import ModelCache
+from autolabel.server.model_server import ModelServer
+
+
+class StubModel:
+    def __init__(self, checkpoint, model_cfg, task_type, backend=None,
+                 options=None) -> None:
+        self.key = (checkpoint, model_cfg, task_type, backend, options)
+
+
+def stub_job(config, model_cache, resume, incremental):
+    model_cfg = config['model']
+    model = model_cache.get(model_cfg['checkpoint'], model_cfg.get('model_cfg'),
+                            config['task_type'])
+    if config.get('source') == 'missing':
+        raise FileNotFoundError("missing")
+    print("labeled {} with {} in {}".format(
+        config['source'], model.key[0], os.path.basename(os.getcwd())))
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ModelServer(port=0, model_cache=ModelCache(StubModel),
+                         job_fn=stub_job, token_dir=str(tmp_path / "tokens"))
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def _client(server):
+    host, port = server.address
+    return ModelClient("{}:{}".format(host, port),
+                       token_dir=os.path.dirname(server.token_path))
+
+
+def _config(checkpoint='sam2.pt', source='a.jpg'):
+    return {'task_type': 'image_segment', 'source': source,
+            'model': {'checkpoint': checkpoint, 'model_cfg': 'sam2.yaml'}}
+
+
+def test_server_keeps_models_loaded(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with _client(server) as client:
+        assert client.health()['models'] == []
+        reply = client.submit(_config())
+        assert reply['output'] == "labeled a.jpg with sam2.pt in {}\n".format(
+            tmp_path.name)
+        client.submit(_config(source='b.jpg'))
+        assert server.model_cache.loads == 1 and server.model_cache.hits == 1
+
+        health = client.health()
+        assert health['jobs'] == 2
+        assert health['models'] == [
+            ['sam2.pt', 'sam2.yaml', 'image_segment', None, None, None]]
+
+        with pytest.raises(ServerError, match='missing'):
+            client.submit(_config(source='missing'))
+        # The server survives a failed job
+        assert client.health()['jobs'] == 3
+
+
+def test_server_refuses_browser_requests(server):
+    host, port = server.address
+    url = "http://{}:{}/jobs".format(host, port)
+    job = '{"config": {}, "cwd": "/"}'
+    headers = {TOKEN_HEADER: server.token}
+    assert oct(os.stat(server.token_path).st_mode & 0o777) == '0o600'
+
+    # A form or fetch of a web page needs no preflight with text/plain
+    r = requests.post(url, data=job, headers=dict(
+        headers, **{"Content-Type": "text/plain"}))
+    assert r.status_code == 415
+    r = requests.post(url, data=job, headers=dict(
+        headers, **{"Content-Type": "application/json",
+                    "Origin": "http://example.com"}))
+    assert r.status_code == 403
+    # DNS rebinding, a foreign name resolving to the loopback address
+    r = requests.post(url, data=job, headers=dict(
+        headers, **{"Content-Type": "application/json",
+                    "Host": "example.com:{}".format(port)}))
+    assert r.status_code == 403
+    r = requests.post(url, json={"config": {}})
+    assert r.status_code == 401
+    assert server.jobs == 0
+
+    with ModelClient("{}:{}".format(host, port)) as client:
+        # No token file in the default directory
+        assert client.health() is None
+    with _client(server) as client:
+        assert client.health()['jobs'] == 0
+
+
+def test_model_cache_eviction():
+    cache = ModelCache(StubModel, capacity=2)
+    a = cache.get('a.pt', None, 'image_segment')
+    cache.get('b.pt', None, 'image_segment')
+    assert cache.get('a.pt', None, 'image_segment') is a
+    cache.get('c.pt', None, 'image_segment')
+    assert [key[0] for key in cache.keys()] == ['a.pt', 'c.pt']
+    assert cache.loads == 3
+
+
+def test_model_cache_checkpoint_files(tmp_path, monkeypatch):
+    cache = ModelCache(StubModel, capacity=4)
+    for project in ('a', 'b'):
+        (tmp_path / project / 'checkpoints').mkdir(parents=True)
+        (tmp_path / project / 'checkpoints' / 'sam2.pt').write_bytes(project.encode())
+
+    monkeypatch.chdir(tmp_path / 'a')
+    a = cache.get('checkpoints/sam2.pt', 'sam2.yaml', 'image_segment')
+    assert cache.get('checkpoints/sam2.pt', 'sam2.yaml', 'image_segment') is a
+    # The same relative checkpoint of another project is another model
+    monkeypatch.chdir(tmp_path / 'b')
+    b = cache.get('checkpoints/sam2.pt', 'sam2.yaml', 'image_segment')
+    assert b is not a
+    assert [key[0] for key in cache.keys()] == [
+        str(tmp_path / project / 'checkpoints' / 'sam2.pt') for project in ('a', 'b')]
+
+    # A checkpoint rebuilt in place is loaded again
+    (tmp_path / 'b' / 'checkpoints' / 'sam2.pt').write_bytes(b'retrained')
+    assert cache.get('checkpoints/sam2.pt', 'sam2.yaml', 'image_segment') is not b
+    assert cache.loads == 3 and len(cache.keys()) == 2
+
+
+def test_server_only_on_loopback(tmp_path):
+    with pytest.raises(ValueError, match='loopback'):
+        ModelServer('0.0.0.0', 0)
+    server = ModelServer('localhost', 0, token_dir=str(tmp_path))
+    server.start()
+    assert os.path.exists(server.token_path)
+    server.shutdown()
+    assert not os.path.exists(server.token_path)
+
+
+def test_client_without_server():
+    assert ModelClient("127.0.0.1:9").health() is None
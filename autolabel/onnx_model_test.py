@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("sam2")
+pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+from sam2.modeling.sam.mask_decoder import MaskDecoder  # noqa: E402
+from sam2.modeling.sam.transformer import TwoWayTransformer  # noqa: E402
+
+from autolabel.model.onnx_model import OrtMaskDecoder, \
+    export_mask_decoder  # noqa: E402
+
+DIM = 32
+SIZE = 8
+
+
+def _decoder():
+    torch.manual_seed(0)
+    transformer = TwoWayTransformer(depth=2, embedding_dim=DIM, num_heads=2,
+                                    mlp_dim=64)
+    return MaskDecoder(transformer_dim=DIM, transformer=transformer,
+                       iou_head_hidden_dim=DIM, use_high_res_features=True,
+                       pred_obj_scores=True, pred_obj_scores_mlp=True,
+                       use_multimask_token_for_obj_ptr=True).eval()
+
+
+def _inputs(batch, tokens):
+    image_embeddings = torch.randn(1, DIM, SIZE, SIZE)
+    image_pe = torch.randn(1, DIM, SIZE, SIZE)
+    sparse = torch.randn(batch, tokens, DIM)
+    dense = torch.randn(batch, DIM, SIZE, SIZE)
+    high_res_features = [torch.randn(1, DIM // 8, SIZE * 4, SIZE * 4),
+                         torch.randn(1, DIM // 4, SIZE * 2, SIZE * 2)]
+    return image_embeddings, image_pe, sparse, dense, high_res_features
+
+
+def test_decoder_graph_repeat_image(tmp_path):
+    decoder = _decoder()
+    image_embeddings, image_pe, sparse, dense, high_res_features = _inputs(1, 2)
+    path = export_mask_decoder(decoder, (image_embeddings, image_pe, sparse,
+                                         dense, *high_res_features),
+                               tmp_path / "decoder.onnx")
+    ort_decoder = OrtMaskDecoder(ort.InferenceSession(
+        str(path), providers=["CPUExecutionProvider"]))
+
+    # One image embedding shared by a batch of prompts, the graph sees the
+    # repeated embedding and the unrepeated high resolution features
+    image_embeddings, image_pe, sparse, dense, high_res_features = _inputs(3, 5)
+    with torch.no_grad():
+        expected = decoder.predict_masks(
+            image_embeddings=image_embeddings, image_pe=image_pe,
+            sparse_prompt_embeddings=sparse, dense_prompt_embeddings=dense,
+            repeat_image=True, high_res_features=high_res_features)
+    outputs = ort_decoder(image_embeddings, image_pe, sparse, dense,
+                          repeat_image=True, high_res_features=high_res_features)
+
+    assert len(outputs) == len(expected)
+    for output, eager in zip(outputs, expected):
+        assert output.shape == eager.shape
+        assert output.shape[0] == 3
+        torch.testing.assert_close(output, eager, rtol=1e-3, atol=1e-4)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import time
+from pathlib import Path
+
+from autolabel.label.writer import LabelRecord
+from autolabel.pipeline.manifest import ManifestEntry, file_digest
+from autolabel.pipeline.prefetch import Prefetcher
+from autolabel.pipeline.stats import RunStats
+from autolabel.source.file_source import ImageFileSource
+from autolabel.source.source_factory import IterSource
+
+
+def iter_image_sources(source):
+    """Flatten an iterable source into image file sources
+
+    Nested iterable sources (e.g. sub directories) are traversed in place,
+    sources that are not images are skipped.
+
+    Args:
+        source (IterSource): source to traverse
+
+    Yields:
+        ImageFileSource: image sources in iteration order
+    """
+    for item in source:
+        if isinstance(item, IterSource):
+            yield from iter_image_sources(item)
+        elif isinstance(item, ImageFileSource):
+            yield item
+        else:
+            logging.warning("Skip unsupported source: {}".format(
+                item.source_input.input))
+
+
+def source_root(source):
+    """Directory that output paths of a source are relative to
+    """
+    root = Path(source.source_input.input)
+    return root if root.is_dir() else None
+
+
+def output_name(file_path, root=None) -> str:
+    """Output name of an input, its path below `root` without suffix
+    """
+    file_path = Path(file_path)
+    try:
+        relative_path = file_path.relative_to(root)
+    except (TypeError, ValueError):
+        relative_path = file_path.relative_to(file_path.anchor)
+    return relative_path.with_suffix('').as_posix()
+
+
+class BatchRunner:
+    """Run one task over every image of an iterable source
+
+    The task (and the model held by it) is created once by the caller and
+    reused for all items, only the data is replaced between items. With
+    `prefetch` > 0 the next images are decoded by `decode_workers` threads
+    while the model runs on the current one. The labels of each item are
+    passed to `writer` as soon as the item is done. With `decode_size`
+    JPEGs are decoded at a reduced resolution no smaller than it, the
+    labels are still of the original resolution.
+
+    With a `manifest` the items it already holds are skipped, and each
+    labeled item is added to it once its labels are written. With
+    `incremental` only the items unchanged since they were added are
+    skipped.
+    """
+
+    def __init__(self, task, writer=None, prefetch: int = 4,
+                 decode_workers: int = 2, manifest=None,
+                 incremental: bool = False, decode_size=None) -> None:
+        self._task = task
+        self._decode_size = decode_size
+        self._writer = writer
+        self._manifest = manifest
+        self._incremental = incremental
+        if manifest is not None and writer is not None:
+            writer.on_flush(manifest.flush)
+        self._prefetch = prefetch
+        self._decode_workers = decode_workers
+        self._embedding_cache = getattr(task, 'embedding_cache', None)
+        self._root = None
+        self.stats = RunStats()
+
+    def run(self, source: IterSource) -> RunStats:
+        stats = self.run_items(iter_image_sources(source),
+                               root=source_root(source))
+        print(self.stats.summary())
+        if self._incremental:
+            print(self.stats.incremental_summary())
+        return stats
+
+    def run_items(self, items, root=None) -> RunStats:
+        """Label image sources, output names are relative to `root`
+        """
+        self._root = Path(root) if root else None
+
+        self.stats.start()
+        if self._manifest is not None:
+            items = self._skip_done(items)
+        if self._prefetch > 0:
+            prefetcher = Prefetcher(items, self._load,
+                                    self._prefetch, self._decode_workers)
+            for item, loaded, error in prefetcher:
+                self._process_item(item, loaded, error)
+            self.stats.input_waits = prefetcher.waits
+            self.stats.input_wait_time = prefetcher.wait_time
+        else:
+            for item in items:
+                self._process_item(item)
+        if self._writer is not None:
+            self._writer.flush()
+        if self._manifest is not None:
+            self._manifest.flush()
+        self.stats.stop()
+        if self._embedding_cache is not None:
+            print(self._embedding_cache.summary())
+        return self.stats
+
+    def _skip_done(self, items):
+        for item in items:
+            start_time = time.perf_counter()
+            file_path = item.source_input.input
+            if self._incremental:
+                done = self._manifest.unchanged(file_path)
+            else:
+                done = file_path in self._manifest
+            self.stats.skip_check_time += time.perf_counter() - start_time
+            if done:
+                self.stats.skipped += 1
+            else:
+                yield item
+
+    def _load(self, item):
+        """Decode an item and hash its content, done on the decode threads
+        """
+        digest = None
+        if self._embedding_cache is not None or self._manifest is not None:
+            digest = file_digest(item.source_input.input)
+        if self._decode_size:
+            data, orig_hw = item.decode_reduced(self._decode_size)
+        else:
+            data = item.decode()
+            orig_hw = data.shape[:2]
+        return data, orig_hw, digest
+
+    def _process_item(self, item, loaded=None, error=None):
+        file_path = item.source_input.input
+        try:
+            if error is not None:
+                raise error
+            data, orig_hw, digest = self._load(item) if loaded is None else loaded
+            cache_key = None
+            if self._embedding_cache is not None:
+                cache_key = self._embedding_cache.key_from_digest(digest)
+            name = self.output_name(file_path)
+            self._task.set_data(data, cache_key=cache_key, name=name,
+                                orig_hw=orig_hw)
+            masks = self._task.process()
+            output = None
+            if self._writer is not None:
+                record = LabelRecord(
+                    file_path, orig_hw[0], orig_hw[1], masks, name=name)
+                output = self._writer.output_of(record)
+                self._writer.write(record)
+            if self._manifest is not None:
+                self._manifest.add(ManifestEntry.from_file(
+                    file_path, digest, output))
+        except Exception as e:
+            logging.error("Label {} failed! {}".format(file_path, e))
+            self.stats.failed += 1
+        else:
+            self.stats.processed += 1
+
+    def output_name(self, file_path) -> str:
+        """Output name of an input, its path below the source root without
+        suffix
+        """
+        return output_name(file_path, self._root)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(file_path) -> str:
+    """sha256 of a file's content
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def open_append(path):
+    """Open a file of lines for appending
+
+    A line cut by a crashed run is removed first, otherwise the first
+    appended line would be glued to it and lost with it.
+    """
+    if os.path.isfile(path):
+        with open(path, 'rb+') as f:
+            end = pos = f.seek(0, os.SEEK_END)
+            while pos > 0:
+                start = max(0, pos - HASH_CHUNK_SIZE)
+                f.seek(start)
+                i = f.read(pos - start).rfind(b'\n')
+                if i >= 0:
+                    pos = start + i + 1
+                    break
+                pos = start
+            if pos < end:
+                logging.warning("Remove the cut last line of {}".format(path))
+                f.truncate(pos)
+    return open(path, 'a')
+
+
+def model_digest(checkpoint: str, model_cfg: str) -> str:
+    """Identify a model by its checkpoint file and config
+
+    The checkpoint is identified by path, size and mtime instead of its
+    content, hashing a checkpoint of several hundred MB per run is too slow.
+    """
+    stat = os.stat(checkpoint)
+    identity = "{}:{}:{}:{}".format(
+        os.path.abspath(checkpoint), stat.st_size, stat.st_mtime_ns, model_cfg)
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def execution_key(model: dict):
+    """Resolved dtype and memory format of the `model` config section
+
+    See `resolve_execution`. Returns None for float32 in the default memory
+    format, the only way models ran on CPU before the option.
+    """
+    execution = model.get('execution') or {}
+    dtype = execution.get('dtype', 'float32')
+    channels_last = bool(execution.get('channels_last', False))
+    if dtype == 'float32' and not channels_last:
+        return None
+    return {'dtype': dtype, 'channels_last': channels_last}
+
+
+def run_fingerprint(config: dict) -> str:
+    """Identify everything besides the inputs that changes the labels
+
+    That is the model checkpoint, backend and its options, the compute
+    dtype and memory format, the task, the prompts, the decode size and the
+    output format, a different fingerprint means all inputs must be labeled
+    again.
+    """
+    model = config.get('model', {})
+    checkpoint = model.get('checkpoint')
+    identity = {
+        'model': model_digest(checkpoint, model.get('model_cfg'))
+        if checkpoint and os.path.isfile(checkpoint) else model,
+        'task_type': config.get('task_type'),
+        'prompt': config.get('prompt'),
+        'prompts': config.get('prompts'),
+        'format': config.get('output', {}).get('format', 'jsonl'),
+    }
+    decode_size = config.get('runner', {}).get('decode_size')
+    if decode_size:
+        # Unset it keeps the fingerprints of the runs before the option
+        identity['decode_size'] = decode_size
+    if model.get('backend'):
+        identity['backend'] = model['backend']
+    if model.get('options'):
+        identity['options'] = model['options']
+    execution = execution_key(model)
+    if execution:
+        identity['execution'] = execution
+    return hashlib.sha256(
+        json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+class RunChangedError(RuntimeError):
+    """The config changed since the run that wrote the manifest
+    """
+
+
+def read_fingerprint(path):
+    """Fingerprint of the run that wrote a manifest, None if unknown
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.loads(f.readline()).get('fingerprint')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ManifestEntry:
+    """A completed input of a run
+    """
+
+    def __init__(self, path, size, mtime_ns, digest, output) -> None:
+        self.path = str(path)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.output = str(output) if output else None
+
+    @staticmethod
+    def from_file(file_path, digest=None, output=None) -> 'ManifestEntry':
+        stat = os.stat(file_path)
+        return ManifestEntry(file_path, stat.st_size, stat.st_mtime_ns,
+                             digest or file_digest(file_path), output)
+
+    def to_dict(self) -> dict:
+        return {
+            'path': self.path,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'hash': self.digest,
+            'output': self.output,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'ManifestEntry':
+        return ManifestEntry(data['path'], data['size'], data['mtime_ns'],
+                             data['hash'], data['output'])
+
+
+class RunManifest:
+    """Inputs completed by a run, appended to a JSONL file
+
+    Entries are loaded into a dict keyed by path, so checking an input is a
+    single lookup without touching the file. New entries are buffered and
+    should be flushed only after their labels are written, then a crash
+    never marks an input as done whose labels were lost.
+
+    The first line of a new manifest holds the `fingerprint` of the run,
+    see `run_fingerprint`.
+    """
+
+    FILE_NAME = 'manifest.jsonl'
+
+    def __init__(self, path, resume: bool = False, fingerprint: str = None) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries = {}
+        self._buffer = []
+        resume = resume and self.path.is_file()
+        if resume:
+            self._load()
+        self._file = open_append(self.path) if resume else open(self.path, 'w')
+        if not resume and fingerprint:
+            self._file.write(json.dumps({'fingerprint': fingerprint}) + '\n')
+            self._file.flush()
+
+    def _load(self):
+        with open(self.path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                    if 'fingerprint' in data:
+                        continue
+                    entry = ManifestEntry.from_dict(data)
+                except (json.JSONDecodeError, KeyError):
+                    # The last line of a crashed run may be cut
+                    logging.warning("Skip broken manifest entry in {}".format(self.path))
+                    continue
+                self._entries[entry.path] = entry
+
+    def __contains__(self, path) -> bool:
+        return str(path) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path) -> ManifestEntry:
+        return self._entries.get(str(path))
+
+    def unchanged(self, path) -> bool:
+        """Whether an input is the same as when it was labeled
+
+        Size and mtime are compared first, the content is only hashed when
+        the mtime changed but the size didn't, e.g. a file copied again.
+        """
+        entry = self._entries.get(str(path))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        digest = file_digest(path)
+        if digest != entry.digest:
+            return False
+        # Remember the new mtime to skip hashing the next time
+        self.add(ManifestEntry(path, stat.st_size, stat.st_mtime_ns,
+                               digest, entry.output))
+        return True
+
+    def add(self, entry: ManifestEntry):
+        self._entries[entry.path] = entry
+        self._buffer.append(entry)
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(''.join(
+                json.dumps(entry.to_dict()) + '\n' for entry in self._buffer))
+            self._file.flush()
+            self._buffer = []
+
+    def merge(self, path, output_of=None):
+        """Add the entries of another manifest, e.g. written by a worker
+
+        Args:
+            output_of (callable): output of an entry in this run, if the
+                labels were moved, e.g. merged from the outputs of a worker
+        """
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    entry = ManifestEntry.from_dict(json.loads(line))
+                    if output_of is not None:
+                        entry.output = str(output_of(entry))
+                    self.add(entry)
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
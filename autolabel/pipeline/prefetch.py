@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Load the next items on worker threads while the current one is used
+
+    At most `prefetch` items are loaded ahead of the consumer, so memory is
+    bounded no matter how long the source is. Items are yielded in input
+    order as `(item, data, error)`, where `error` is the exception raised by
+    `load_fn` or None.
+    """
+
+    def __init__(self, items, load_fn, prefetch: int = 4, decode_workers: int = 2):
+        if prefetch <= 0:
+            raise ValueError("Prefetch must be positive")
+        if decode_workers <= 0:
+            raise ValueError("Decode workers must be positive")
+        self._items = items
+        self._load_fn = load_fn
+        self._prefetch = prefetch
+        self._decode_workers = decode_workers
+        # The number of times the consumer had to wait for an item
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def __iter__(self):
+        items = iter(self._items)
+        pending = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=self._decode_workers,
+                                      thread_name_prefix="autolabel-decode")
+        try:
+            self._fill(executor, items, pending)
+            while pending:
+                item, future = pending.popleft()
+                if not future.done():
+                    self.waits += 1
+                    start_time = time.perf_counter()
+                    future.exception()
+                    self.wait_time += time.perf_counter() - start_time
+                # Refill before handing out the item so decoding keeps
+                # running while the consumer works on it
+                self._fill(executor, items, pending)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _fill(self, executor, items, pending):
+        while len(pending) < self._prefetch:
+            item = next(items, None)
+            if item is None:
+                return
+            pending.append((item, executor.submit(self._load_fn, item)))
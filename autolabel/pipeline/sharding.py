@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List
+
+from autolabel.label.writer import JsonlWriter, LabelRecord, WriterFactory
+from autolabel.pipeline.batch_runner import BatchRunner, iter_image_sources, \
+    output_name, source_root
+from autolabel.pipeline.manifest import RunManifest, run_fingerprint
+from autolabel.pipeline.stats import RunStats
+
+
+SHARD_DIR = '.shards'
+
+
+def split_shards(paths: List[str], num_shards: int) -> List[List[str]]:
+    """Split paths into contiguous shards of nearly equal size
+
+    Concatenating the shards gives back the input order, which keeps the
+    merged outputs deterministic.
+    """
+    num_shards = max(1, min(num_shards, len(paths)))
+    size, rest = divmod(len(paths), num_shards)
+    shards, start = [], 0
+    for i in range(num_shards):
+        end = start + size + (1 if i < rest else 0)
+        shards.append(paths[start:end])
+        start = end
+    return shards
+
+
+def run_shard(config, shard_id, paths, root, shard_dir, num_threads):
+    """Label one shard in a worker process with its own model replica
+
+    The labels and the manifest of the shard are written to `shard_dir`,
+    the parent merges the shards into the configured output format.
+    """
+    # Heavy imports are done in the worker, the parent never builds a model
+    import torch
+    from autolabel.model.embedding_cache import EmbeddingCache
+    from autolabel.model.model_factory import ModelFactory
+    from autolabel.model.registry import backend_options
+    from autolabel.prompt.prompt import prompts_from_config
+    from autolabel.source.source_factory import SourceFactory
+    from autolabel.task.image_segment_task import ImageSegmentTask
+    from autolabel.vis.visualizer import VisualizerFactory
+
+    # Split the cores between the workers instead of oversubscribing them
+    torch.set_num_threads(num_threads)
+
+    model_cfg = config['model']
+    execution = dict(model_cfg.get('execution') or {})
+    # The thread pools of the model, e.g. of onnxruntime, get the same share
+    execution.setdefault('threads', num_threads)
+    options = backend_options(dict(model_cfg, execution=execution))
+    model = ModelFactory.create(
+        model_cfg['checkpoint'], model_cfg.get('model_cfg', None),
+        config['task_type'], model_cfg.get('backend', None), options)
+    runner_cfg = config.get('runner', {})
+    embedding_cache = EmbeddingCache.from_config(
+        config.get('embedding_cache'), model_cfg, runner_cfg.get('decode_size'))
+    prompts, multi_object = prompts_from_config(config)
+    writer, manifest = None, None
+    if shard_dir:
+        writer = JsonlWriter(shard_dir,
+                             config.get('output', {}).get('buffer_size', 64),
+                             shard_labels_name(shard_id))
+        manifest = RunManifest(Path(shard_dir) / shard_manifest_name(shard_id))
+    # Workers never open windows
+    with VisualizerFactory.create(config.get('vis'), 'none') as visualizer:
+        task = ImageSegmentTask(model, embedding_cache, multi_object,
+                                visualizer)
+        for prompt in prompts:
+            task.add_prompt(prompt)
+
+        runner = BatchRunner(
+            task, writer,
+            prefetch=runner_cfg.get('prefetch', 4),
+            decode_workers=runner_cfg.get('decode_workers', 2),
+            manifest=manifest,
+            decode_size=runner_cfg.get('decode_size'))
+        try:
+            stats = runner.run_items(
+                (SourceFactory.create(p) for p in paths), root)
+        finally:
+            if writer is not None:
+                writer.close()
+                manifest.close()
+    return {
+        'shard': shard_id,
+        'pid': os.getpid(),
+        'items': len(paths),
+        'processed': stats.processed,
+        'failed': stats.failed,
+        'elapsed': stats.elapsed,
+        'throughput': stats.throughput,
+    }
+
+
+def shard_labels_name(shard_id):
+    return 'labels-{:05d}.jsonl'.format(shard_id)
+
+
+def shard_manifest_name(shard_id):
+    return 'manifest-{:05d}.jsonl'.format(shard_id)
+
+
+class ShardedRunner:
+    """Label an iterable source with a pool of worker processes
+
+    The sorted listing of the source is split into `workers` shards, each
+    labeled by a process holding its own model. A shard whose worker
+    crashed is retried up to `retries` times, the labels of every shard are
+    then merged in listing order. With `resume` the inputs in the manifest
+    of a previous run are skipped before sharding, with `incremental` only
+    those unchanged since.
+    """
+
+    def __init__(self, config, workers: int, retries: int = 1,
+                 worker_fn=run_shard, resume: bool = False,
+                 incremental: bool = False) -> None:
+        if workers <= 0:
+            raise ValueError("Workers must be positive")
+        self._config = config
+        self._workers = workers
+        self._retries = retries
+        self._worker_fn = worker_fn
+        self._resume = resume or incremental
+        self._incremental = incremental
+        output_dir = config.get('output', {}).get('dir')
+        self._output_dir = Path(output_dir) if output_dir else None
+        self.worker_stats = []
+
+    def _shard_dir(self):
+        if self._output_dir is None:
+            return None
+        return self._output_dir / SHARD_DIR
+
+    def run(self, source):
+        paths = sorted(item.source_input.input
+                       for item in iter_image_sources(source))
+        manifest = None
+        if self._output_dir:
+            manifest = RunManifest(self._output_dir / RunManifest.FILE_NAME,
+                                   self._resume, run_fingerprint(self._config))
+        try:
+            return self._run(source, paths, manifest)
+        finally:
+            if manifest is not None:
+                manifest.close()
+
+    def _run(self, source, paths, manifest):
+        run_stats = RunStats()
+        run_stats.start()
+        if manifest is not None:
+            total = len(paths)
+            if self._incremental:
+                paths = [p for p in paths if not manifest.unchanged(p)]
+            else:
+                paths = [p for p in paths if p not in manifest]
+            run_stats.skipped = total - len(paths)
+            run_stats.skip_check_time = run_stats.elapsed
+            if run_stats.skipped:
+                print("skipped: {} labeled by the previous run".format(
+                    run_stats.skipped))
+        if not paths:
+            print("No images to label in {}".format(source.source_input.input))
+            return []
+        shards = split_shards(paths, self._workers)
+        root = source_root(source)
+        num_threads = max(1, (os.cpu_count() or 1) // len(shards))
+        if self._output_dir:
+            (self._output_dir / SHARD_DIR).mkdir(parents=True, exist_ok=True)
+
+        start_time = time.perf_counter()
+        pending = list(range(len(shards)))
+        results = {}
+        for attempt in range(self._retries + 1):
+            if not pending:
+                break
+            if attempt > 0:
+                logging.warning("Retry shards {}".format(pending))
+            pending = self._run_round(
+                shards, pending, root, num_threads, results)
+        elapsed = time.perf_counter() - start_time
+
+        self.worker_stats = [results[i] for i in sorted(results)]
+        for stats in self.worker_stats:
+            print("shard {shard} (pid {pid}): processed: {processed}, "
+                  "failed: {failed}, elapsed: {elapsed:.2f}s, "
+                  "{throughput:.2f} images/sec".format(**stats))
+        processed = sum(stats['processed'] for stats in self.worker_stats)
+        print("workers: {}, processed: {}, elapsed: {:.2f}s, {:.2f} images/sec".format(
+            len(shards), processed, elapsed,
+            processed / elapsed if elapsed > 0 else 0.0))
+        if pending:
+            logging.error("Shards {} failed after {} retries".format(
+                pending, self._retries))
+
+        self._merge_shards(len(shards), manifest, root)
+        run_stats.stop()
+        if self._incremental:
+            run_stats.processed = processed
+            run_stats.failed = sum(stats['failed'] for stats in self.worker_stats)
+            print(run_stats.incremental_summary())
+        return self.worker_stats
+
+    def _run_round(self, shards, shard_ids, root, num_threads, results):
+        # "spawn" gives every worker a clean CUDA/torch state, and one pool
+        # per shard keeps a crashed worker from failing the other shards
+        context = multiprocessing.get_context('spawn')
+        executors, futures, failed = [], {}, []
+        try:
+            for shard_id in shard_ids:
+                executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+                executors.append(executor)
+                future = executor.submit(
+                    self._worker_fn, self._config, shard_id, shards[shard_id],
+                    root, self._shard_dir(), num_threads)
+                futures[future] = shard_id
+            for future in as_completed(futures):
+                shard_id = futures[future]
+                try:
+                    results[shard_id] = future.result()
+                except Exception as e:
+                    logging.error("Shard {} failed! {}".format(shard_id, e))
+                    failed.append(shard_id)
+        finally:
+            for executor in executors:
+                executor.shutdown()
+        return sorted(failed)
+
+    def _merge_shards(self, num_shards, manifest, root):
+        if self._output_dir is None:
+            return
+        shard_dir = self._shard_dir()
+        with WriterFactory.create(self._config.get('output'),
+                                  append=self._resume) as writer:
+            for shard_id in range(num_shards):
+                shard_labels = shard_dir / shard_labels_name(shard_id)
+                if shard_labels.is_file():
+                    writer.merge(shard_labels)
+
+        def output_of(entry):
+            # The shard outputs are removed below, point to the merged ones
+            return writer.output_of(LabelRecord(
+                entry.path, 0, 0, [], name=output_name(entry.path, root)))
+
+        # Inputs are marked done only after their labels are merged
+        for shard_id in range(num_shards):
+            shard_manifest = shard_dir / shard_manifest_name(shard_id)
+            if shard_manifest.is_file():
+                manifest.merge(shard_manifest, output_of)
+        shutil.rmtree(self._output_dir / SHARD_DIR, ignore_errors=True)
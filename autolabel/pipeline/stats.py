@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+
+class RunStats:
+    """Counters and timing of a labeling run
+    """
+
+    def __init__(self) -> None:
+        self.processed = 0
+        self.failed = 0
+        # Inputs already labeled by a previous run
+        self.skipped = 0
+        # Time spent checking whether inputs were labeled
+        self.skip_check_time = 0.0
+        # The number of times the model waited for a decoded input
+        self.input_waits = 0
+        self.input_wait_time = 0.0
+        self._start_time = None
+        self._end_time = None
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        self._end_time = None
+
+    def stop(self):
+        self._end_time = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        if self._start_time is None:
+            return 0.0
+        end_time = self._end_time or time.perf_counter()
+        return end_time - self._start_time
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def full_run_estimate(self) -> float:
+        """Seconds a run labeling the skipped inputs too would have taken
+
+        Returns:
+            float: None if no input was labeled to measure the speed
+        """
+        labeled = self.processed + self.failed
+        if labeled == 0:
+            return None
+        per_item = (self.elapsed - self.skip_check_time) / labeled
+        return per_item * (labeled + self.skipped)
+
+    def incremental_summary(self) -> str:
+        estimate = self.full_run_estimate()
+        return ("incremental: skipped {} unchanged inputs ({:.2f}s to check), "
+                "labeled {}, elapsed: {:.2f}s, full re-label: {}").format(
+            self.skipped, self.skip_check_time, self.processed + self.failed,
+            self.elapsed,
+            "n/a" if estimate is None else "~{:.2f}s".format(estimate))
+
+    def summary(self) -> str:
+        return ("processed: {}, failed: {}, skipped: {}, elapsed: {:.2f}s, "
+                "{:.2f} images/sec, waited on input: {} times ({:.2f}s)").format(
+            self.processed, self.failed, self.skipped, self.elapsed,
+            self.throughput, self.input_waits, self.input_wait_time)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from autolabel.label.writer import LabelRecord
+
+
+class FrameLabelSink:
+    """Pass the masks of each tracked frame to a label writer
+
+    Frames are written as soon as they are tracked, so nothing of the video
+    is kept in memory after its frame is written. Records are named like
+    the frames saved by `VideoSource.slice`, the object ids are kept as
+    track ids.
+    """
+
+    def __init__(self, writer) -> None:
+        self._writer = writer
+        self.frames = 0
+
+    def __call__(self, frame_idx, frame, masks):
+        obj_ids = sorted(masks)
+        if obj_ids:
+            height, width = masks[obj_ids[0]].size
+        else:
+            height, width = frame.shape[:2]
+        name = "{:05d}".format(frame_idx)
+        self._writer.write(LabelRecord(
+            name + ".jpg", height, width, [masks[i] for i in obj_ids],
+            track_ids=obj_ids, name=name))
+        self.frames += 1
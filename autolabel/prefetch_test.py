@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from autolabel.pipeline.prefetch import Prefetcher
+
+
+def test_prefetch_order_bound_and_errors():
+    drawn = []
+
+    def items():
+        for i in range(10):
+            drawn.append(i)
+            yield i
+
+    def load(i):
+        # Later items finish first, failures are handed over in order
+        time.sleep((10 - i) * 0.002)
+        if i == 3:
+            raise ValueError("broken {}".format(i))
+        return i * 10
+
+    results = []
+    for item, data, error in Prefetcher(items(), load, prefetch=3, decode_workers=3):
+        # Never more than `prefetch` items ahead of the consumer
+        assert len(drawn) <= item + 1 + 3
+        results.append((item, data, str(error) if error else None))
+
+    assert [item for item, _, _ in results] == list(range(10))
+    assert results[3] == (3, None, "broken 3")
+    assert all(data == item * 10 for item, data, error in results if item != 3)
+
+
+def test_prefetch_stops_early():
+    loaded = []
+    prefetcher = Prefetcher(range(100), loaded.append, prefetch=2, decode_workers=1)
+    for item, _, _ in prefetcher:
+        if item == 1:
+            break
+    time.sleep(0.05)
+    assert len(loaded) <= 4
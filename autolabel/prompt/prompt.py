@@ -25,3 +25,29 @@ class Prompt:
         self.point_labels = point_labels
         self.box = box
         self.mask_input = mask_input
+
+    @staticmethod
+    def from_dict(data):
+        """Create a prompt from the `prompt` section of a config
+        """
+        data = data or {}
+        return Prompt(
+            data.get('point_coords', None),
+            data.get('point_labels', None),
+            data.get('box', None),
+            data.get('mask_input', None)
+        )
+
+
+def prompts_from_config(config):
+    """Prompts of a config
+
+    A `prompts` list labels one object per prompt, while a single `prompt`
+    is combined into one object.
+
+    Returns:
+        tuple: list of prompts, whether each prompt is its own object
+    """
+    if config.get('prompts'):
+        return [Prompt.from_dict(data) for data in config['prompts']], True
+    return [Prompt.from_dict(config.get('prompt', {}))], False
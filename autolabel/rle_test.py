@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from autolabel.label.rle import RLEMask
+
+
+def _random_masks(count=50, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        h, w = rng.integers(1, 20, 2)
+        yield rng.random((h, w)) < rng.random()
+
+
+def test_encode_decode():
+    for mask in _random_masks():
+        rle = RLEMask.encode(mask)
+        assert rle.shape == mask.shape
+        assert rle.area() == mask.sum()
+        assert np.array_equal(rle.decode(), mask)
+
+
+def test_column_major_counts():
+    mask = np.array([[0, 1],
+                     [1, 1]])
+    assert RLEMask.encode(mask).counts.tolist() == [1, 3]
+    assert RLEMask.encode(np.ones((2, 2))).counts.tolist() == [0, 4]
+
+
+def test_set_operations():
+    masks = list(_random_masks())
+    for a, b in zip(masks[:-1], masks[1:]):
+        if a.shape != b.shape:
+            b = np.resize(b, a.shape)
+        rle_a, rle_b = RLEMask.encode(a), RLEMask.encode(b)
+        assert np.array_equal((rle_a | rle_b).decode(), a | b)
+        assert np.array_equal((rle_a & rle_b).decode(), a & b)
+        assert np.array_equal((rle_a - rle_b).decode(), a & ~b)
+
+
+def test_size_mismatch():
+    with pytest.raises(ValueError):
+        RLEMask.encode(np.ones((2, 2))).union(RLEMask.encode(np.ones((2, 3))))
+
+
+def test_bbox_and_contains():
+    mask = np.zeros((6, 8), dtype=bool)
+    mask[1:4, 2:7] = True
+    rle = RLEMask.encode(mask)
+    assert rle.bbox() == [2, 1, 5, 3]
+    assert rle.contains(2, 1)
+    assert not rle.contains(1, 1)
+    assert not rle.contains(100, 1)
+    assert RLEMask.encode(np.zeros((3, 3))).bbox() == [0, 0, 0, 0]
+
+
+def test_coco_round_trip():
+    for mask in _random_masks():
+        rle = RLEMask.encode(mask)
+        coco = rle.to_coco()
+        assert coco['size'] == list(mask.shape)
+        assert isinstance(coco['counts'], str)
+        assert RLEMask.from_coco(coco) == rle
+    # Uncompressed counts are accepted too
+    assert RLEMask.from_coco({'size': [2, 2], 'counts': [1, 3]}) == \
+        RLEMask.encode(np.array([[0, 1], [1, 1]]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import os
+import socket
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Tokens of the running servers, only readable by their user
+TOKEN_DIR = os.path.join(os.path.expanduser("~"), ".autolabel")
+TOKEN_HEADER = "X-Autolabel-Token"
+
+
+def parse_address(address):
+    """(host, port) of "host:port", ":port" or "port"
+    """
+    host, _, port = str(address or "").rpartition(':')
+    return host or DEFAULT_HOST, int(port) if port else DEFAULT_PORT
+
+
+def is_loopback(host) -> bool:
+    """Whether `host` only resolves to loopback addresses
+    """
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except OSError:
+        return False
+    return bool(infos) and all(
+        ipaddress.ip_address(info[4][0]).is_loopback for info in infos)
+
+
+def token_path(port, token_dir=None) -> str:
+    """File with the token of the server on `port`
+    """
+    return os.path.join(token_dir or TOKEN_DIR, "server-{}.token".format(port))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import requests
+
+from autolabel.server.address import TOKEN_HEADER, parse_address, token_path
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+class ModelClient:
+    """Submit label jobs to a `ModelServer`
+
+    The token of the server is read from its file in `token_dir`.
+    """
+
+    def __init__(self, address=None, timeout=None, token_dir=None) -> None:
+        host, port = parse_address(address)
+        self.url = "http://{}:{}".format(host, port)
+        # No timeout by default, a job lasts as long as its source
+        self.timeout = timeout
+        self._session = requests.Session()
+        try:
+            with open(token_path(port, token_dir)) as f:
+                self._session.headers[TOKEN_HEADER] = f.read().strip()
+        except OSError:
+            # No server on this port, or one of another user
+            pass
+
+    def health(self, timeout: float = 1.0):
+        """The state of the server, None if it is not reachable
+        """
+        try:
+            r = self._session.get(self.url + "/health", timeout=timeout)
+            r.raise_for_status()
+            return r.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+    def submit(self, config: dict, resume: bool = False,
+               incremental: bool = False) -> dict:
+        """Run a job on the server and wait for it
+
+        Relative paths of the config are resolved in the current working
+        directory, like a local run.
+
+        Returns:
+            dict: the output of the job and its elapsed seconds
+
+        Raises:
+            ServerError: if the job failed
+        """
+        r = self._session.post(self.url + "/jobs", json={
+            "config": config,
+            "resume": resume,
+            "incremental": incremental,
+            "cwd": os.getcwd(),
+        }, timeout=self.timeout)
+        try:
+            reply = r.json()
+        except ValueError:
+            reply = {"error": r.text}
+        if r.status_code != 200:
+            raise ServerError(reply.get("error", r.reason))
+        return reply
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
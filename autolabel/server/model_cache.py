@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+
+from autolabel.pipeline.manifest import model_digest
+
+
+def _create_model(checkpoint, model_cfg, task_type, backend=None, options=None):
+    # Imported on the first load, the cache itself doesn't need torch
+    from autolabel.model.model_factory import ModelFactory
+    return ModelFactory.create(checkpoint, model_cfg, task_type, backend, options)
+
+
+class ModelCache:
+    """Models kept loaded, keyed by (checkpoint, model_cfg, task_type,
+    backend, options, digest)
+
+    The checkpoint is keyed by its absolute path, jobs of different working
+    directories may use the same relative one, and the digest of a checkpoint
+    file changes with its size and mtime, see `model_digest`. Checkpoints
+    that are not files, e.g. names of a model hub, have no digest.
+
+    A model is built by `loader` the first time it is asked for, later
+    calls return the same object. At most `capacity` models stay loaded,
+    the least recently used one is dropped first.
+    """
+
+    def __init__(self, loader=_create_model, capacity: int = 2) -> None:
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        self._loader = loader
+        self._capacity = capacity
+        self._models = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def get(self, checkpoint: str, model_cfg: str, task_type: str,
+            backend: str = None, options=None):
+        path = os.path.abspath(checkpoint)
+        digest = model_digest(path, model_cfg) if os.path.isfile(path) else None
+        key = (path if digest else checkpoint, model_cfg, task_type, backend,
+               json.dumps(options, sort_keys=True) if options else None, digest)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            for stale in [k for k in self._models if k[:-1] == key[:-1]]:
+                # The checkpoint was rebuilt in place
+                logging.info("Unload changed model {}".format(stale))
+                del self._models[stale]
+            # Loading under the lock, a model is never built twice
+            model = self._loader(checkpoint, model_cfg, task_type, backend, options)
+            self.loads += 1
+            self._models[key] = model
+            while len(self._models) > self._capacity:
+                evicted, _ = self._models.popitem(last=False)
+                logging.info("Unload model {}".format(evicted))
+                self._release_memory()
+            return model
+
+    def keys(self):
+        with self._lock:
+            return list(self._models)
+
+    @staticmethod
+    def _release_memory():
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def summary(self) -> str:
+        return "model cache loads: {}, hits: {}".format(self.loads, self.hits)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import hmac
+import io
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from autolabel.server.address import DEFAULT_HOST, DEFAULT_PORT, TOKEN_HEADER, \
+    is_loopback, token_path
+from autolabel.server.model_cache import ModelCache
+
+
+def _run_config(config, model_cache, resume, incremental):
+    # The cli imports the models and tasks, only needed once a job runs
+    from autolabel.cmd import run_config
+    run_config(config, 1, resume, incremental, model_loader=model_cache.get)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "autolabel"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _check_request(self):
+        """Refuse requests that a web page in a browser could send
+
+        A page can post to localhost without a CORS preflight, but not with
+        a json body or a custom header, and its requests carry an `Origin`.
+        """
+        model_server = self.server.model_server
+        if "Origin" in self.headers:
+            self._reply(403, {"error": "Cross origin requests are not allowed"})
+            return False
+        if self.headers.get("Host") not in model_server.hosts:
+            self._reply(403, {"error": "Bad host: {}".format(
+                self.headers.get("Host"))})
+            return False
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""),
+                                   model_server.token):
+            self._reply(401, {"error": "Missing or wrong {}, read it from {}".format(
+                TOKEN_HEADER, model_server.token_path)})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._check_request():
+            return
+        if self.path != "/health":
+            self._reply(404, {"error": "Not found: {}".format(self.path)})
+            return
+        self._reply(200, self.server.model_server.health())
+
+    def do_POST(self):
+        if not self._check_request():
+            return
+        if self.path != "/jobs":
+            self._reply(404, {"error": "Not found: {}".format(self.path)})
+            return
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip().lower() != "application/json":
+            self._reply(415, {"error": "Jobs must be application/json, not '{}'".format(
+                content_type)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            config = job["config"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": "Bad job: {}".format(e)})
+            return
+        status, body = self.server.model_server.run_job(
+            config, job.get("resume", False), job.get("incremental", False),
+            job.get("cwd"))
+        self._reply(status, body)
+
+
+class ModelServer:
+    """Localhost http server running label jobs on resident models
+
+    `POST /jobs` runs the config of a job, like `autolabel -c`, with models
+    from `model_cache`, so only the first job of a model loads it. Jobs run
+    one at a time, each in the working directory of its client. The result
+    is the printed output of the job. `GET /health` lists the loaded models.
+
+    A job writes wherever its config says, so the server only listens on
+    loopback addresses and only serves requests with its token, which it
+    writes to a file only its user can read. Requests with an `Origin` or
+    another `Host` header, as sent by web pages, and jobs that are not json
+    are refused.
+
+    Args:
+        job_fn (callable): runs a job as `job_fn(config, model_cache, resume,
+            incremental)`, the cli by default
+        token_dir (str): directory of the token file, `~/.autolabel` by default
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 model_cache=None, job_fn=_run_config, token_dir=None) -> None:
+        if not is_loopback(host):
+            raise ValueError("Model server host '{}' is not a loopback address, "
+                             "any client could run jobs on this machine".format(host))
+        self.model_cache = model_cache if model_cache is not None else ModelCache()
+        self._job_fn = job_fn
+        self._job_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.model_server = self
+        self.jobs = 0
+
+        bound_host, bound_port = self.address
+        self.hosts = {"{}:{}".format("[{}]".format(name) if ":" in name else name,
+                                     bound_port)
+                      for name in (host, bound_host, "localhost")}
+        self.token = secrets.token_hex(16)
+        self.token_path = token_path(bound_port, token_dir)
+        self._write_token()
+
+    def _write_token(self):
+        os.makedirs(os.path.dirname(self.token_path), mode=0o700, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.token_path)
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(self.token)
+
+    @property
+    def address(self):
+        return self._httpd.server_address[:2]
+
+    def health(self):
+        return {
+            "status": "ok",
+            "jobs": self.jobs,
+            "models": [list(key) for key in self.model_cache.keys()],
+        }
+
+    def run_job(self, config, resume=False, incremental=False, cwd=None):
+        """Run a job
+
+        Returns:
+            tuple: http status and the reply, the output of the job or the
+                error it failed with
+        """
+        # Windows of the job would block the server
+        vis = config.get('vis') or {}
+        if vis.get('mode', 'window') == 'window':
+            config = dict(config, vis=dict(vis, mode='none'))
+
+        with self._job_lock:
+            start_time = time.perf_counter()
+            output = io.StringIO()
+            old_cwd = os.getcwd()
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                with contextlib.redirect_stdout(output):
+                    self._job_fn(config, self.model_cache, resume, incremental)
+            except Exception as e:
+                logging.exception("Job failed")
+                return 500, {"error": "{}: {}".format(type(e).__name__, e),
+                             "output": output.getvalue()}
+            finally:
+                os.chdir(old_cwd)
+                self.jobs += 1
+            return 200, {"output": output.getvalue(),
+                         "elapsed": time.perf_counter() - start_time}
+
+    def serve_forever(self):
+        host, port = self.address
+        print("autolabel server listening on http://{}:{}".format(host, port))
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Serve on a background thread, e.g. in tests
+        """
+        thread = threading.Thread(target=self._httpd.serve_forever,
+                                  args=(0.05,), name="autolabel-server",
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.token_path)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from autolabel.label.rle import RLEMask
+from autolabel.label.writer import JsonlWriter
+from autolabel.pipeline.batch_runner import BatchRunner
+from autolabel.pipeline.manifest import RunManifest
+from autolabel.pipeline.sharding import (ShardedRunner, shard_labels_name,
+                                         shard_manifest_name, split_shards)
+from autolabel.source.source_factory import SourceFactory
+
+
+class FakeTask:
+    def set_data(self, data, cache_key=None, name=None, orig_hw=None):
+        self._data = data
+
+    def process(self):
+        return [RLEMask.encode(np.ones(self._data.shape[:2]))]
+
+
+def flaky_worker(config, shard_id, paths, root, shard_dir, num_threads):
+    """Label a shard without a model, the second shard fails once
+    """
+    marker = Path(shard_dir) / 'failed-{}'.format(shard_id)
+    if shard_id == 1 and not marker.exists():
+        marker.write_text('')
+        raise RuntimeError("worker crashed")
+    writer = JsonlWriter(shard_dir, 64, shard_labels_name(shard_id))
+    with RunManifest(Path(shard_dir) / shard_manifest_name(shard_id)) as manifest:
+        runner = BatchRunner(FakeTask(), writer, prefetch=0, manifest=manifest)
+        stats = runner.run_items((SourceFactory.create(p) for p in paths), root)
+        writer.close()
+    return {'shard': shard_id, 'pid': 0, 'items': len(paths),
+            'processed': stats.processed, 'failed': stats.failed,
+            'elapsed': stats.elapsed, 'throughput': stats.throughput}
+
+
+def test_split_shards():
+    assert split_shards(list('abcde'), 2) == [['a', 'b', 'c'], ['d', 'e']]
+    assert split_shards(['a'], 4) == [['a']]
+
+
+def test_sharded_runner_retry_and_merge(tmp_path, caplog):
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    for i in range(4):
+        shutil.copy('autolabel/images/truck.jpg', image_dir / '{}.jpg'.format(i))
+    output_dir = tmp_path / 'output'
+    config = {'task_type': 'image_segment', 'model': {'checkpoint': 'stub'},
+              'output': {'dir': str(output_dir)}}
+
+    runner = ShardedRunner(config, workers=2, retries=1, worker_fn=flaky_worker)
+    with caplog.at_level(logging.WARNING):
+        worker_stats = runner.run(SourceFactory.create(str(image_dir)))
+    assert "Retry shards [1]" in caplog.text
+    assert [stats['processed'] for stats in worker_stats] == [2, 2]
+
+    expected = [str(image_dir / '{}.jpg'.format(i)) for i in range(4)]
+    with open(output_dir / 'labels.jsonl') as f:
+        assert [json.loads(line)['file_name'] for line in f] == expected
+    with RunManifest(output_dir / RunManifest.FILE_NAME, resume=True) as manifest:
+        assert all(path in manifest for path in expected)
+        # The entries point to the merged labels, not to the removed shards
+        assert {manifest.get(path).output for path in expected} == {
+            str(output_dir / 'labels.jsonl')}
+    assert not (output_dir / '.shards').exists()
+
+
+def test_sharded_runner_yolo_outputs(tmp_path):
+    image_dir = tmp_path / 'images'
+    (image_dir / 'sub').mkdir(parents=True)
+    for name in ('0.jpg', 'sub/1.jpg'):
+        shutil.copy('autolabel/images/truck.jpg', image_dir / name)
+    output_dir = tmp_path / 'output'
+    config = {'task_type': 'image_segment', 'model': {'checkpoint': 'stub'},
+              'output': {'dir': str(output_dir), 'format': 'yolo'}}
+
+    ShardedRunner(config, workers=2, retries=1, worker_fn=flaky_worker).run(
+        SourceFactory.create(str(image_dir)))
+    with RunManifest(output_dir / RunManifest.FILE_NAME, resume=True) as manifest:
+        for name in ('0', 'sub/1'):
+            output = manifest.get(str(image_dir / (name + '.jpg'))).output
+            assert output == str(output_dir / 'labels' / (name + '.txt'))
+            assert Path(output).is_file()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+_END = object()
+
+
+class AsyncLoader:
+    """Run a blocking `fetch` over many items concurrently
+
+    An asyncio loop on a background thread schedules `fetch(item)` on
+    `concurrency` threads, e.g. to download and decode images. Items are
+    fetched only about `concurrency` ahead of the consumer, so a slow
+    consumer holds back the reading of the items. Results are handed over
+    in the order of the items, or as they complete if not `ordered`.
+    """
+
+    def __init__(self, fetch, concurrency: int = 8, ordered: bool = True) -> None:
+        if concurrency <= 0:
+            raise ValueError("Concurrency must be positive")
+        self._fetch = fetch
+        self._concurrency = concurrency
+        self._ordered = ordered
+
+    async def _fetch_one(self, executor, item):
+        loop = asyncio.get_running_loop()
+        try:
+            return item, await loop.run_in_executor(executor, self._fetch, item), None
+        except Exception as e:
+            return item, None, e
+
+    async def _produce(self, items, executor, out, slots):
+        try:
+            if self._ordered:
+                # The tasks are queued in order, the queue bounds them
+                for item in items:
+                    await out.put(asyncio.ensure_future(
+                        self._fetch_one(executor, item)))
+            else:
+                await self._produce_unordered(items, executor, out, slots)
+        except Exception:
+            await out.put(_END)
+            raise
+        await out.put(_END)
+
+    async def _produce_unordered(self, items, executor, out, slots):
+        async def fetch_to_queue(item):
+            await out.put(await self._fetch_one(executor, item))
+
+        tasks = set()
+        for item in items:
+            # Released once the consumer takes a result
+            await slots.acquire()
+            task = asyncio.ensure_future(fetch_to_queue(item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _next(self, out, slots):
+        result = await out.get()
+        if self._ordered and result is not _END:
+            result = await result
+        elif not self._ordered:
+            slots.release()
+        return result
+
+    @staticmethod
+    async def _join(producer):
+        await producer
+
+    @staticmethod
+    async def _cancel_all():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def map(self, items):
+        """Fetch `items`
+
+        Yields:
+            tuple: item, result of `fetch` and the exception it raised, or
+                None
+        """
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever,
+                                  name="autolabel-async-loader", daemon=True)
+        thread.start()
+        executor = ThreadPoolExecutor(max_workers=self._concurrency,
+                                      thread_name_prefix="autolabel-fetch")
+
+        async def start():
+            out = asyncio.Queue(maxsize=self._concurrency)
+            slots = asyncio.Semaphore(self._concurrency)
+            producer = asyncio.ensure_future(
+                self._produce(items, executor, out, slots))
+            return out, slots, producer
+
+        def call(coro):
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+        out, slots, producer = call(start())
+        try:
+            while True:
+                result = call(self._next(out, slots))
+                if result is _END:
+                    break
+                yield result
+            # Raise what failed in reading the items
+            call(self._join(producer))
+        finally:
+            call(self._cancel_all())
+            # Running fetches finish while the loop still takes their results
+            executor.shutdown(wait=True, cancel_futures=True)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
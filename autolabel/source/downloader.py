@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DOWNLOAD_CACHE_DIR = "/tmp/autolabel/downloads"
+# 4GB
+DOWNLOAD_CACHE_BYTES = 4 << 30
+# Files used this recently may still be decoded or hashed, never evicted
+DOWNLOAD_CACHE_GRACE_SECONDS = 300
+
+MIN_CHUNK_SIZE = 64 << 10
+MAX_CHUNK_SIZE = 4 << 20
+
+
+def chunk_size_of(content_length: int) -> int:
+    """Read a response in about 16 chunks, within the chunk size bounds
+    """
+    if content_length <= 0:
+        return MAX_CHUNK_SIZE // 4
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 16))
+
+
+def _progress(prefix, cur, total):
+    bar_size = 50
+    cur_p = int(cur / total * bar_size) if total else bar_size
+    print("{}[{}{}] {}/{}".format(prefix, "#"*cur_p, "."*(bar_size - cur_p),
+                                  cur, total), end='\r', file=sys.stdout, flush=True)
+
+
+class DownloadCache:
+    """Downloaded files keyed by the hash of their url
+
+    The file of a url keeps the suffix of the url path, so it can be
+    classified by extension. Once the files exceed `max_bytes` the least
+    recently used are removed, a hit refreshes the mtime of a file. Files
+    used in the last `grace_seconds` are kept over the limit, their callers
+    may not have read them yet.
+    """
+
+    def __init__(self, cache_dir=DOWNLOAD_CACHE_DIR,
+                 max_bytes: int = DOWNLOAD_CACHE_BYTES,
+                 grace_seconds: float = DOWNLOAD_CACHE_GRACE_SECONDS) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._size = sum(f.stat().st_size for f in self._files())
+
+    def _files(self):
+        return (f for f in self.cache_dir.iterdir()
+                if f.is_file() and not f.name.startswith('.'))
+
+    def path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        suffix = Path(urlparse(url).path).suffix
+        return self.cache_dir / "{}{}".format(key, suffix)
+
+    def get(self, url: str):
+        """Path of the cached file of `url`, None if not cached
+        """
+        path = self.path(url)
+        # Under the lock, a file is never evicted between the check and use
+        with self._lock:
+            try:
+                os.utime(path)
+            except OSError:
+                return None
+        return path
+
+    def tmp_path(self, url: str) -> Path:
+        # Unique, concurrent downloads of a url never share a file
+        return self.cache_dir / ".{}.{}".format(self.path(url).name, uuid.uuid4().hex)
+
+    def put(self, url: str, tmp_path) -> Path:
+        """Move a downloaded file into the cache, then evict
+
+        Returns:
+            Path: the cached file
+        """
+        path = self.path(url)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            if path.is_file():
+                self._size -= path.stat().st_size
+            os.replace(tmp_path, path)
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep):
+        files = sorted((f.stat().st_mtime_ns, f) for f in self._files())
+        recent_ns = time.time_ns() - int(self.grace_seconds * 1e9)
+        for mtime_ns, f in files:
+            if self._size <= self.max_bytes:
+                break
+            if mtime_ns > recent_ns:
+                logging.debug("Download cache over its limit, the rest of "
+                              "the files were used recently")
+                break
+            if f == keep:
+                continue
+            try:
+                size = f.stat().st_size
+                f.unlink()
+            except OSError:
+                continue
+            self._size -= size
+            logging.debug("Evict {} from download cache".format(f))
+
+
+class DownloadManager:
+    """Download urls into a `DownloadCache` over a pooled session
+
+    At most `workers` downloads run at once and they share the connections
+    of one `requests.Session`. A url that is already being downloaded is
+    not downloaded again, its callers wait for the same download, so all
+    downloads should go through `submit` or `fetch`.
+    """
+
+    def __init__(self, cache=None, workers: int = 8, timeout: float = 30,
+                 retries: int = 2) -> None:
+        if workers <= 0:
+            raise ValueError("Workers must be positive")
+        self.cache = cache if cache is not None else DownloadCache()
+        self.workers = workers
+        self.timeout = timeout
+        self._retries = retries
+        self._session = requests.Session()
+        self._mount()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="autolabel-download")
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def _mount(self):
+        adapter = HTTPAdapter(
+            pool_connections=self.workers, pool_maxsize=self.workers,
+            max_retries=Retry(total=self._retries, backoff_factor=0.5,
+                              status_forcelist=(429, 500, 502, 503, 504)))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def grow(self, workers: int):
+        """Allow at least `workers` downloads and pooled connections at once
+        """
+        with self._lock:
+            if workers <= self.workers:
+                return
+            self.workers = workers
+            self._mount()
+            executor, self._executor = self._executor, ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="autolabel-download")
+        # Running downloads finish on the old threads
+        executor.shutdown(wait=False)
+
+    def download(self, url: str, progress: bool = False) -> Path:
+        """Download `url` unless it is cached, blocking
+
+        Returns:
+            Path: the cached file
+        """
+        path = self.cache.get(url)
+        if path is not None:
+            return path
+
+        tmp_path = self.cache.tmp_path(url)
+        try:
+            with self._session.get(url, stream=True, timeout=self.timeout) as r:
+                r.raise_for_status()
+                total = int(r.headers.get('content-length', 0))
+                done = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size_of(total)):
+                        f.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            _progress("Downloading:", done, total)
+                if progress:
+                    print()
+            return self.cache.put(url, tmp_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def submit(self, url: str, progress: bool = False):
+        """Download `url` on a worker thread
+
+        Returns:
+            Future: of the cached file
+        """
+        with self._lock:
+            future = self._pending.get(url)
+            if future is None:
+                future = self._executor.submit(self.download, url, progress)
+                self._pending[url] = future
+                future.add_done_callback(lambda _: self._done(url))
+            return future
+
+    def fetch(self, url: str, progress: bool = False) -> Path:
+        """Download `url` through `submit` and wait for it
+
+        Returns:
+            Path: the cached file
+        """
+        return self.submit(url, progress).result()
+
+    def _done(self, url):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def download_all(self, urls):
+        """Download `urls` concurrently, at most 2 * `workers` ahead of the
+        consumer
+
+        Yields:
+            tuple: url and the cached file, None if the download failed, in
+                the order of `urls`
+        """
+        window = deque()
+        for url in urls:
+            window.append((url, self.submit(url)))
+            if len(window) >= 2 * self.workers:
+                yield self._result(*window.popleft())
+        while window:
+            yield self._result(*window.popleft())
+
+    def _result(self, url, future):
+        try:
+            return url, future.result()
+        except Exception as e:
+            logging.error("Download {} failed! {}".format(url, e))
+            return url, None
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def default_manager(workers: int = None) -> DownloadManager:
+    """The manager shared by the url sources of a process, grown to at least
+    `workers` downloads at once
+    """
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = DownloadManager(workers=max(workers or 8, 8))
+        elif workers:
+            _default_manager.grow(workers)
+        return _default_manager
@@ -15,8 +15,11 @@
 # limitations under the License.
 
 import abc
+import numpy as np
 from PIL import Image
 
+from autolabel.source.image_decoder import decode_image, decode_image_reduced
+
 
 class FileSource(metaclass=abc.ABCMeta):
     def __init__(self, source_input) -> None:
@@ -46,6 +49,31 @@ class ImageFileSource(FileSource):
                 raise IOError(f"Unsupported image format: {file_path}")
         return self._data
 
+    def decode(self) -> np.ndarray:
+        """Decode the image to a RGB array without keeping it in the source
+        """
+        file_path = self.source_input.input
+        try:
+            return decode_image(file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {file_path}")
+        except IOError:
+            raise IOError(f"Unsupported image format: {file_path}")
+
+    def decode_reduced(self, min_size: int):
+        """Decode the image at a reduced resolution, see `decode_image_reduced`
+
+        Returns:
+            tuple: RGB array and the (height, width) of the original image
+        """
+        file_path = self.source_input.input
+        try:
+            return decode_image_reduced(file_path, min_size)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {file_path}")
+        except IOError:
+            raise IOError(f"Unsupported image format: {file_path}")
+
 
 class PCDFileSource(FileSource):
     def __init__(self, source_input):
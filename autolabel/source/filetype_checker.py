@@ -15,7 +15,7 @@
 # limitations under the License.
 
 
-import imghdr
+import os
 import re
 import mimetypes
 
@@ -23,6 +23,94 @@ from pathlib import Path
 from urllib.parse import urlparse
 
 
+STREAM_PATTERN = re.compile(
+    r'^(rtsp://|rtmp://)[^\s/$.?#].[^\s]*$', re.IGNORECASE)
+SCREENSHOT_PATTERN = re.compile(r"^screen:\d+$")
+GLOB_PATTERN = re.compile(r'^glob\(([^)]+)\)$')
+
+VIDEO_MIME_TYPES = {
+    "video/x-msvideo",  # for avi files
+    "video/mp4",        # for mp4 files
+    "video/x-matroska",  # for mkv files
+    "video/quicktime",  # for mov files
+    "video/webm",       # for webm files
+    "video/x-flv",      # for flv files
+    "video/mpeg",       # for mpeg files
+}
+
+# Files are classified by extension first, only files with an unknown
+# extension are opened to sniff their content
+IMAGE = 'image'
+VIDEO = 'video'
+PCD = 'pcd'
+CSV = 'csv'
+
+EXTENSION_KINDS = {
+    '.jpg': IMAGE, '.jpeg': IMAGE, '.jpe': IMAGE, '.png': IMAGE,
+    '.bmp': IMAGE, '.gif': IMAGE, '.tif': IMAGE, '.tiff': IMAGE,
+    '.webp': IMAGE, '.pbm': IMAGE, '.pgm': IMAGE, '.ppm': IMAGE,
+    '.pnm': IMAGE, '.ras': IMAGE, '.exr': IMAGE,
+    '.avi': VIDEO, '.mp4': VIDEO, '.m4v': VIDEO, '.mkv': VIDEO,
+    '.mov': VIDEO, '.qt': VIDEO, '.webm': VIDEO, '.flv': VIDEO,
+    '.mpeg': VIDEO, '.mpg': VIDEO, '.mpe': VIDEO,
+    '.pcd': PCD,
+    '.csv': CSV,
+}
+
+# Extensions that are known not to be inputs, never sniffed
+IGNORED_EXTENSIONS = {
+    '.txt', '.json', '.jsonl', '.xml', '.yaml', '.yml', '.md', '.npz',
+    '.npy', '.pt', '.pth', '.onnx', '.py', '.zip', '.tar', '.gz',
+}
+
+SNIFF_SIZE = 32
+
+
+def _is_pnm(header: bytes) -> bool:
+    return len(header) >= 3 and header[:1] == b'P' and \
+        header[1:2] in b'123456' and header[2:3] in b' \t\n\r'
+
+
+IMAGE_SIGNATURES = (
+    lambda h: h[:3] == b'\xff\xd8\xff',                      # jpeg
+    lambda h: h[:8] == b'\x89PNG\r\n\x1a\n',                  # png
+    lambda h: h[:6] in (b'GIF87a', b'GIF89a'),                # gif
+    lambda h: h[:2] == b'BM',                                 # bmp
+    lambda h: h[:4] in (b'II*\x00', b'MM\x00*'),               # tiff
+    lambda h: h[:4] == b'RIFF' and h[8:12] == b'WEBP',        # webp
+    lambda h: h[:4] == b'\x59\xa6\x6a\x95',                   # rast
+    lambda h: h[:4] == b'\x76\x2f\x31\x01',                   # exr
+    _is_pnm,                                                  # pbm/pgm/ppm
+)
+
+
+def sniff_image(src: str) -> bool:
+    """
+    Check the magic bytes of a file for a known image format.
+    """
+    try:
+        with open(src, 'rb') as f:
+            header = f.read(SNIFF_SIZE)
+    except OSError:
+        return False
+    return any(signature(header) for signature in IMAGE_SIGNATURES)
+
+
+def classify_file(src: str):
+    """
+    Kind of a regular file, one of IMAGE, VIDEO, PCD, CSV or None.
+
+    The extension decides when it is known, otherwise images are detected
+    by their magic bytes.
+    """
+    kind = EXTENSION_KINDS.get(os.path.splitext(src)[1].lower())
+    if kind is not None:
+        return kind
+    if os.path.splitext(src)[1].lower() in IGNORED_EXTENSIONS:
+        return None
+    return IMAGE if sniff_image(src) else None
+
+
 def is_file(src: str) -> bool:
     """
     Check if the given path is a file.
@@ -41,6 +129,9 @@ def is_url(src: str) -> bool:
     """
     Check if the source string is a valid URL.
     """
+    # Cheap reject of plain paths before parsing
+    if '://' not in src:
+        return False
     try:
         result = urlparse(src)
         return all([result.scheme, result.netloc])
@@ -52,57 +143,42 @@ def is_stream(src: str) -> bool:
     """
     Check if the given path represents video stream.
     """
-    pattern = re.compile(
-        r'^(rtsp://|rtmp://)[^\s/$.?#].[^\s]*$', re.IGNORECASE)
-    match = re.match(pattern, src)
-
-    return bool(match)
+    return bool(STREAM_PATTERN.match(src))
 
 
 def is_screenshot(src: str) -> bool:
     """
     Check if the given path is a screenshot.
     """
-    pattern = r"^screen:\d+$"
-    match = re.match(pattern, src)
-
-    return bool(match)
+    return bool(SCREENSHOT_PATTERN.match(src))
 
 
 def is_glob_pattern(src: str) -> bool:
     """
     Check if the given path contains glob-style wildcards.
     """
-    pattern = r'^glob\(([^)]+)\)$'
-    match = re.match(pattern, src)
-
-    return bool(match)
+    return bool(GLOB_PATTERN.match(src))
 
 
 def is_video(src: str) -> bool:
     """
     Check if the given path is a video file.
     """
-    video_mime_types = {
-        "video/x-msvideo",  # for avi files
-        "video/mp4",        # for mp4 files
-        "video/x-matroska",  # for mkv files
-        "video/quicktime",  # for mov files
-        "video/webm",       # for webm files
-        "video/x-flv",      # for flv files
-        "video/mpeg",       # for mpeg files
-    }
-
-    file_path = Path(src)
-    mime_type, _ = mimetypes.guess_type(file_path)
-    return mime_type in video_mime_types
+    kind = EXTENSION_KINDS.get(Path(src).suffix.lower())
+    if kind is not None:
+        return kind == VIDEO
+    mime_type, _ = mimetypes.guess_type(src)
+    return mime_type in VIDEO_MIME_TYPES
 
 
 def is_image(src: str) -> bool:
     """
     Check if the given path is an image file.
     """
-    return imghdr.what(src) is not None
+    kind = EXTENSION_KINDS.get(Path(src).suffix.lower())
+    if kind is not None:
+        return kind == IMAGE
+    return sniff_image(src)
 
 
 def is_pcd(src: str) -> bool:
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class FrameWriter:
+    """Save RGB frames as "<index>.jpg" on a background thread
+
+    The names follow the frame directory layout read by SAM2, so a saved
+    slice can be labeled again without the video. At most `max_pending`
+    frames wait to be written, after that `write` blocks.
+    """
+
+    def __init__(self, output_dir, max_pending: int = 32) -> None:
+        self._output_dir = Path(output_dir)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="autolabel-frame-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, index: int, frame: np.ndarray):
+        self._queue.put((index, frame))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            index, frame = job
+            file_path = self._output_dir / "{:05d}.jpg".format(index)
+            try:
+                cv2.imwrite(str(file_path), cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            except Exception as e:
+                logging.error("Save frame {} failed! {}".format(file_path, e))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
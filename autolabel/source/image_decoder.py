@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# Keep the stored pixel order like PIL, the masks are in that frame
+CV2_FLAGS = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+JPEG_SCALE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_COLOR_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION,
+}
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+
+def _add_time(timings, stage, start_time):
+    if timings is not None:
+        now = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + now - start_time
+        return now
+    return start_time
+
+
+def pil_to_rgb(image: Image.Image) -> np.ndarray:
+    """RGB array of a PIL image, converted only if it isn't RGB
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.array(image)
+
+
+def _decode(buf, flags, file_path, timings):
+    start_time = time.perf_counter() if timings is not None else 0.0
+    image = cv2.imdecode(buf, flags) if buf.size else None
+    start_time = _add_time(timings, "decode", start_time)
+    if image is None:
+        with Image.open(file_path) as pil_image:
+            image = pil_to_rgb(pil_image)
+        _add_time(timings, "decode", start_time)
+        return image
+    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    _add_time(timings, "convert", start_time)
+    return image
+
+
+def _read(file_path, timings):
+    start_time = time.perf_counter() if timings is not None else 0.0
+    buf = np.fromfile(file_path, dtype=np.uint8)
+    _add_time(timings, "read", start_time)
+    return buf
+
+
+def decode_image(file_path, timings=None) -> np.ndarray:
+    """Decode an image file to a contiguous RGB uint8 array
+
+    The file is read into one buffer, decoded by `cv2.imdecode` and its
+    channels swapped in place, so the pixels are copied once. Formats cv2
+    can't decode fall back to PIL.
+
+    Args:
+        file_path (str): image file
+        timings (dict): if given, the seconds of the "read", "decode" and
+            "convert" stages are added to it
+
+    Returns:
+        np.ndarray: (H, W, 3) RGB image
+    """
+    return _decode(_read(file_path, timings), CV2_FLAGS, file_path, timings)
+
+
+def jpeg_scale(height: int, width: int, min_size: int) -> int:
+    """Largest JPEG scale down factor keeping both sides >= `min_size`
+    """
+    for scale in sorted(JPEG_SCALE_FLAGS, reverse=True):
+        if height // scale >= min_size and width // scale >= min_size:
+            return scale
+    return 1
+
+
+def decode_image_reduced(file_path, min_size: int, timings=None):
+    """Decode an image at a reduced resolution, no side below `min_size`
+
+    JPEGs are scaled by 1/2, 1/4 or 1/8 within the DCT while they are
+    decoded, which costs a fraction of the full decode. Other formats are
+    decoded at full resolution.
+
+    Returns:
+        tuple: (H, W, 3) RGB image and the (height, width) of the original
+    """
+    buf = _read(file_path, timings)
+    flags = CV2_FLAGS
+    orig_hw = None
+    if buf[:3].tobytes() == JPEG_MAGIC:
+        try:
+            # Only the header is parsed
+            with Image.open(io.BytesIO(buf)) as pil_image:
+                width, height = pil_image.size
+        except OSError:
+            pass
+        else:
+            orig_hw = (height, width)
+            scale = jpeg_scale(height, width, min_size)
+            flags = JPEG_SCALE_FLAGS.get(scale, flags)
+    image = _decode(buf, flags, file_path, timings)
+    return image, orig_hw or image.shape[:2]
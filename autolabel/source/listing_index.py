@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autolabel.source.filetype_checker import classify_file
+from autolabel.source.walker import compile_patterns
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    rel TEXT PRIMARY KEY, parent TEXT, name TEXT, mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    rel TEXT PRIMARY KEY, dir TEXT, name TEXT, depth INTEGER,
+    sort_key TEXT, kind TEXT);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_sort_key ON files (sort_key);
+"""
+
+# Path separator in the sort keys, below every character of a name so
+# the keys sort like the walk, the files of "a/" before "a.jpg"
+SORT_SEP = '\x01'
+
+# A directory changed within this many ns of its listing may change again
+# without a new mtime, its mtime is not stored so it is listed next time
+RECENT_NS = 2 * 10**9
+
+
+def _join(rel_dir, name):
+    return "{}/{}".format(rel_dir, name) if rel_dir else name
+
+
+def _glob(pattern):
+    # fnmatch negates a character class with "!", sqlite GLOB with "^"
+    return pattern.replace('[!', '[^')
+
+
+class ListingIndex:
+    """On disk index of the input files below `root` and their kinds
+
+    The index is a sqlite database at `db_path`. `refresh` stats every
+    directory, but only lists and classifies the files of the directories
+    whose mtime changed since the last refresh, the directories are visited
+    by `workers` threads. `files` then answers from the index, in the order
+    and with the filters of `DirWalker`. Like the walker it follows
+    symlinked directories, except those linking back to their ancestors.
+    """
+
+    def __init__(self, db_path, root, workers: int = 8) -> None:
+        if workers <= 0:
+            raise ValueError("Workers must be positive")
+        self.root = str(root)
+        self._workers = workers
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.executescript(SCHEMA)
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'root'").fetchone()
+        abs_root = os.path.abspath(self.root)
+        if row is None or row[0] != abs_root:
+            with self._conn:
+                self._conn.execute("DELETE FROM dirs")
+                self._conn.execute("DELETE FROM files")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('root', ?)", (abs_root,))
+
+    def _scan(self, rel_dir, mtime_ns):
+        """Stat a directory and list it if its mtime changed
+
+        Returns:
+            tuple: the mtime (None if the directory is gone), the sub
+                directories and (name, kind) of the input files, None if
+                the directory is unchanged, and its (st_dev, st_ino)
+        """
+        path = os.path.join(self.root, rel_dir)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None, None
+        key = (st.st_dev, st.st_ino)
+        if st.st_mtime_ns == mtime_ns:
+            return mtime_ns, None, key
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                    elif entry.is_file():
+                        kind = classify_file(entry.path)
+                        if kind is not None:
+                            files.append((entry.name, kind))
+        except OSError as e:
+            logging.warning("List {} failed! {}".format(path, e))
+            return None, None, None
+        if time.time_ns() - st.st_mtime_ns < RECENT_NS:
+            return -1, (dirs, files), key
+        return st.st_mtime_ns, (dirs, files), key
+
+    def _delete_tree(self, rel_dir):
+        if not rel_dir:
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.execute("DELETE FROM files")
+            return
+        # Everything below "a" lies in the key range ["a/", "a0")
+        low, high = rel_dir + '/', rel_dir + '0'
+        self._conn.execute("DELETE FROM dirs WHERE rel = ? OR (rel >= ? AND rel < ?)",
+                           (rel_dir, low, high))
+        self._conn.execute("DELETE FROM files WHERE rel >= ? AND rel < ?",
+                           (low, high))
+
+    def _update(self, rel_dir, mtime_ns, dirs, files, old_dirs):
+        parent, _, name = rel_dir.rpartition('/')
+        self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                           (rel_dir, parent if rel_dir else None, name, mtime_ns))
+        for removed in old_dirs - set(dirs):
+            self._delete_tree(_join(rel_dir, removed))
+        self._conn.execute("DELETE FROM files WHERE dir = ?", (rel_dir,))
+        depth = rel_dir.count('/') + 1 if rel_dir else 0
+        prefix = rel_dir.replace('/', SORT_SEP) + SORT_SEP if rel_dir else ''
+        self._conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            [(_join(rel_dir, name), rel_dir, name, depth, prefix + name, kind)
+             for name, kind in files])
+
+    def refresh(self):
+        """Bring the index up to date with the directory tree
+
+        Returns:
+            tuple: the number of directories listed and of those unchanged
+        """
+        mtimes = dict(self._conn.execute("SELECT rel, mtime_ns FROM dirs"))
+        children = {}
+        for rel_dir, parent in self._conn.execute("SELECT rel, parent FROM dirs"):
+            if parent is not None:
+                children.setdefault(parent, set()).add(rel_dir.rpartition('/')[2])
+
+        listed = unchanged = 0
+        # Each directory with the (st_dev, st_ino) of its ancestors
+        frontier = [('', frozenset())]
+        with ThreadPoolExecutor(max_workers=self._workers,
+                                thread_name_prefix="autolabel-index") as executor, \
+                self._conn:
+            while frontier:
+                results = executor.map(
+                    lambda item: self._scan(item[0], mtimes.get(item[0])),
+                    frontier)
+                next_frontier = []
+                for (rel_dir, ancestors), (mtime_ns, listing, key) in zip(frontier, results):
+                    old_dirs = children.get(rel_dir, set())
+                    if mtime_ns is None:
+                        self._delete_tree(rel_dir)
+                        continue
+                    if key in ancestors:
+                        logging.warning("Skip {}, it links to its ancestor".format(
+                            os.path.join(self.root, rel_dir)))
+                        self._delete_tree(rel_dir)
+                        continue
+                    if listing is None:
+                        unchanged += 1
+                        dirs = old_dirs
+                    else:
+                        listed += 1
+                        dirs, files = listing
+                        self._update(rel_dir, mtime_ns, dirs, files, old_dirs)
+                    ancestors = ancestors | {key}
+                    next_frontier.extend((_join(rel_dir, name), ancestors)
+                                         for name in sorted(dirs))
+                frontier = next_frontier
+        return listed, unchanged
+
+    def files(self, include=None, exclude=None, max_depth=None):
+        """The indexed files, sorted like the walk of `DirWalker`
+
+        Patterns are matched against the path relative to `root` or the
+        name, as by `DirWalker`, an excluded directory excludes the files
+        below it.
+
+        Yields:
+            tuple: path below `root` and kind of each file
+        """
+        query = ["SELECT rel, kind FROM files WHERE 1"]
+        args = []
+        if max_depth is not None:
+            query.append("AND depth <= ?")
+            args.append(max_depth)
+        if include:
+            include = [include] if isinstance(include, str) else include
+            query.append("AND ({})".format(" OR ".join(
+                "rel GLOB ? OR name GLOB ?" for _ in include)))
+            for pattern in include:
+                args += [_glob(pattern), _glob(pattern)]
+        if exclude:
+            exclude = [exclude] if isinstance(exclude, str) else exclude
+            query.append("AND NOT ({})".format(" OR ".join(
+                "rel GLOB ? OR name GLOB ?" for _ in exclude)))
+            for pattern in exclude:
+                args += [_glob(pattern), _glob(pattern)]
+            excluded = self._excluded_dirs(compile_patterns(exclude))
+            if excluded:
+                self._conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS excluded (rel TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM excluded")
+                self._conn.executemany("INSERT INTO excluded VALUES (?)",
+                                       [(rel_dir,) for rel_dir in excluded])
+                query.append("AND dir NOT IN (SELECT rel FROM excluded)")
+        query.append("ORDER BY sort_key")
+        for rel, kind in self._conn.execute(" ".join(query), args):
+            yield os.path.join(self.root, rel), kind
+
+    def _excluded_dirs(self, pattern):
+        """Directories that match `pattern` or lie below one that does
+        """
+        excluded = set()
+        # Parents sort before their sub directories
+        for rel_dir, name in self._conn.execute(
+                "SELECT rel, name FROM dirs WHERE rel != '' ORDER BY rel"):
+            parent = rel_dir.rpartition('/')[0]
+            if parent in excluded or pattern.match(rel_dir) or pattern.match(name):
+                excluded.add(rel_dir)
+        return excluded
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -15,27 +15,16 @@
 # limitations under the License.
 
 import logging
-import os
-import requests
-import sys
 
-from pathlib import Path
+from autolabel.source.downloader import default_manager
 
 
-# Download tmp path
-DOWNLOAD_TMP_DIR = "/tmp/"
+# Unzip tmp path
 UNZIP_TMP_DIR = "/tmp/autolabel/"
 
 
-def _progress(prefix, cur, total):
-    bar_size = 50
-    cur_p = int(cur / total * bar_size)
-    print("{}[{}{}] {}/{}".format(prefix, "#"*cur_p, "."*(bar_size - cur_p),
-                                  cur, total), end='\r', file=sys.stdout, flush=True)
-
-
 def download_from_url(url: str) -> str:
-    """Download file from url
+    """Download file from url, the file is cached by the hash of the url
 
     Args:
         url (str): url to download
@@ -43,25 +32,7 @@ def download_from_url(url: str) -> str:
     Returns:
         file: download file's path
     """
-    local_filename = url.split('/')[-1]
-    download_file = os.path.join(DOWNLOAD_TMP_DIR, local_filename)
-
-    # File is cached
-    if Path(download_file).is_file():
-        logging.warning(
-            "File downloaded before! use cached file in {}".format(download_file))
-        return download_file
-
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        chunk_size = 8192
-        total_length = int(r.headers.get('content-length', 0)) // chunk_size
-        with open(download_file, 'wb') as f:
-            for index, chunk in enumerate(r.iter_content(chunk_size)):
-                f.write(chunk)
-                _progress("Downloading:", index, total_length)
-        print()
-    return download_file
+    return str(default_manager().fetch(url, progress=True))
 
 
 def url_process(src):
@@ -17,12 +17,15 @@
 import abc
 import csv
 import glob
-import re
+import logging
+import time
 from pathlib import Path
 
-from autolabel.source.source_input import SourceInput, SourceInputType
+from autolabel.source.filetype_checker import GLOB_PATTERN, is_url
+from autolabel.source.source_input import FILE_KIND_TYPES, SourceInput, SourceInputType
 from autolabel.source.file_source import ImageFileSource, PCDFileSource
 from autolabel.source.stream_source import ScreenshotSource, VideoSource, VideoStreamSource
+from autolabel.source.walker import DirWalker
 
 
 class IterSource(metaclass=abc.ABCMeta):
@@ -33,36 +36,110 @@ class IterSource(metaclass=abc.ABCMeta):
     def __iter__(self):
         pass
 
-    @abc.abstractmethod
-    def __next__(self):
-        pass
+
+def _create_or_skip(input_str, source_input=None):
+    try:
+        if source_input is not None:
+            return SourceFactory.from_input(source_input)
+        return SourceFactory.create(input_str)
+    except (NotImplementedError, ValueError) as e:
+        logging.warning("Skip {}: {}".format(input_str, e))
+        return None
 
 
 class DirSource(IterSource):
     """
-    use SourceFactory.create iter create each object in
-    path (can be a path, a file)
+    Create a source of each file below path, walking the sub directories
+    in sorted order. The options are those of `DirWalker`, include,
+    exclude, max_depth and workers. With `index` the listing is kept in a
+    `ListingIndex` at that path, only changed directories are listed again.
     """
 
-    def __init__(self, source_input):
+    def __init__(self, source_input, include=None, exclude=None,
+                 max_depth=None, workers: int = 8, index=None):
         super().__init__(source_input)
         self.path = Path(self.source_input.input)
+        self.include = include
+        self.exclude = exclude
+        self.max_depth = max_depth
+        self.workers = workers
+        self.index = index
+
+    def _iter_index(self):
+        from autolabel.source.listing_index import ListingIndex
+
+        with ListingIndex(self.index, self.path, self.workers) as index:
+            start = time.perf_counter()
+            listed, unchanged = index.refresh()
+            logging.info("Refresh index {}: {} directories listed, {} unchanged "
+                         "in {:.3f}s".format(self.index, listed, unchanged,
+                                             time.perf_counter() - start))
+            for file_path, kind in index.files(
+                    self.include, self.exclude, self.max_depth):
+                source = _create_or_skip(
+                    file_path, SourceInput(file_path, FILE_KIND_TYPES[kind]))
+                if source is not None:
+                    yield source
 
     def __iter__(self):
-        for p in self.path.iterdir():
-            yield SourceFactory.create(p)
+        if self.index:
+            yield from self._iter_index()
+            return
+        walker = DirWalker(self.path, self.include, self.exclude,
+                           self.max_depth, self.workers)
+        # Entries are classified from the listing, without a stat per entry
+        for entry in walker:
+            source_input = SourceInput.from_dir_entry(entry)
+            if source_input is None:
+                logging.warning("Skip {}: not supported".format(entry.path))
+                continue
+            source = _create_or_skip(entry.path, source_input)
+            if source is not None:
+                yield source
 
 
 class CSVSource(IterSource):
-    def __init__(self, source_input):
+    """
+    Create a source of each row of a csv file, the first column is a file
+    path or url. The rows are read as they are needed and `concurrency`
+    urls are downloaded at once, the sources are yielded in the `order` of
+    the rows ("input") or as they are ready ("completed"). The images are
+    decoded by their consumer, e.g. at the decode size of a `BatchRunner`.
+    """
+
+    ORDERS = ('input', 'completed')
+
+    def __init__(self, source_input, concurrency: int = 8, order: str = 'input'):
         super().__init__(source_input)
+        if order not in self.ORDERS:
+            raise ValueError("Order '{}' is not one of {}".format(order, self.ORDERS))
         self.file_path = Path(self.source_input.input)
+        self.concurrency = concurrency
+        self.order = order
 
-    def __iter__(self):
+    def _rows(self):
         with open(self.file_path, 'r') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                yield SourceFactory.create(row)
+            for row in csv.reader(csvfile):
+                if row:
+                    yield row[0]
+
+    def _fetch(self, input_str):
+        # Runs on the loader threads, without the progress bar of a single url
+        if is_url(input_str):
+            from autolabel.source.downloader import default_manager
+            input_str = str(default_manager(self.concurrency).fetch(input_str))
+        return _create_or_skip(input_str)
+
+    def __iter__(self):
+        from autolabel.source.async_loader import AsyncLoader
+
+        loader = AsyncLoader(self._fetch, self.concurrency,
+                             ordered=self.order == 'input')
+        for input_str, source, error in loader.map(self._rows()):
+            if error is not None:
+                logging.warning("Skip {}: {}".format(input_str, error))
+            elif source is not None:
+                yield source
 
 
 class GlobSource(IterSource):
@@ -71,8 +148,7 @@ class GlobSource(IterSource):
         self.pattern = self._extract_glob_pattern(self.source_input.input)
 
     def _extract_glob_pattern(self, glob_string):
-        pattern = r'^glob\(([^)]+)\)$'
-        match = re.search(pattern, glob_string)
+        match = GLOB_PATTERN.search(glob_string)
         if match:
             return match.group(1)
         else:
@@ -80,23 +156,43 @@ class GlobSource(IterSource):
 
     def __iter__(self):
         for file in glob.glob(self.pattern):
-            yield SourceFactory.create(file)
+            source = _create_or_skip(file)
+            if source is not None:
+                yield source
 
 
 class SourceFactory:
+    # Types of the sources that take options
+    OPTION_TYPES = (SourceInputType.DIRECTORY, SourceInputType.CSV_FILE)
+
+    @staticmethod
+    def create(input_str):
+        """Create a source from an input string, or from a dict of the
+        input `path` and the options of the source, e.g. the include
+        patterns of a directory
+        """
+        if isinstance(input_str, dict):
+            options = dict(input_str)
+            return SourceFactory.from_input(
+                SourceInput(options.pop('path')), options)
+        return SourceFactory.from_input(SourceInput(input_str))
+
     @staticmethod
-    def create(input_str: str):
-        source_input = SourceInput(input_str)
+    def from_input(source_input: SourceInput, options=None):
         source_type = source_input.type
+        options = options or {}
+        if options and source_type not in SourceFactory.OPTION_TYPES:
+            logging.warning("Ignore options {} of {}".format(
+                list(options), source_input.input))
 
         if source_type == SourceInputType.IMAGE_FILE:
             return ImageFileSource(source_input)
         elif source_type == SourceInputType.POINT_CLOUD_FILE:
             return PCDFileSource(source_input)
         elif source_type == SourceInputType.DIRECTORY:
-            return DirSource(source_input)
+            return DirSource(source_input, **options)
         elif source_type == SourceInputType.CSV_FILE:
-            return CSVSource(source_input)
+            return CSVSource(source_input, **options)
         elif source_type == SourceInputType.GLOB_PATTERN:
             return GlobSource(source_input)
         elif source_type == SourceInputType.SCREENSHOT:
@@ -14,23 +14,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import stat
 from enum import Enum
 
 from autolabel.source.filetype_checker import (
+    IMAGE,
+    VIDEO,
+    PCD,
+    CSV,
+    classify_file,
     is_url,
-    is_file,
-    is_image,
-    is_video,
-    is_pcd,
-    is_csv,
-    is_path,
     is_stream,
     is_screenshot,
     is_glob_pattern
 )
 
-from autolabel.source.process import url_process
-
 
 class SourceInputType(Enum):
     IMAGE_FILE = 1
@@ -43,33 +42,68 @@ class SourceInputType(Enum):
     GLOB_PATTERN = 8
 
 
+FILE_KIND_TYPES = {
+    IMAGE: SourceInputType.IMAGE_FILE,
+    VIDEO: SourceInputType.VIDEO_FILE,
+    PCD: SourceInputType.POINT_CLOUD_FILE,
+    CSV: SourceInputType.CSV_FILE,
+}
+
+
 class SourceInput:
-    def __init__(self, input_str: str) -> None:
+    def __init__(self, input_str: str, input_type: SourceInputType = None) -> None:
         self.raw_input = input_str
 
+        if input_type is not None:
+            # Already classified, e.g. from a directory entry
+            self._input = input_str
+            self._input_type = input_type
+            return
+
         self._input = self._process_input(input_str)
         # Get source input type
         self._input_type = self._get_source_type()
 
+    @staticmethod
+    def from_dir_entry(entry: os.DirEntry) -> 'SourceInput':
+        """Classify a directory entry without another stat
+
+        The file type of an entry comes with the directory listing on most
+        platforms, so only files with an unknown extension are opened.
+
+        Returns:
+            SourceInput: None if the entry is not a supported input
+        """
+        if entry.is_dir():
+            input_type = SourceInputType.DIRECTORY
+        elif entry.is_file():
+            input_type = FILE_KIND_TYPES.get(classify_file(entry.path))
+        else:
+            input_type = None
+        if input_type is None:
+            return None
+        return SourceInput(entry.path, input_type)
+
     def _process_input(self, input_str):
         # If "raw_input" is a url, we first download it to the tmp directory
         # and then process it as a file
         if is_url(input_str):
+            # The http stack is only imported for urls
+            from autolabel.source.process import url_process
             return url_process(input_str)
         else:
             return input_str
 
     def _get_source_type(self) -> None:
-        if is_file(self._input):
-            if is_image(self._input):
-                return SourceInputType.IMAGE_FILE
-            elif is_video(self._input):
-                return SourceInputType.VIDEO_FILE
-            elif is_pcd(self._input):
-                return SourceInputType.POINT_CLOUD_FILE
-            elif is_csv(self._input):
-                return SourceInputType.CSV_FILE
-        elif is_path(self._input):
+        # One stat tells a file from a directory from a non path input
+        try:
+            st = os.stat(self._input)
+        except (OSError, TypeError, ValueError):
+            st = None
+
+        if st is not None and stat.S_ISREG(st.st_mode):
+            return FILE_KIND_TYPES.get(classify_file(self._input))
+        elif st is not None:
             return SourceInputType.DIRECTORY
         elif is_stream(self._input):
             return SourceInputType.VIDEO_STREAM
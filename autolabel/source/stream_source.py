@@ -18,9 +18,12 @@
 import abc
 import time
 import cv2
+import numpy as np
 from PIL import Image
 from typing import Iterator, List
 
+from autolabel.source.frame_writer import FrameWriter
+
 
 class StreamSource(metaclass=abc.ABCMeta):
     def __init__(self, source_input: str, interval: int = 1):
@@ -75,47 +78,156 @@ class ScreenshotSource(StreamSource):
             time.sleep(self.interval)
 
 
+class FrameStepper:
+    """Skip frames of a cv2.VideoCapture
+
+    "grab" decodes the skipped frames without converting them, "seek" sets
+    CAP_PROP_POS_FRAMES, which jumps to the previous keyframe and decodes
+    forward from there. Seeking only pays off for jumps larger than the
+    keyframe distance, so "auto" grabs small jumps and measures the average
+    cost of a grab and of a seek to pick the cheaper one for each jump.
+    """
+
+    STRATEGIES = ('auto', 'grab', 'seek')
+
+    def __init__(self, cap, strategy: str = 'auto', seek_threshold: int = 50,
+                 probe_threshold: int = 8):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Step strategy '{strategy}' is not supported.")
+        self._cap = cap
+        self._strategy = strategy
+        # Jumps up to this size are grabbed until a grab has been measured
+        self._seek_threshold = seek_threshold
+        # Smaller jumps are always grabbed, larger ones probe a seek once
+        self._probe_threshold = probe_threshold
+        self._grab_cost = None
+        self._seek_cost = None
+
+    def skip(self, position: int, count: int) -> int:
+        """Skip `count` frames from `position`, return the new position
+        """
+        if count <= 0:
+            return position
+        if self._use_seek(count):
+            return self._seek(position + count)
+        return self._grab(position, count)
+
+    def _use_seek(self, count):
+        if self._strategy != 'auto':
+            return self._strategy == 'seek'
+        if count < self._probe_threshold:
+            return False
+        if self._grab_cost is None:
+            return count > self._seek_threshold
+        if self._seek_cost is None:
+            return True
+        return count * self._grab_cost > self._seek_cost
+
+    def _grab(self, position, count):
+        start_time = time.perf_counter()
+        grabbed = 0
+        while grabbed < count and self._cap.grab():
+            grabbed += 1
+        if grabbed:
+            self._grab_cost = self._average(
+                self._grab_cost, (time.perf_counter() - start_time) / grabbed)
+        return position + grabbed
+
+    def _seek(self, position):
+        start_time = time.perf_counter()
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        self._seek_cost = self._average(
+            self._seek_cost, time.perf_counter() - start_time)
+        return position
+
+    @staticmethod
+    def _average(average, value, alpha=0.2):
+        return value if average is None else (1 - alpha) * average + alpha * value
+
+
 class VideoSource(StreamSource):
-    def __init__(self, source_input: str, interval: int = 1):
+    """Frames of a video file, every `interval`-th frame is read
+    """
+
+    STEP_STRATEGIES = FrameStepper.STRATEGIES
+
+    def __init__(self, source_input: str, interval: int = 1, step: str = 'auto'):
         super().__init__(source_input, interval)
         video_path = self.source_input.input
         self.cap = cv2.VideoCapture(video_path)
         if not self.cap.isOpened():
             raise ValueError(
                 f"Could not open video source: {video_path}")
+        self._fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self._stepper = FrameStepper(self.cap, step)
+        # Index of the next frame to read, the position reported by cv2
+        # is unreliable after grab() on some backends
+        self._position = 0
 
-    def capture(self) -> Image.Image:
+    @property
+    def position(self) -> int:
+        return self._position
+
+    def read(self) -> np.ndarray:
+        """Read the next frame as a RGB array and skip to the one after it
+        """
         ret, frame = self.cap.read()
         if not ret:
             raise ValueError("End of video stream")
-        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        self._position = self._stepper.skip(self._position + 1, self.interval - 1)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-    def slice(self, duration: float, save_img: bool) -> List[Image.Image]:
-        images = []
-        start_time = self.cap.get(cv2.CAP_PROP_POS_MSEC)
-        # Convert duration to milliseconds
-        end_time = start_time + (duration * 1000)
+    def capture(self) -> Image.Image:
+        return Image.fromarray(self.read())
 
-        while self.cap.get(cv2.CAP_PROP_POS_MSEC) < end_time:
-            try:
-                img = self.capture()
-                images.append(img)
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES,
-                             self.cap.get(cv2.CAP_PROP_POS_FRAMES) + self.interval)
-                # todo(zero): save img to which path? use a config?
-                if save_img:
-                    cur_time = int(self.cap.get(cv2.CAP_PROP_POS_MSEC))
-                    img.save(f'/tmp/autolabel/{cur_time}.jpg')
-            except StopIteration:
-                break
+    def _position_msec(self):
+        if self._fps > 0:
+            return self._position * 1000.0 / self._fps
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC)
 
-        return images
+    def slice(self, duration: float, save_dir: str = None) -> List[np.ndarray]:
+        """Read the frames of the next `duration` seconds as RGB arrays
 
-    def __iter__(self):
+        Args:
+            duration (float): seconds of video to read
+            save_dir (str, optional): also save the frames as "<index>.jpg"
+                in this directory, written on a background thread
+
+        Returns:
+            List[np.ndarray]: frames in order
+        """
+        frames = []
+        # Convert duration to milliseconds
+        end_time = self._position_msec() + (duration * 1000)
+
+        writer = FrameWriter(save_dir) if save_dir else None
+        try:
+            while self._position_msec() < end_time:
+                try:
+                    frame = self.read()
+                except ValueError:
+                    break
+                if writer:
+                    writer.write(len(frames), frame)
+                frames.append(frame)
+        finally:
+            if writer:
+                writer.close()
+
+        return frames
+
+    def frames(self) -> Iterator[np.ndarray]:
+        """RGB frames until the end of the video
+        """
         while True:
-            yield self.capture()
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES,
-                         self.cap.get(cv2.CAP_PROP_POS_FRAMES) + self.interval)
+            try:
+                yield self.read()
+            except ValueError:
+                return
+
+    def __iter__(self):
+        for frame in self.frames():
+            yield Image.fromarray(frame)
 
     def __del__(self):
         if hasattr(self, 'cap') and self.cap.isOpened():
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fnmatch
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def compile_patterns(patterns):
+    """One regex matching any of the glob-style patterns, None if empty
+    """
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile('|'.join(
+        '(?:{})'.format(fnmatch.translate(p)) for p in patterns))
+
+
+def _dir_key(entry):
+    """(st_dev, st_ino) of a directory or DirEntry, symlinks followed
+    """
+    try:
+        st = entry.stat() if isinstance(entry, os.DirEntry) else os.stat(entry)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class DirWalker:
+    """Recursive listing of the files below `root`
+
+    Directories are listed concurrently by `workers` threads ahead of the
+    walk, at most `max_pending` listings are kept ahead. Files are yielded
+    as soon as their directory is walked, in a deterministic order: the
+    entries of a directory sorted by name, a sub directory's files at its
+    position.
+
+    Patterns are glob-style and match the path relative to `root` or the
+    name of an entry. A file is yielded if it matches an `include` pattern
+    (all files without `include`) and no `exclude` pattern, an excluded
+    directory is not walked. `max_depth` is the number of directory levels
+    walked below `root`, 0 lists only the files in `root`.
+
+    Symlinked directories are followed, a link back to a directory being
+    walked is skipped with a warning instead of looping.
+
+    Yields:
+        os.DirEntry: the files, their type comes with the listing so
+            classifying them needs no further stat
+    """
+
+    def __init__(self, root, include=None, exclude=None, max_depth=None,
+                 workers: int = 8, max_pending: int = 256) -> None:
+        if workers <= 0:
+            raise ValueError("Workers must be positive")
+        if max_depth is not None and max_depth < 0:
+            raise ValueError("Max depth must not be negative")
+        self.root = str(root)
+        self._include = compile_patterns(include)
+        self._exclude = compile_patterns(exclude)
+        self._max_depth = max_depth
+        self._workers = workers
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._futures = {}
+
+    def _matches(self, pattern, rel_path, name):
+        return bool(pattern.match(rel_path) or pattern.match(name))
+
+    def _walk_dir(self, rel_path, name, depth):
+        """Whether a directory at `depth` below the root is walked
+        """
+        if self._max_depth is not None and depth > self._max_depth:
+            return False
+        return self._exclude is None or \
+            not self._matches(self._exclude, rel_path, name)
+
+    def _yield_file(self, rel_path, name):
+        if self._exclude is not None and self._matches(self._exclude, rel_path, name):
+            return False
+        return self._include is None or self._matches(self._include, rel_path, name)
+
+    def _list(self, path, rel_dir, depth):
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logging.warning("List {} failed! {}".format(path, e))
+            return []
+        # List the sub directories ahead of the walk, symlinked ones only
+        # when reached, a link may loop
+        with self._lock:
+            for entry in entries:
+                if len(self._futures) >= self._max_pending:
+                    break
+                if entry.is_dir(follow_symlinks=False):
+                    rel_path = rel_dir + entry.name
+                    if self._walk_dir(rel_path, entry.name, depth + 1) \
+                            and entry.path not in self._futures:
+                        self._futures[entry.path] = self._executor.submit(
+                            self._list, entry.path, rel_path + '/', depth + 1)
+        return entries
+
+    def _take(self, path, rel_dir, depth):
+        with self._lock:
+            future = self._futures.pop(path, None)
+        if future is None:
+            # Not listed ahead, a symlink or the limit of pending listings
+            # was reached
+            return self._list(path, rel_dir, depth)
+        return future.result()
+
+    def __iter__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix="autolabel-walker")
+        self._futures = {}
+        try:
+            stack = [(iter(self._take(self.root, '', 0)), '', 0, _dir_key(self.root))]
+            while stack:
+                entries, rel_dir, depth, _ = stack[-1]
+                entry = next(entries, None)
+                if entry is None:
+                    stack.pop()
+                    continue
+                rel_path = rel_dir + entry.name
+                if entry.is_dir():
+                    if not self._walk_dir(rel_path, entry.name, depth + 1):
+                        continue
+                    key = _dir_key(entry)
+                    if key in (walked[3] for walked in stack):
+                        logging.warning("Skip {}, it links to a directory being walked".format(
+                            entry.path))
+                        continue
+                    stack.append((
+                        iter(self._take(entry.path, rel_path + '/', depth + 1)),
+                        rel_path + '/', depth + 1, key))
+                elif entry.is_file() and self._yield_file(rel_path, entry.name):
+                    yield entry
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._futures = {}
@@ -15,18 +15,82 @@
 # limitations under the License.
 
 
+import shutil
+
+from autolabel.source.filetype_checker import IMAGE, VIDEO, classify_file
+from autolabel.source.file_source import ImageFileSource
 from autolabel.source.source_factory import SourceFactory
 from autolabel.source.source_input import SourceInput, SourceInputType
 
 
-def test_url():
-    url = "https://via.placeholder.com/300/09f/fff.png"
+def test_url(http_root, download_manager):
+    root, base_url = http_root
+    shutil.copy('autolabel/images/truck.jpg', root / 'fff.png')
+    url = base_url + "/fff.png"
     src = SourceInput(url)
-    assert src.input == "/tmp/fff.png"
+    assert src.input == str(download_manager.cache.path(url))
     assert src.type == SourceInputType.IMAGE_FILE
 
 
-def test_image_file_source():
-    url = "https://via.placeholder.com/300/09f/fff.png"
-    source = SourceFactory.create(url)
+def test_image_file_source(http_root, download_manager):
+    root, base_url = http_root
+    shutil.copy('autolabel/images/truck.jpg', root / 'truck.jpg')
+    source = SourceFactory.create(base_url + "/truck.jpg")
     assert source.data is not None
+
+
+def test_classify_file(tmp_path):
+    # Known extensions are never opened
+    assert classify_file(str(tmp_path / 'missing.JPG')) == IMAGE
+    assert classify_file(str(tmp_path / 'missing.mp4')) == VIDEO
+    # Unknown extensions are sniffed
+    shutil.copy('autolabel/images/truck.jpg', tmp_path / 'truck')
+    assert classify_file(str(tmp_path / 'truck')) == IMAGE
+    (tmp_path / 'notes').write_text('not an image')
+    assert classify_file(str(tmp_path / 'notes')) is None
+    assert SourceInput(str(tmp_path / 'truck')).type == SourceInputType.IMAGE_FILE
+    assert SourceInput(str(tmp_path)).type == SourceInputType.DIRECTORY
+
+
+def test_dir_source(tmp_path):
+    shutil.copy('autolabel/images/truck.jpg', tmp_path / 'truck.jpg')
+    shutil.copy('autolabel/images/cars.jpg', tmp_path / 'cars')
+    (tmp_path / 'labels.txt').write_text('')
+    (tmp_path / 'sub').mkdir()
+    shutil.copy('autolabel/images/truck.jpg', tmp_path / 'sub' / 'a.jpg')
+    sources = list(SourceFactory.create(str(tmp_path)))
+    assert all(isinstance(s, ImageFileSource) for s in sources)
+    assert [s.source_input.input for s in sources] == [
+        str(tmp_path / 'cars'), str(tmp_path / 'sub' / 'a.jpg'),
+        str(tmp_path / 'truck.jpg')]
+
+    sources = list(SourceFactory.create(
+        {'path': str(tmp_path), 'exclude': ['sub'], 'workers': 1}))
+    assert len(sources) == 2
+
+
+def test_csv_source(tmp_path, http_root, download_manager):
+    root, base_url = http_root
+    rows = []
+    for i in range(6):
+        shutil.copy('autolabel/images/truck.jpg', root / '{}.jpg'.format(i))
+        rows.append('{}/{}.jpg'.format(base_url, i))
+    rows.insert(2, base_url + '/missing.jpg')
+    rows.append('autolabel/images/cars.jpg')
+    csv_path = tmp_path / 'inputs.csv'
+    csv_path.write_text('\n'.join(rows) + '\n')
+
+    sources = list(SourceFactory.create(
+        {'path': str(csv_path), 'concurrency': 12}))
+    # Only downloaded, the consumer decodes at its size
+    assert all(type(s) is ImageFileSource and s._data is None for s in sources)
+    assert download_manager.workers == 12
+    assert download_manager._session.get_adapter(base_url)._pool_maxsize == 12
+    assert [s.source_input.input for s in sources] == [
+        str(download_manager.cache.path(url)) for url in rows[:2] + rows[3:-1]] \
+        + ['autolabel/images/cars.jpg']
+    assert sources[0].decode().shape == (1200, 1800, 3)
+
+    sources = list(SourceFactory.create(
+        {'path': str(csv_path), 'order': 'completed'}))
+    assert len(sources) == 7
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import cv2
+import numpy as np
+
+from autolabel.source import stream_source
+from autolabel.source.stream_source import FrameStepper, VideoSource
+
+
+class FakeCapture:
+    """Video of `num_frames` frames filled with their index, counting the
+    calls; a grab takes `grab_time` seconds, a seek nothing
+    """
+
+    def __init__(self, num_frames, grab_time=0.0) -> None:
+        self._num_frames = num_frames
+        self._grab_time = grab_time
+        self.pos = 0
+        self.grabs = self.retrieves = self.sets = 0
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+    def get(self, prop):
+        return 30.0 if prop == cv2.CAP_PROP_FPS else 0.0
+
+    def grab(self):
+        if self.pos >= self._num_frames:
+            return False
+        time.sleep(self._grab_time)
+        self.pos += 1
+        self.grabs += 1
+        return True
+
+    def retrieve(self):
+        self.retrieves += 1
+        return True, np.full((2, 2, 3), self.pos - 1, dtype=np.uint8)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set(self, prop, value):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        self.sets += 1
+        self.pos = min(int(value), self._num_frames)
+        return True
+
+
+class FakeInput:
+    input = 'video.mp4'
+
+
+def _read_all(monkeypatch, cap, interval, step):
+    monkeypatch.setattr(stream_source.cv2, 'VideoCapture', lambda path: cap)
+    source = VideoSource(FakeInput(), interval, step)
+    return [int(frame[0, 0, 0]) for frame in source.frames()]
+
+
+def test_video_interval_grab(monkeypatch):
+    cap = FakeCapture(23)
+    assert _read_all(monkeypatch, cap, 5, 'grab') == [0, 5, 10, 15, 20]
+    # Skipped frames are grabbed, only the labeled ones converted
+    assert cap.retrieves == 5 and cap.sets == 0
+    assert cap.grabs == 23
+
+
+def test_video_interval_seek(monkeypatch):
+    cap = FakeCapture(23)
+    assert _read_all(monkeypatch, cap, 5, 'seek') == [0, 5, 10, 15, 20]
+    assert cap.retrieves == 5 and cap.grabs == 5 and cap.sets == 5
+
+
+def test_video_interval_auto_small_jumps_grab(monkeypatch):
+    cap = FakeCapture(20)
+    assert _read_all(monkeypatch, cap, 4, 'auto') == [0, 4, 8, 12, 16]
+    assert cap.sets == 0
+
+
+def test_stepper_auto_measures_costs():
+    cap = FakeCapture(1000, grab_time=0.001)
+    stepper = FrameStepper(cap, 'auto', seek_threshold=50, probe_threshold=8)
+    # Unmeasured, a jump up to the seek threshold is grabbed
+    assert stepper.skip(0, 20) == 20 and (cap.grabs, cap.sets) == (20, 0)
+    # Grabs measured, a seek is probed once
+    assert stepper.skip(20, 20) == 40 and (cap.grabs, cap.sets) == (20, 1)
+    # Then the cheaper one wins, seeks cost nothing here
+    assert stepper.skip(40, 20) == 60 and (cap.grabs, cap.sets) == (20, 2)
+    # Small jumps are always grabbed
+    assert stepper.skip(60, 3) == 63 and (cap.grabs, cap.sets) == (23, 2)
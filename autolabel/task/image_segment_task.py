@@ -15,21 +15,68 @@
 # limitations under the License.
 
 import logging
-import torch
+import cv2
 import numpy as np
 from sam2.sam2_image_predictor import SAM2ImagePredictor
 
+from autolabel.label.rle import RLEMask
+from autolabel.model.execution import ExecutionConfig
+from autolabel.model.image_input import set_image
+from autolabel.source.image_decoder import pil_to_rgb
 from autolabel.task.task import Task
-from autolabel.vis.vis import show_masks
+from autolabel.vis.vis import render_masks, render_object_masks
+from autolabel.vis.visualizer import WindowVisualizer
+
+
+def _to_bgr(image, masks):
+    # A reduced image is drawn at the size of its masks
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    if masks and tuple(masks[0].shape) != image.shape[:2]:
+        height, width = masks[0].shape
+        image = cv2.resize(image, (width, height))
+    return image
+
+
+def _render_masks(image, masks, *args, **kwargs):
+    return render_masks(_to_bgr(image, masks),
+                        [mask.decode() for mask in masks], *args, **kwargs)
+
+
+def _render_object_masks(image, masks):
+    return render_object_masks(_to_bgr(image, masks),
+                               [mask.decode() for mask in masks])
 
 
 class ImageSegmentTask(Task):
-    def __init__(self, model) -> None:
+    def __init__(self, model, embedding_cache=None, multi_object=False,
+                 visualizer=None) -> None:
         super().__init__()
         self._predictor = SAM2ImagePredictor(model)
+        self._execution = ExecutionConfig.of(model)
+        self._embedding_cache = embedding_cache
+        # Each prompt labels its own object instead of being combined
+        self._multi_object = multi_object
+        self._visualizer = visualizer or WindowVisualizer()
+        self._cache_key = None
+        self._orig_hw = None
+        self._name = None
 
-    def set_data(self, data):
-        self._data = np.array(data.convert("RGB"))
+    @property
+    def embedding_cache(self):
+        return self._embedding_cache
+
+    def set_data(self, data, cache_key=None, name=None, orig_hw=None):
+        # Decoded RGB arrays, e.g. from the prefetcher, are used as is
+        if isinstance(data, np.ndarray):
+            self._data = data
+        else:
+            self._data = pil_to_rgb(data)
+        # Size of the original of a reduced image, masks are of this size
+        self._orig_hw = orig_hw
+        # Key of the image in the embedding cache, None disables the cache
+        self._cache_key = cache_key
+        # Name of the image in the visualization output
+        self._name = name or 'image'
 
     def add_prompt(self, prompt):
         self._prompts.append(prompt)
@@ -60,14 +107,99 @@ class ImageSegmentTask(Task):
 
         return point_coords, point_labels, box, mask_input
 
+    def _batch_prompts(self, prompts):
+        """Stack prompts into batched arrays, shorter point lists are padded
+        with label -1, which SAM2 ignores
+        """
+        num_points = max(len(prompt.point_coords or []) for prompt in prompts)
+        point_coords, point_labels = None, None
+        if num_points > 0:
+            point_coords = np.zeros((len(prompts), num_points, 2), dtype=np.float32)
+            point_labels = np.full((len(prompts), num_points), -1, dtype=np.int32)
+            for i, prompt in enumerate(prompts):
+                if prompt.point_coords:
+                    n = len(prompt.point_coords)
+                    point_coords[i, :n] = prompt.point_coords
+                    point_labels[i, :n] = prompt.point_labels
+
+        box = None
+        if prompts[0].box:
+            box = np.array([prompt.box for prompt in prompts], dtype=np.float32)
+        return point_coords, point_labels, box
+
+    def _check_points(self):
+        for i, prompt in enumerate(self._prompts):
+            if not prompt.point_coords:
+                continue
+            num_labels = len(prompt.point_labels) if prompt.point_labels else 0
+            if num_labels != len(prompt.point_coords):
+                raise ValueError("Prompt {} has {} point coords but {} point labels".format(
+                    i, len(prompt.point_coords), num_labels))
+
+    def _predict_objects(self):
+        """Decode one mask per prompt against the current image embedding
+
+        Prompts with and without a box can't share a batch, so at most two
+        predict calls are made whatever the number of prompts.
+        """
+        self._check_points()
+        height, width = self._predictor._orig_hw[0]
+        masks = np.zeros((len(self._prompts), height, width), dtype=bool)
+        scores = np.zeros(len(self._prompts), dtype=np.float32)
+
+        groups = {True: [], False: []}
+        for i, prompt in enumerate(self._prompts):
+            if prompt.mask_input:
+                logging.warning("mask_input is ignored for multiple objects")
+            if prompt.box or prompt.point_coords:
+                groups[bool(prompt.box)].append(i)
+            else:
+                logging.warning("Prompt {} is empty, skip it".format(i))
+
+        for indices in groups.values():
+            if not indices:
+                continue
+            point_coords, point_labels, box = self._batch_prompts(
+                [self._prompts[i] for i in indices])
+            group_masks, group_scores, _ = self._predictor.predict(
+                point_coords=point_coords,
+                point_labels=point_labels,
+                box=box,
+                multimask_output=False)
+            masks[indices] = group_masks.reshape(
+                len(indices), height, width) > 0
+            scores[indices] = group_scores.reshape(len(indices))
+        return masks, scores
+
+    def _set_image(self):
+        if self._embedding_cache is not None:
+            self._embedding_cache.set_image(
+                self._predictor, self._data, self._cache_key, self._orig_hw)
+        else:
+            set_image(self._predictor, self._data, self._orig_hw)
+
     def process(self):
-        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
-            self._predictor.set_image(self._data)
+        """Label the image
+
+        Returns:
+            List[RLEMask]: the masks, one per object in multi object mode
+        """
+        if self._multi_object:
+            with self._execution.inference():
+                self._set_image()
+                masks, scores = self._predict_objects()
+            masks = [RLEMask.encode(mask) for mask in masks]
+            self._visualizer.submit(
+                self._name, _render_object_masks, self._data, masks)
+            return masks
+
+        with self._execution.inference():
+            self._set_image()
             point_coords, point_labels, box, mask_input = self._combine_prompts()
-            print(f'point_coords: {point_coords}')
-            print(f'point_labels: {point_labels}')
-            print(f'box: {box}')
-            print(f'mask_input: {mask_input}')
+            logging.debug(f'point_coords: {point_coords}')
+            logging.debug(f'point_labels: {point_labels}')
+            logging.debug(f'box: {box}')
+            logging.debug(f'mask_input: {mask_input}')
             masks, scores, logits = self._predictor.predict(
                 point_coords=point_coords,
                 point_labels=point_labels,
@@ -75,6 +207,9 @@ class ImageSegmentTask(Task):
                 mask_input=mask_input,
                 multimask_output=False)
 
-        show_masks(self._data, masks, scores, point_coords=point_coords,
-                   input_labels=point_labels, box_coords=box, borders=True)
+        masks = [RLEMask.encode(mask) for mask in masks]
+        self._visualizer.submit(
+            self._name, _render_masks, self._data, masks, scores,
+            point_coords=point_coords, input_labels=point_labels,
+            box_coords=box, borders=True)
         return masks
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+
+import cv2
+import numpy as np
+import torch
+import sam2.sam2_video_predictor as sam2_video_predictor
+
+
+# SAM2 defaults, see sam2.utils.misc.load_video_frames
+IMG_MEAN = (0.485, 0.456, 0.406)
+IMG_STD = (0.229, 0.224, 0.225)
+
+
+def frames_to_tensor(frames, image_size, offload_video_to_cpu=False,
+                     img_mean=IMG_MEAN, img_std=IMG_STD,
+                     compute_device=torch.device("cuda")):
+    """Convert RGB frames to the normalized input tensor of SAM2
+
+    Returns:
+        tuple: images (N, 3, image_size, image_size), video height and width
+    """
+    video_height, video_width = frames[0].shape[:2]
+    images = torch.zeros(len(frames), 3, image_size, image_size,
+                         dtype=torch.float32)
+    for i, frame in enumerate(frames):
+        resized = cv2.resize(frame, (image_size, image_size),
+                             interpolation=cv2.INTER_CUBIC)
+        images[i] = torch.from_numpy(
+            np.ascontiguousarray(resized.transpose(2, 0, 1))).float() / 255.0
+
+    img_mean = torch.tensor(img_mean, dtype=torch.float32)[:, None, None]
+    img_std = torch.tensor(img_std, dtype=torch.float32)[:, None, None]
+    if not offload_video_to_cpu:
+        images = images.to(compute_device)
+        img_mean = img_mean.to(compute_device)
+        img_std = img_std.to(compute_device)
+    images -= img_mean
+    images /= img_std
+    return images, video_height, video_width
+
+
+@contextlib.contextmanager
+def in_memory_frames(frames):
+    """Make `init_state` of the video predictor load `frames` from memory
+
+    SAM2 only reads videos from a path, so within the context its frame
+    loader is replaced by one converting the given arrays, the `video_path`
+    passed to `init_state` is ignored.
+    """
+    def load_video_frames(video_path, image_size, offload_video_to_cpu,
+                          img_mean=IMG_MEAN, img_std=IMG_STD,
+                          async_loading_frames=False,
+                          compute_device=torch.device("cuda"), **kwargs):
+        return frames_to_tensor(frames, image_size, offload_video_to_cpu,
+                                img_mean, img_std, compute_device)
+
+    original = sam2_video_predictor.load_video_frames
+    sam2_video_predictor.load_video_frames = load_video_frames
+    try:
+        yield
+    finally:
+        sam2_video_predictor.load_video_frames = original
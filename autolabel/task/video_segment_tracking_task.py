@@ -14,22 +14,60 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import torch
 import numpy as np
 
+from autolabel.label.rle import RLEMask
+from autolabel.model.execution import ExecutionConfig
 from autolabel.task.task import Task
-from autolabel.vis.vis import show_mask1
+from autolabel.task.video_frames import in_memory_frames
+from autolabel.vis.vis import render_mask1
+from autolabel.vis.visualizer import NullVisualizer, WindowVisualizer
 
+import itertools
 import os
 import cv2
 
 
+def _render_frame(frame, masks):
+    # Draw all objects of a frame on one image, the frame is either a RGB
+    # array or the path of a saved frame
+    if isinstance(frame, str):
+        image_bgr = cv2.imread(frame, cv2.IMREAD_UNCHANGED)
+    else:
+        image_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    for out_obj_id, out_mask in masks.items():
+        _, image_bgr = render_mask1(
+            image_bgr, out_mask.decode(), obj_id=out_obj_id)[0]
+    return [('Mask Image', image_bgr)]
+
+
 class VideoSegmentTrackingTask(Task):
-    def __init__(self, model) -> None:
+    """Track the prompted object through a video
+
+    With `chunk_size` the video is tracked in chunks of that many frames,
+    so memory stays bounded whatever the length of the video. Consecutive
+    chunks share `overlap` frames, whose masks seed the objects of the next
+    chunk to keep their identities. The masks of each frame are passed to
+    `sink(frame_idx, frame, masks)` as soon as they are produced.
+    """
+
+    def __init__(self, model, visualizer=None, chunk_size=None, overlap=1,
+                 sink=None) -> None:
         super().__init__()
+        if chunk_size is not None and not 0 < overlap < chunk_size:
+            raise ValueError("Overlap must be positive and less than chunk size")
         self._predictor = model
+        self._execution = ExecutionConfig.of(model)
+        # A window per frame would block a long video tracked in chunks
+        self._visualizer = visualizer or (
+            NullVisualizer() if chunk_size else WindowVisualizer())
+        self._chunk_size = chunk_size
+        self._overlap = overlap
+        self._sink = sink
 
     def set_data(self, data):
+        # A list of RGB frames, a directory of "<index>.jpg" frames, or, when
+        # tracking in chunks, any iterable of RGB frames
         self._data = data
 
     def add_prompt(self, prompt):
@@ -59,47 +97,114 @@ class VideoSegmentTrackingTask(Task):
 
         return point_coords, point_labels, box
 
+    def _frames(self):
+        """Frames to visualize, in the order of the frame indexes
+        """
+        if not isinstance(self._data, str):
+            return self._data
+        frame_names = [
+            p
+            for p in os.listdir(self._data)
+            if os.path.splitext(p)[-1] in [".jpg", ".jpeg", ".JPG", ".JPEG"]
+        ]
+        frame_names.sort(key=lambda p: int(os.path.splitext(p)[0]))
+        return [os.path.join(self._data, p) for p in frame_names]
+
+    def _init_state(self, frames):
+        if isinstance(frames, str):
+            return self._predictor.init_state(video_path=frames)
+        with in_memory_frames(frames):
+            return self._predictor.init_state(video_path=None)
+
+    def _add_prompts(self, inference_state):
+        # todo(zero): Add new interactive methods to select points or
+        # rectangles to specify the data to be labeled and visualize them
+        point_coords, point_labels, box = self._combine_prompts()
+        ann_frame_idx, ann_obj_id = 0, 0
+        # add new prompts and instantly get the output on the same frame
+        self._predictor.add_new_points_or_box(
+            inference_state=inference_state,
+            frame_idx=ann_frame_idx,
+            obj_id=ann_obj_id,
+            points=point_coords,
+            labels=point_labels,
+            box=box)
+
+    def _propagate(self, inference_state):
+        # propagate the prompts to get masklets throughout the video, masks
+        # are kept run-length encoded
+        for out_frame_idx, out_obj_ids, out_mask_logits in self._predictor.propagate_in_video(inference_state):
+            yield out_frame_idx, {
+                out_obj_id: RLEMask.encode((out_mask_logits[i][0] > 0.0).cpu().numpy())
+                for i, out_obj_id in enumerate(out_obj_ids)
+            }
+
+    def _emit(self, frame_idx, frame, masks):
+        self._visualizer.submit(
+            '{:06d}'.format(frame_idx), _render_frame, frame, masks)
+        if self._sink is not None:
+            self._sink(frame_idx, frame, masks)
+
     def process(self):
-        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
-            inference_state = self._predictor.init_state(video_path=self._data)
-
-            # todo(zero): Add new interactive methods to select points or
-            # rectangles to specify the data to be labeled and visualize them
-            point_coords, point_labels, box = self._combine_prompts()
-            ann_frame_idx, ann_obj_id = 0, 0
-            # add new prompts and instantly get the output on the same frame
-            frame_idx, object_ids, masks = self._predictor.add_new_points_or_box(
-                inference_state=inference_state,
-                frame_idx=ann_frame_idx,
-                obj_id=ann_obj_id,
-                points=point_coords,
-                labels=point_labels,
-                box=box)
-
-            # propagate the prompts to get masklets throughout the video
-            video_segments = {}
-            for out_frame_idx, out_obj_ids, out_mask_logits in self._predictor.propagate_in_video(inference_state):
-                video_segments[out_frame_idx] = {
-                    out_obj_id: (out_mask_logits[i] > 0.0).cpu().numpy()
-                    for i, out_obj_id in enumerate(out_obj_ids)
-                }
-
-            # todo(zero): Optimize visualization methods, especially the order of images
-            # scan all the JPEG frame names in this directory.
-            # Design a way to achieve a one-to-one correspondence between images
-            # and annotation results. This may require modifying the arrangement of images in sam2.
-            frame_names = [
-                p
-                for p in os.listdir(self._data)
-                if os.path.splitext(p)[-1] in [".jpg", ".jpeg", ".JPG", ".JPEG"]
-            ]
-            frame_names.sort(key=lambda p: int(os.path.splitext(p)[0]))
-            num_frames = len(frame_names)
-
-            for out_frame_idx in range(num_frames):
-                image_bgr = cv2.imread(os.path.join(
-                    self._data, frame_names[out_frame_idx]), cv2.IMREAD_UNCHANGED)
-                for out_obj_id, out_mask in video_segments[out_frame_idx].items():
-                    show_mask1(image_bgr, out_mask, obj_id=out_obj_id)
+        with self._execution.inference():
+            if self._chunk_size:
+                return self._process_chunks()
+
+            inference_state = self._init_state(self._data)
+            self._add_prompts(inference_state)
+            video_segments = dict(self._propagate(inference_state))
+
+            for out_frame_idx, frame in enumerate(self._frames()):
+                self._emit(out_frame_idx, frame, video_segments[out_frame_idx])
 
             return video_segments
+
+    def _process_chunks(self):
+        """Track chunk by chunk, only one chunk of frames and its state are
+        kept in memory
+
+        Returns:
+            int: the number of frames labeled
+        """
+        frames = iter(self._data)
+        # The last frames of the previous chunk and their masks
+        carry_frames, carry_masks = [], []
+        # Index in the video of the first frame of the chunk
+        chunk_start = 0
+        while True:
+            new_frames = list(itertools.islice(
+                frames, self._chunk_size - len(carry_frames)))
+            if not new_frames:
+                break
+            chunk = carry_frames + new_frames
+
+            inference_state = self._init_state(chunk)
+            if not carry_frames:
+                self._add_prompts(inference_state)
+            else:
+                # The overlapping frames are conditioning frames of the new
+                # chunk, objects keep their ids across the chunk boundary
+                for frame_idx, masks in enumerate(carry_masks):
+                    for obj_id, mask in masks.items():
+                        self._predictor.add_new_mask(
+                            inference_state=inference_state,
+                            frame_idx=frame_idx,
+                            obj_id=obj_id,
+                            mask=mask.decode())
+
+            chunk_masks = {}
+            for out_frame_idx, masks in self._propagate(inference_state):
+                if out_frame_idx >= len(chunk) - self._overlap:
+                    chunk_masks[out_frame_idx] = masks
+                if out_frame_idx >= len(carry_frames):
+                    self._emit(chunk_start + out_frame_idx,
+                               chunk[out_frame_idx], masks)
+            del inference_state
+
+            carry_start = max(len(chunk) - self._overlap, 0)
+            carry_frames = chunk[carry_start:]
+            carry_masks = [chunk_masks.get(i, {})
+                           for i in range(carry_start, len(chunk))]
+            chunk_start += carry_start
+
+        return chunk_start + len(carry_frames)
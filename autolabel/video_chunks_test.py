@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+sam2_video_predictor = pytest.importorskip("sam2.sam2_video_predictor")
+
+from autolabel.model.execution import ExecutionConfig  # noqa: E402
+from autolabel.prompt.prompt import Prompt  # noqa: E402
+from autolabel.task.video_segment_tracking_task import VideoSegmentTrackingTask  # noqa: E402
+from autolabel.vis.visualizer import NullVisualizer  # noqa: E402
+
+
+class StubPredictor:
+    """Video predictor whose frames are numbered by their pixel values, the
+    mask of frame i has i % 8 + 1 pixels
+    """
+
+    def __init__(self) -> None:
+        self.execution = ExecutionConfig('cpu')
+        self.chunks = []
+        self.prompted = []
+        self.seeds = []
+
+    def init_state(self, video_path):
+        # The frames handed over in memory by the task
+        images, _, _ = sam2_video_predictor.load_video_frames(video_path, 4, True)
+        frames = [int(round((image[0, 0, 0].item() * 0.229 + 0.485) * 255))
+                  for image in images]
+        self.chunks.append(frames)
+        return {'frames': frames}
+
+    def add_new_points_or_box(self, inference_state, frame_idx, **kwargs):
+        self.prompted.append(inference_state['frames'][frame_idx])
+
+    def add_new_mask(self, inference_state, frame_idx, obj_id, mask):
+        self.seeds.append((inference_state['frames'][frame_idx], obj_id, int(mask.sum())))
+
+    def propagate_in_video(self, inference_state):
+        for i, index in enumerate(inference_state['frames']):
+            logits = -torch.ones(1, 1, 1, 8)
+            logits[..., :index % 8 + 1] = 1.0
+            yield i, [0], logits
+
+
+def test_chunks_overlap():
+    predictor = StubPredictor()
+    emitted = []
+    task = VideoSegmentTrackingTask(
+        predictor, NullVisualizer(), chunk_size=4, overlap=1,
+        sink=lambda frame_idx, frame, masks: emitted.append(
+            (frame_idx, int(frame[0, 0, 0]), masks[0].area())))
+    task.add_prompt(Prompt([[1, 1]], [1], None, None))
+    task.set_data(np.full((8, 8, 3), i, dtype=np.uint8) for i in range(10))
+
+    assert task.process() == 10
+    assert predictor.chunks == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+    # Every frame once, at its index in the video, with its own mask
+    assert emitted == [(i, i, i % 8 + 1) for i in range(10)]
+    # Only the first chunk is prompted, the overlap frames seed the next chunks
+    assert predictor.prompted == [0]
+    assert predictor.seeds == [(3, 0, 4), (6, 0, 7)]
@@ -21,40 +21,51 @@ import numpy as np
 np.random.seed(3)
 
 
-def show_mask1(image, mask, obj_id=None, random_color=False):
+COLOR_MAP = np.array([
+    [31, 119, 180],
+    [255, 127, 14],
+    [44, 160, 44],
+    [214, 39, 40],
+    [148, 103, 189],
+    [140, 86, 75],
+    [227, 119, 194],
+    [127, 127, 127],
+    [188, 189, 34],
+    [23, 190, 207]
+])  # matplotlib tab10
+
+
+def display(images):
+    """Show rendered (title, image) pairs and wait for a key press
+    """
+    for title, image in images:
+        cv2.imshow(title, image)
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
+
+
+def render_mask1(image, mask, obj_id=None, random_color=False):
     if random_color:
         color = np.random.random(3) * 255
     else:
-        color_map = np.array([
-            [31, 119, 180],
-            [255, 127, 14],
-            [44, 160, 44],
-            [214, 39, 40],
-            [148, 103, 189],
-            [140, 86, 75],
-            [227, 119, 194],
-            [127, 127, 127],
-            [188, 189, 34],
-            [23, 190, 207]
-        ])  # matplotlib tab10
-        cmap_idx = 0 if obj_id is None else obj_id % len(color_map)
-        color = color_map[cmap_idx]
+        cmap_idx = 0 if obj_id is None else obj_id % len(COLOR_MAP)
+        color = COLOR_MAP[cmap_idx]
 
     mask = mask.astype(np.uint8)
     h, w = mask.shape[-2:]
     # Reshape the mask and apply color
     mask_image = mask.reshape(h, w, 1) * color[:3].reshape(1, 1, 3)
 
-    # Convert mask_image to uint8 for blending
-    mask_image = (mask_image * 255).astype(np.uint8)
+    # Convert mask_image to uint8 for blending, the color is already 0~255
+    mask_image = mask_image.astype(np.uint8)
 
     # Blend the original image and the colored mask
     overlay_image = cv2.addWeighted(image, 0.6, mask_image, 1, 0)
+    return [('Mask Image', overlay_image)]
 
-    # Display the image
-    cv2.imshow('Mask Image', overlay_image)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+
+def show_mask1(image, mask, obj_id=None, random_color=False):
+    display(render_mask1(image, mask, obj_id, random_color))
 
 
 def show_mask(image, mask, random_color=False, borders=True):
@@ -107,7 +118,8 @@ def show_box(image, box):
     return image
 
 
-def show_masks(image, masks, scores, point_coords=None, box_coords=None, input_labels=None, borders=True):
+def render_masks(image, masks, scores, point_coords=None, box_coords=None, input_labels=None, borders=True):
+    images = []
     for i, (mask, score) in enumerate(zip(masks, scores)):
         # Display mask
         overlay_image = show_mask(image.copy(), mask, borders=borders)
@@ -126,7 +138,26 @@ def show_masks(image, masks, scores, point_coords=None, box_coords=None, input_l
             cv2.putText(overlay_image, f"Mask {i+1}, Score: {score:.3f}",
                         (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-        # Display image
-        cv2.imshow(f"Mask {i+1}", overlay_image)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
+        images.append((f"Mask {i+1}", overlay_image))
+    return images
+
+
+def show_masks(image, masks, scores, point_coords=None, box_coords=None, input_labels=None, borders=True):
+    display(render_masks(image, masks, scores, point_coords, box_coords,
+                         input_labels, borders))
+
+
+def render_object_masks(image, masks, alpha=0.6):
+    # Draw every object in its own color on one image
+    overlay_image = image.copy()
+    for obj_id, mask in enumerate(masks):
+        mask_idx = mask > 0
+        color = COLOR_MAP[obj_id % len(COLOR_MAP)]
+        overlay_image[mask_idx] = (
+            overlay_image[mask_idx] * (1 - alpha) + color * alpha).astype(np.uint8)
+
+    return [("Objects", overlay_image)]
+
+
+def show_object_masks(image, masks, alpha=0.6):
+    display(render_object_masks(image, masks, alpha))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import logging
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+
+from autolabel.vis.vis import display
+
+
+class Visualizer(metaclass=abc.ABCMeta):
+    """Where the label results are drawn
+
+    Tasks hand over a render function instead of a rendered image, so a
+    visualizer that is disabled does no rendering work at all.
+    """
+
+    @abc.abstractmethod
+    def submit(self, name, render_fn, *args, **kwargs):
+        """Render `render_fn(*args, **kwargs)`, a list of (title, image)
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NullVisualizer(Visualizer):
+    def submit(self, name, render_fn, *args, **kwargs):
+        pass
+
+
+class WindowVisualizer(Visualizer):
+    """Show the results in windows, blocking until a key is pressed
+    """
+
+    def submit(self, name, render_fn, *args, **kwargs):
+        display(render_fn(*args, **kwargs))
+
+
+class FileVisualizer(Visualizer):
+    """Render the results on a background thread and write them to `dir`
+
+    At most `max_pending` results wait for rendering, after that `submit`
+    blocks so a slow disk can't grow the memory without bound.
+    """
+
+    def __init__(self, output_dir, max_pending: int = 16, ext: str = '.jpg') -> None:
+        self._output_dir = Path(output_dir)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._ext = ext
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="autolabel-vis", daemon=True)
+        self._thread.start()
+
+    def submit(self, name, render_fn, *args, **kwargs):
+        self._queue.put((name, render_fn, args, kwargs))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            name, render_fn, args, kwargs = job
+            try:
+                self._write(name, render_fn(*args, **kwargs))
+            except Exception as e:
+                logging.error("Render {} failed! {}".format(name, e))
+
+    def _write(self, name, images):
+        for i, (_, image) in enumerate(images):
+            suffix = "" if len(images) == 1 else "_{}".format(i)
+            file_path = self._output_dir / "{}{}{}".format(name, suffix, self._ext)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            cv2.imwrite(str(file_path), image)
+
+
+class VisualizerFactory:
+    @staticmethod
+    def create(cfg, default_mode: str = 'window') -> Visualizer:
+        """Create a visualizer from the `vis` config section
+
+        Args:
+            cfg (dict): `mode` is one of "window", "file" or "none", "file"
+                also needs a `dir`
+            default_mode (str): mode when the config doesn't set one
+
+        Returns:
+            Visualizer: the visualizer
+        """
+        cfg = cfg or {}
+        mode = cfg.get('mode', default_mode)
+        if mode == 'window':
+            return WindowVisualizer()
+        elif mode == 'file':
+            if not cfg.get('dir'):
+                raise ValueError("vis.mode 'file' needs vis.dir")
+            return FileVisualizer(cfg['dir'], cfg.get('max_pending', 16))
+        elif mode == 'none':
+            return NullVisualizer()
+        else:
+            raise ValueError(f"Visualizer mode '{mode}' is not supported.")
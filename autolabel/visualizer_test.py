@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from autolabel.vis.visualizer import NullVisualizer, VisualizerFactory
+
+
+def test_visualizer_factory_config_errors():
+    assert isinstance(VisualizerFactory.create({'mode': 'none'}), NullVisualizer)
+    with pytest.raises(ValueError, match="needs vis.dir"):
+        VisualizerFactory.create({'mode': 'file'})
+    with pytest.raises(ValueError, match="not supported"):
+        VisualizerFactory.create({'mode': 'gif'})
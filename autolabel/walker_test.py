@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+from autolabel.source.walker import DirWalker
+
+
+def _make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+
+
+def _walk(root, **kwargs):
+    return [os.path.relpath(e.path, root).replace(os.sep, '/')
+            for e in DirWalker(root, **kwargs)]
+
+
+def test_walk_order(tmp_path):
+    _make_tree(tmp_path, ['b.jpg', 'a/2.jpg', 'a/1.jpg', 'a/x/y.jpg', 'c/d.png'])
+    expected = ['a/1.jpg', 'a/2.jpg', 'a/x/y.jpg', 'b.jpg', 'c/d.png']
+    assert _walk(tmp_path) == expected
+    assert _walk(tmp_path, workers=1, max_pending=0) == expected
+
+
+def test_walk_filters(tmp_path):
+    _make_tree(tmp_path, ['a.jpg', 'a.txt', 'cache/b.jpg', 'x/y/c.jpg'])
+    assert _walk(tmp_path, include='*.jpg') == ['a.jpg', 'cache/b.jpg', 'x/y/c.jpg']
+    assert _walk(tmp_path, include='*.jpg', exclude=['cache']) == ['a.jpg', 'x/y/c.jpg']
+    assert _walk(tmp_path, max_depth=0) == ['a.jpg', 'a.txt']
+    assert _walk(tmp_path, max_depth=1) == ['a.jpg', 'a.txt', 'cache/b.jpg']
+    with pytest.raises(ValueError):
+        DirWalker(tmp_path, max_depth=-1)
+
+
+def test_walk_symlinks(tmp_path):
+    _make_tree(tmp_path, ['data/a.jpg', 'other/b.jpg'])
+    os.symlink(tmp_path / 'other', tmp_path / 'data' / 'linked')
+    # A link back to an ancestor is skipped instead of looping
+    os.symlink(tmp_path / 'data', tmp_path / 'data' / 'loop')
+    assert _walk(tmp_path / 'data') == ['a.jpg', 'linked/b.jpg']
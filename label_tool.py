@@ -12,7 +12,6 @@ from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 
 import numpy as np
-import torch
 from PIL import Image
 
 # 导入您的模型和相关模块
@@ -22,12 +21,51 @@ from autolabel.prompt.prompt import Prompt
 from autolabel.task.image_segment_task import ImageSegmentTask
 from autolabel.task.image_detection_task import ImageDetectionTask
 from autolabel.task.video_segment_tracking_task import VideoSegmentTrackingTask
+from autolabel.model.embedding_cache import EmbeddingCache
+from autolabel.model.execution import ExecutionConfig
+from autolabel.label.rle import RLEMask
+from autolabel.label.writer import JsonlWriter, LabelRecord
+from autolabel.server.client import ModelClient
+from autolabel.server.model_cache import ModelCache
 
 from sam2.sam2_image_predictor import SAM2ImagePredictor
 
+MODEL_CHECKPOINT = 'autolabel/checkpoints/sam2_hiera_large.pt'
+MODEL_CFG = 'sam2_hiera_l.yaml'
+# 图像特征缓存目录，重新打开同一图像时跳过编码器
+EMBEDDING_CACHE_DIR = '~/.cache/autolabel/embeddings'
+# 模型服务地址（autolabel --serve），未启动时执行命令回退到子进程
+SERVER_ADDRESS = os.environ.get('AUTOLABEL_SERVER', '')
+# 已加载的模型，打开新图像时不再重新构建
+MODEL_CACHE = ModelCache(ModelFactory.create, capacity=1)
+
+
+# 后台线程，执行标注任务：优先提交到模型服务，否则运行 autolabel 命令
+class JobThread(QThread):
+    job_finished = pyqtSignal(bool, str)
+
+    def __init__(self, config, config_file):
+        super().__init__()
+        self.config = config
+        self.config_file = config_file
+
+    def run(self):
+        with ModelClient(SERVER_ADDRESS) as client:
+            if client.health() is not None:
+                try:
+                    reply = client.submit(self.config)
+                    self.job_finished.emit(True, reply['output'])
+                except Exception as e:
+                    self.job_finished.emit(False, str(e))
+                return
+        result = subprocess.run(['autolabel', '-c={}'.format(self.config_file)],
+                                capture_output=True, text=True)
+        self.job_finished.emit(result.returncode == 0,
+                               result.stdout + result.stderr)
+
 # 后台线程，用于模型预测
 class PredictThread(QThread):
-    result_ready = pyqtSignal(np.ndarray)
+    result_ready = pyqtSignal(object)
 
     def __init__(self, image_predictor, point_coords=None, point_labels=None, box=None):
         super().__init__()
@@ -39,7 +77,7 @@ class PredictThread(QThread):
     def run(self):
         try:
             # 进行模型预测
-            with torch.no_grad():
+            with ExecutionConfig.of(self.image_predictor.model).inference():
                 masks, scores, logits = self.image_predictor.predict(
                     point_coords=self.point_coords,
                     point_labels=self.point_labels,
@@ -47,9 +85,8 @@ class PredictThread(QThread):
                     multimask_output=False
                 )
                 if masks is not None and len(masks) > 0:
-                    mask = masks[0]
-                    # 将 mask 转换为 uint8 格式
-                    mask = (mask * 255).astype(np.uint8)
+                    # 将 mask 压缩为游程编码，避免保存整幅图像
+                    mask = RLEMask.encode(masks[0] > 0)
                     # 发射信号，将结果传递回主线程
                     self.result_ready.emit(mask)
                 else:
@@ -58,7 +95,7 @@ class PredictThread(QThread):
             print(f"预测时发生错误：{e}")
             self.result_ready.emit(None)
 class ImageLabel(QLabel):
-    update_mask_signal = pyqtSignal(np.ndarray)
+    update_mask_signal = pyqtSignal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -88,6 +125,8 @@ class ImageLabel(QLabel):
         self.predictor = None
         self.mask = None
         self.combined_mask = None
+        # 按显示尺寸缩放后的 combined_mask 图像，mask 改变时失效
+        self.combined_mask_image = None
         self.is_previewing = True  # 控制是否实时预览
         self.clicked_points = []
 
@@ -173,33 +212,31 @@ class ImageLabel(QLabel):
 
                 if self.is_point_in_combined_mask(self.combined_mask, x, y):
                     # 从 combined_mask 中减去新的 mask
-                    overlap_region = np.logical_and(self.combined_mask > 0, mask > 0)
-                    self.combined_mask[overlap_region] = np.maximum(0, self.combined_mask[overlap_region] - mask[overlap_region])
+                    self.combined_mask = self.combined_mask.subtract(mask)
                 else:
                     # 将新的 mask 加入到 combined_mask 中
-                    non_overlap_region = np.logical_and(self.combined_mask == 0, mask > 0)
-                    self.combined_mask[non_overlap_region] = mask[non_overlap_region]
+                    self.combined_mask = self.combined_mask.union(mask)
             elif self.current_tool == 'rectangle':
                 # 对于矩形工具，直接将新的 mask 加入到 combined_mask 中
-                self.combined_mask = np.maximum(self.combined_mask, mask)
+                self.combined_mask = self.combined_mask.union(mask)
             else:
                 # 其他情况，可以根据需要添加处理逻辑
                 pass
 
-        self.combined_mask = np.clip(self.combined_mask, 0, 255)
+        self.combined_mask_image = None
         self.is_previewing = False
         self.update()
 
 
 
     def is_point_in_combined_mask(self, combined_mask, x, y):
-        # 检查坐标是否在图像的范围内
-        if 0 <= x < combined_mask.shape[1] and 0 <= y < combined_mask.shape[0]:
-            # 判断该点在 combined_mask 对应位置的值是否大于零
-            return combined_mask[y, x] > 0
-        else:
-            # 如果坐标超出边界，返回 False
-            return False
+        # 直接在游程编码上判断，坐标超出边界时返回 False
+        return combined_mask.contains(int(x), int(y))
+
+    def mask_to_qimage(self, mask):
+        # 解码为 0/255 灰度图，QImage 复制数据后即可释放
+        mask = mask.decode().astype(np.uint8) * 255
+        return QImage(mask.data, mask.shape[1], mask.shape[0], mask.shape[1], QImage.Format_Grayscale8).copy()
 
 
     # 鼠标正在移动
@@ -308,14 +345,16 @@ class ImageLabel(QLabel):
         pixmap_rect = self.get_pixmap_rect()
 
         if self.combined_mask is not None:
-            combined_mask_image = QImage(self.combined_mask.data, self.combined_mask.shape[1], self.combined_mask.shape[0], self.combined_mask.shape[1], QImage.Format_Grayscale8)
-            combined_mask_image = combined_mask_image.scaled(pixmap_rect.size(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            # 只在 mask 或显示尺寸改变时解码
+            if self.combined_mask_image is None or self.combined_mask_image.size() != pixmap_rect.size():
+                self.combined_mask_image = self.mask_to_qimage(self.combined_mask).scaled(
+                    pixmap_rect.size(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
             painter.setOpacity(0.5)
-            painter.drawImage(pixmap_rect.topLeft(), combined_mask_image)
+            painter.drawImage(pixmap_rect.topLeft(), self.combined_mask_image)
             painter.setOpacity(1.0)
 
         if self.is_previewing and self.mask is not None:
-            mask_image = QImage(self.mask.data, self.mask.shape[1], self.mask.shape[0], self.mask.shape[1], QImage.Format_Grayscale8)
+            mask_image = self.mask_to_qimage(self.mask)
             mask_image = mask_image.scaled(pixmap_rect.size(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
             painter.setOpacity(0.5)
             painter.drawImage(pixmap_rect.topLeft(), mask_image)
@@ -362,6 +401,7 @@ class ImageLabel(QLabel):
         self.actions.clear()
         self.mask = None
         self.combined_mask = None
+        self.combined_mask_image = None
         self.clicked_points = []
         self.is_previewing = True  # 清除所有操作后重新启用预览
         self.update()
@@ -373,7 +413,7 @@ class ImageLabel(QLabel):
             painter.setRenderHint(QPainter.Antialiasing)
 
             if self.combined_mask is not None:
-                mask_image = QImage(self.combined_mask.data, self.combined_mask.shape[1], self.combined_mask.shape[0], self.combined_mask.shape[1], QImage.Format_Grayscale8)
+                mask_image = self.mask_to_qimage(self.combined_mask)
                 painter.setOpacity(0.5)
                 painter.drawImage(0, 0, mask_image)
                 painter.setOpacity(1.0)
@@ -386,6 +426,18 @@ class ImageLabel(QLabel):
         else:
             QMessageBox.warning(self, "警告", "没有可保存的图像！")
 
+    def export_labels(self, file_name):
+        if self.combined_mask is None:
+            QMessageBox.warning(self, "警告", "没有可导出的标注！")
+            return
+
+        output_dir = QFileDialog.getExistingDirectory(self, "导出标注")
+        if output_dir:
+            # 追加到 labels.jsonl，多张图像的标注保存在同一个文件中
+            height, width = self.combined_mask.shape
+            with JsonlWriter(output_dir, append=True) as writer:
+                writer.write(LabelRecord(file_name, height, width, [self.combined_mask]))
+
 
 
 
@@ -494,6 +546,12 @@ class MainWindow(QMainWindow):
         self.save_action.triggered.connect(self.save_action_triggered)
         self.top_toolbar.addAction(self.save_action)
 
+        # 导出标注，masks 以 COCO RLE 格式保存
+        export_icon = self.style().standardIcon(QStyle.SP_FileDialogDetailedView)
+        self.export_action = QAction(export_icon, "导出标注", self)
+        self.export_action.triggered.connect(self.export_action_triggered)
+        self.top_toolbar.addAction(self.export_action)
+
         # 使用标准执行图标
         execute_icon = self.style().standardIcon(QStyle.SP_MediaPlay)
         self.execute_action = QAction(execute_icon, "执行", self)
@@ -538,6 +596,12 @@ class MainWindow(QMainWindow):
     def save_action_triggered(self):
         self.image_label.save_image()
 
+    def export_action_triggered(self):
+        if not self.current_file:
+            QMessageBox.warning(self, "警告", "请先打开一个文件！")
+            return
+        self.image_label.export_labels(self.current_file)
+
     def clear_action_triggered(self):
         self.image_label.clear_all()
 
@@ -579,9 +643,8 @@ class MainWindow(QMainWindow):
             with open(file_path, 'w', encoding='utf-8') as f:
                 yaml.dump(content, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
 
-            command = f'autolabel -c={file_path}'
-            self.command_thread = CommandThread(command)
-            self.command_thread.finished.connect(self.on_command_finished)
+            self.command_thread = JobThread(content, file_path)
+            self.command_thread.job_finished.connect(self.on_command_finished)
             self.command_thread.start()
 
         except Exception as e:
@@ -626,7 +689,7 @@ class MainWindow(QMainWindow):
 
             image = Image.open(file_name)
             image = np.array(image.convert('RGB'))
-            self.thread = CreateImagePredictorThread(image)
+            self.thread = CreateImagePredictorThread(image, file_name)
             self.thread.predictor_created.connect(self.get_predictor)
             self.thread.start()
 
@@ -727,21 +790,39 @@ class VideoWidget(QVideoWidget):
 
 class CreateImagePredictorThread(QThread):
     predictor_created = pyqtSignal(SAM2ImagePredictor)
-    def __init__(self, image):
+    # 所有线程共享的图像特征缓存
+    embedding_cache = None
+
+    def __init__(self, image, file_name=None):
         super().__init__()
         self.image = image
+        self.file_name = file_name
     def run(self):
-        model_checkpoint = 'autolabel/checkpoints/sam2_hiera_large.pt'
-        model_cfg = 'sam2_hiera_l.yaml'
-
-        model = ModelFactory.create(model_checkpoint, model_cfg, 'image_segment')
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model.to(device)
+        model = MODEL_CACHE.get(MODEL_CHECKPOINT, MODEL_CFG, 'image_segment')
 
         predictor = SAM2ImagePredictor(model)
-        predictor.set_image(self.image)
+        execution = ExecutionConfig.of(model)
+        cache = CreateImagePredictorThread.get_embedding_cache(execution)
+        cache_key = cache.key(self.file_name) if self.file_name else None
+        with execution.inference():
+            cache.set_image(predictor, self.image, cache_key)
+        print(cache.summary())
         self.predictor_created.emit(predictor)
 
+    @staticmethod
+    def get_embedding_cache(execution):
+        if CreateImagePredictorThread.embedding_cache is None:
+            # 与命令行相同的缓存键，包含模型实际运行的 dtype 和内存格式
+            model_section = {
+                'checkpoint': MODEL_CHECKPOINT,
+                'model_cfg': MODEL_CFG,
+                'execution': {'dtype': execution.dtype,
+                              'channels_last': execution.channels_last},
+            }
+            CreateImagePredictorThread.embedding_cache = EmbeddingCache.from_config(
+                {'dir': EMBEDDING_CACHE_DIR}, model_section)
+        return CreateImagePredictorThread.embedding_cache
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
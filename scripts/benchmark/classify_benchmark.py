@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare entries/sec of source type detection over a directory tree
+
+"legacy" is the former detection, Path.iterdir plus is_file, imghdr,
+mimetypes, exists and regex compiles per entry. "input" classifies the
+same paths with SourceInput, "scandir" walks them with DirSource. The
+skipped text files are not counted by "scandir", so its rate is a lower
+bound. Usage:
+
+    python scripts/benchmark/classify_benchmark.py --entries 200000
+"""
+
+import argparse
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import imghdr
+    except ImportError:
+        # Removed in python 3.13
+        imghdr = None
+
+from autolabel.source.source_factory import DirSource
+from autolabel.source.source_input import SourceInput
+
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + b'\x00' * 53
+
+
+def make_tree(root, entries, dirs):
+    """Jpegs, 10% jpegs without extension and 10% text files
+    """
+    per_dir = max(1, entries // dirs)
+    for i in range(entries):
+        sub_dir = os.path.join(root, 'd{:04d}'.format(i // per_dir))
+        if i % per_dir == 0:
+            os.makedirs(sub_dir, exist_ok=True)
+        if i % 10 == 0:
+            name, data = '{:07d}'.format(i), JPEG_HEADER
+        elif i % 10 == 1:
+            name, data = '{:07d}.txt'.format(i), b'text'
+        else:
+            name, data = '{:07d}.jpg'.format(i), JPEG_HEADER
+        with open(os.path.join(sub_dir, name), 'wb') as f:
+            f.write(data)
+
+
+def legacy_type(src):
+    # The former SourceInput._get_source_type
+    path = Path(src)
+    if path.is_file():
+        if imghdr.what(src) is not None:
+            return 'image'
+        mime_type, _ = mimetypes.guess_type(path)
+        if mime_type and mime_type.startswith('video/'):
+            return 'video'
+        return None
+    elif path.exists():
+        return 'dir'
+    elif re.match(re.compile(r'^(rtsp://|rtmp://)[^\s/$.?#].[^\s]*$', re.IGNORECASE), src):
+        return 'stream'
+    return None
+
+
+def run_legacy(root):
+    count = 0
+    for sub_dir in Path(root).iterdir():
+        for p in sub_dir.iterdir():
+            legacy_type(str(p))
+            count += 1
+    return count
+
+
+def run_input(root):
+    count = 0
+    for sub_dir in Path(root).iterdir():
+        for p in sub_dir.iterdir():
+            try:
+                SourceInput(str(p))
+            except NotImplementedError:
+                pass
+            count += 1
+    return count
+
+
+def run_scandir(root):
+    count = 0
+    for _ in DirSource(SourceInput(root)):
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", type=str, default=None,
+                        help="tree to classify, a synthetic one if not set")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Skipped text files would flood the output
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = args.root
+        if root is None:
+            root = tmp_dir
+            make_tree(root, args.entries, args.dirs)
+
+        print("{:<10} {:>10} {:>14}".format("method", "entries", "entries/sec"))
+        methods = [('input', run_input), ('scandir', run_scandir)]
+        if imghdr is not None:
+            methods.insert(0, ('legacy', run_legacy))
+        for name, run in methods:
+            best = None
+            for _ in range(args.repeat):
+                start_time = time.perf_counter()
+                count = run(root)
+                elapsed = time.perf_counter() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+            print("{:<10} {:>10} {:>14.0f}".format(name, count, count / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare image decode paths by time per stage and peak RSS
+
+"pil" is the former path, Image.open, convert("RGB") and np.array. "cv2"
+is `decode_image`, one read, cv2.imdecode and an in place channel swap.
+"reduced" decodes a jpeg scaled down to no less than the 1024 model input.
+With torch installed the model input stage is timed too, the former float
+conversion on the host against `image_to_input`. Each path runs in its own
+process, so the peak RSS of one doesn't hide the other. Usage:
+
+    python scripts/benchmark/decode_benchmark.py --width 4000 --height 3000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from autolabel.source.image_decoder import decode_image, decode_image_reduced  # noqa: E402
+
+try:
+    import torch
+    from autolabel.model.image_input import image_to_input
+except ImportError:
+    torch = None
+
+RESOLUTION = 1024
+
+
+def make_image(file_path, width, height):
+    # Smooth gradients plus noise compress like a camera image
+    y, x = np.mgrid[0:height, 0:width]
+    rng = np.random.default_rng(0)
+    image = np.stack([x * 255 // width, y * 255 // height,
+                      (x + y) * 255 // (width + height)], axis=-1)
+    image = (image + rng.integers(0, 32, image.shape)).clip(0, 255)
+    Image.fromarray(image.astype(np.uint8)).save(file_path, quality=90)
+
+
+def decode_pil(file_path, timings):
+    start_time = time.perf_counter()
+    with Image.open(file_path) as img:
+        img.load()
+        timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        image = np.array(img.convert("RGB"))
+    timings['convert'] = timings.get('convert', 0.0) + time.perf_counter() - start_time
+    return image
+
+
+def input_pil(image):
+    # ToTensor on the host, then resize and normalize
+    tensor = torch.from_numpy(image.transpose(2, 0, 1)).contiguous().float() / 255.0
+    tensor = torch.nn.functional.interpolate(
+        tensor[None], size=(RESOLUTION, RESOLUTION), mode="bilinear",
+        align_corners=False, antialias=True)
+    mean = torch.tensor([0.485, 0.456, 0.406])[:, None, None]
+    std = torch.tensor([0.229, 0.224, 0.225])[:, None, None]
+    return (tensor - mean) / std
+
+
+def input_cv2(image):
+    return image_to_input(image, RESOLUTION, "cpu")
+
+
+METHODS = {
+    'pil': (decode_pil, lambda image: input_pil(image)),
+    'cv2': (lambda file_path, timings: decode_image(file_path, timings),
+            lambda image: input_cv2(image)),
+    'reduced': (lambda file_path, timings: decode_image_reduced(
+        file_path, RESOLUTION, timings)[0], lambda image: input_cv2(image)),
+}
+
+
+def _proc_status_mb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def rss_mb():
+    """Current and peak RSS, the peak of ru_maxrss would include the
+    parent's, it is kept across exec
+    """
+    if os.path.exists('/proc/self/status'):
+        return _proc_status_mb('VmRSS'), _proc_status_mb('VmHWM')
+    # bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20)
+    return peak, peak
+
+
+def run(name, file_path, repeat, results):
+    decode, to_input = METHODS[name]
+    base_rss, _ = rss_mb()
+    timings = {}
+    for _ in range(repeat):
+        image = decode(file_path, timings)
+        if torch is not None:
+            start_time = time.perf_counter()
+            to_input(image)
+            timings['input'] = timings.get('input', 0.0) + time.perf_counter() - start_time
+        del image
+    results[name] = ({k: v / repeat for k, v in timings.items()},
+                     rss_mb()[1] - base_rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", type=str, default=None,
+                        help="image to decode, a synthetic jpeg if not set")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = args.image
+        if file_path is None:
+            file_path = os.path.join(tmp_dir, 'image.jpg')
+            make_image(file_path, args.width, args.height)
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Manager().dict()
+        for name in METHODS:
+            p = ctx.Process(target=run, args=(name, file_path, args.repeat, results))
+            p.start()
+            p.join()
+
+    stages = ['read', 'decode', 'convert', 'input']
+    # Peak RSS above the RSS after the imports
+    print("{:<7} {}  {:>8} {:>14}".format(
+        "method", " ".join("{:>10}".format(s) for s in stages), "total",
+        "peak rss (MB)"))
+    for name, (timings, rss) in results.items():
+        print("{:<7} {}  {:>8.1f} {:>14.1f}".format(
+            name, " ".join("{:>10}".format(
+                "{:.1f}ms".format(timings[s] * 1000) if s in timings else "-")
+                for s in stages),
+            sum(timings.values()) * 1000, rss))
+
+
+if __name__ == '__main__':
+    main()
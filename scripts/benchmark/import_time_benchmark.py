@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the import time of the cli with `python -X importtime`
+
+The module is imported in a fresh interpreter `--repeat` times, the best
+cumulative time is reported with the slowest modules it imported. The
+exit status is 1 if it exceeds `--budget-ms` or imports a `--forbid`
+module, so it can gate a CI job. Usage:
+
+    python scripts/benchmark/import_time_benchmark.py --budget-ms 150
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+# import time:  self [us] | cumulative | imported package
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(module):
+    """Cumulative microseconds of each module imported by `module`
+
+    Returns:
+        dict: module name to cumulative microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        # Children are printed before their parent, a top level import
+        # other than `module`, e.g. of site, ends a subtree not of interest
+        name = match.group(4)
+        times[name] = int(match.group(2))
+        if len(match.group(3)) == 1 and name != module:
+            times = {}
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", type=str, default="autolabel.cmd")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if the import takes longer")
+    parser.add_argument("--forbid", type=str, default="torch,sam2,cv2",
+                        help="comma separated modules that fail the import")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        times = import_times(args.module)
+        if best is None or times[args.module] < best[args.module]:
+            best = times
+    total_ms = best[args.module] / 1000
+
+    print("{:<50} {:>12}".format("module", "cumulative"))
+    slowest = sorted(((t, m) for m, t in best.items()), reverse=True)
+    for t, m in slowest[:args.top]:
+        print("{:<50} {:>10.1f}ms".format(m, t / 1000))
+
+    failed = False
+    forbidden = [m for m in args.forbid.split(',') if m and m in best]
+    if forbidden:
+        print("Forbidden modules imported: {}".format(", ".join(forbidden)))
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print("Import of {} took {:.1f}ms, over the budget of {:.1f}ms".format(
+            args.module, total_ms, args.budget_ms))
+        failed = True
+    else:
+        print("Import of {} took {:.1f}ms".format(args.module, total_ms))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
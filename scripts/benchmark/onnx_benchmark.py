@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare SAM2 on CPU in eager torch against the onnx backend
+
+Each image of `autolabel/images` is encoded and a point at its center is
+decoded `--repeat` times. "onnx" runs the exported fp32 graphs, "onnx-int8"
+the dynamically quantized ones. The quality is the mask IoU and the cosine
+similarity of the image embedding against the eager model. Usage:
+
+    python scripts/benchmark/onnx_benchmark.py --threads 8
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from sam2.build_sam import build_sam2
+from sam2.sam2_image_predictor import SAM2ImagePredictor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from autolabel.model.image_input import set_image  # noqa: E402
+from autolabel.model.registry import REGISTRY  # noqa: E402
+from autolabel.source.image_decoder import decode_image  # noqa: E402
+
+
+def label(predictor, image, repeat):
+    """Mean encode and decode time, the embedding and the mask
+    """
+    height, width = image.shape[:2]
+    point_coords = np.array([[width // 2, height // 2]])
+    point_labels = np.array([1])
+    encode_time, decode_time = 0.0, 0.0
+    with torch.inference_mode():
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            set_image(predictor, image)
+            encode_time += time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            masks, _, _ = predictor.predict(point_coords=point_coords,
+                                            point_labels=point_labels,
+                                            multimask_output=False)
+            decode_time += time.perf_counter() - start_time
+    embed = predictor._features["image_embed"].float().flatten()
+    return encode_time / repeat, decode_time / repeat, embed, masks[0] > 0
+
+
+def iou(a, b):
+    union = np.logical_or(a, b).sum()
+    return np.logical_and(a, b).sum() / union if union else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checkpoint", type=str,
+                        default="autolabel/checkpoints/sam2_hiera_large.pt")
+    parser.add_argument("--model-cfg", type=str, default="sam2_hiera_l.yaml")
+    parser.add_argument("--images", type=str, default="autolabel/images/*.jpg")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--onnx-dir", type=str, default="/tmp/autolabel/onnx")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    images = {os.path.basename(path): decode_image(path)
+              for path in sorted(glob.glob(args.images))}
+    variants = {'eager': lambda: build_sam2(args.model_cfg, args.checkpoint,
+                                            device="cpu")}
+    for name, quantize in (('onnx', None), ('onnx-int8', 'int8')):
+        options = {'onnx_dir': args.onnx_dir, 'intra_op_threads': args.threads,
+                   'quantize': quantize}
+        variants[name] = lambda options=options: REGISTRY.create(
+            args.checkpoint, args.model_cfg, 'image_segment', 'onnx', options)
+
+    reference = {}
+    print("{:<10} {:<16} {:>10} {:>10} {:>8} {:>10}".format(
+        "variant", "image", "encode", "decode", "iou", "embed cos"))
+    for variant, build in variants.items():
+        predictor = SAM2ImagePredictor(build())
+        # The first call initializes the thread pools and the graphs
+        label(predictor, next(iter(images.values())), 1)
+        for name, image in images.items():
+            encode_time, decode_time, embed, mask = label(
+                predictor, image, args.repeat)
+            if variant == 'eager':
+                reference[name] = (embed, mask)
+            ref_embed, ref_mask = reference[name]
+            print("{:<10} {:<16} {:>8.1f}ms {:>8.1f}ms {:>8.3f} {:>10.4f}".format(
+                variant, name, encode_time * 1000, decode_time * 1000,
+                iou(mask, ref_mask),
+                torch.nn.functional.cosine_similarity(embed, ref_embed, dim=0)))
+        del predictor
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# Copyright 2024 wheelos <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare frames/sec of the VideoSource frame stepping strategies
+
+"legacy" is the former behavior, a CAP_PROP_POS_FRAMES seek after every
+frame. Usage:
+
+    python scripts/benchmark/video_step_benchmark.py --frames 600 --intervals 1 2 5 30 120
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from autolabel.source.source_input import SourceInput
+from autolabel.source.stream_source import VideoSource
+
+
+def make_video(path, frames, width, height, fourcc, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps,
+                             (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not write video with fourcc {fourcc}")
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        # A moving pattern over noise, so every frame costs real decoding
+        frame = np.roll(background, i * 8, axis=1)
+        cv2.putText(frame, str(i), (50, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    4, (255, 255, 255), 6)
+        writer.write(frame)
+    writer.release()
+
+
+def run_legacy(path, interval):
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while True:
+        ret, _ = cap.read()
+        if not ret:
+            break
+        count += 1
+        cap.set(cv2.CAP_PROP_POS_FRAMES,
+                cap.get(cv2.CAP_PROP_POS_FRAMES) + interval - 1)
+    cap.release()
+    return count
+
+
+def run_strategy(path, interval, step):
+    source = VideoSource(SourceInput(path), interval, step)
+    count = sum(1 for _ in source.frames())
+    source.cap.release()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", type=str, default=None,
+                        help="video to read, a synthetic one if not set")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fourcc", type=str, default="mp4v")
+    parser.add_argument("--intervals", type=int, nargs="+",
+                        default=[1, 2, 5, 30, 120])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.video
+        if path is None:
+            path = os.path.join(tmp_dir, "synthetic.mp4")
+            make_video(path, args.frames, args.width, args.height, args.fourcc)
+
+        print("{:>8} {:>8} {:>8} {:>12}".format(
+            "interval", "strategy", "frames", "frames/sec"))
+        for interval in args.intervals:
+            runs = [("legacy", lambda: run_legacy(path, interval))]
+            for step in VideoSource.STEP_STRATEGIES:
+                runs.append((step, lambda step=step: run_strategy(path, interval, step)))
+            for name, run in runs:
+                start_time = time.perf_counter()
+                count = run()
+                elapsed = time.perf_counter() - start_time
+                print("{:>8} {:>8} {:>8} {:>12.1f}".format(
+                    interval, name, count, count / elapsed))
+
+
+if __name__ == "__main__":
+    main()